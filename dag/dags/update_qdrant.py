@@ -1,19 +1,83 @@
+"""
+Hourly sync of the members changed in Postgres to Qdrant, sharded over Airflow workers.
+
+1. `fetch_delta`: read the delta of every version once and split it into shards of `member_no` (SYNC_SHARD_SIZE)
+2. `sync_shard`: enrich (optionally) and vectorize one shard, mapped over the shards of all versions
+3. `commit`: move the watermark of every version past its delta once all shards succeeded, and report
+
+Only one run is active at a time and missed intervals are not backfilled: the next run picks up everything
+changed since the last committed watermark. A failed shard leaves the watermark untouched, so the next run
+retries the whole delta (unchanged members are skipped by their content hash).
+"""
 import datetime
+import os
+
+from airflow.decorators import dag, task
+
+# Versions synced, each from its own watermark into its own collection
+SYNC_VERSIONS = os.getenv("SYNC_VERSIONS", "v1").split(",")
+# Shards running at once; the LLM request budget is split between them
+SYNC_MAX_PARALLEL_SHARDS = int(os.getenv("SYNC_MAX_PARALLEL_SHARDS", 4))
+SYNC_ENHANCED_DATA = os.getenv("SYNC_ENHANCED_DATA", "false").lower() in ("1", "true", "yes")
+
+
+@dag(dag_id="update_latest_data_to_qdrant",
+     start_date=datetime.datetime(2024, 9, 1),
+     schedule="@hourly",
+     catchup=False,
+     max_active_runs=1,
+     default_args={"retries": 2, "retry_delay": datetime.timedelta(minutes=5)})
+def update_latest_data_to_qdrant():
+
+    @task(multiple_outputs=True)
+    def fetch_delta() -> dict:
+        from llm_agent.src.update_data_to_qdrant import UpdateLatestDataToQdrantV1
+
+        shards, watermarks = [], {}
+        for version in SYNC_VERSIONS:
+            factory = UpdateLatestDataToQdrantV1(version_=version)
+            version_shards, since, watermark = factory.plan_delta_shards()
+            # Retries and re-runs of the delta starting at `since` resume its enrichment, however far it grew
+            delta_job_id = factory.enrichment_job_id(since) if watermark is not None else None
+            shards.extend({"version": version, "member_nos": member_nos, "delta_job_id": delta_job_id}
+                          for member_nos in version_shards)
+            if watermark is not None:
+                watermarks[version] = [watermark[0].isoformat(), watermark[1]]
+        return {"shards": shards, "watermarks": watermarks}
+
+    @task(max_active_tis_per_dag=SYNC_MAX_PARALLEL_SHARDS)
+    def sync_shard(shard: dict) -> dict:
+        from llm_agent.src.enrichment import DEFAULT_LLM_REQUESTS_PER_MINUTE
+        from llm_agent.src.update_data_to_qdrant import UpdateLatestDataToQdrantV1
+
+        factory = UpdateLatestDataToQdrantV1(version_=shard["version"],
+                                             requests_per_minute=DEFAULT_LLM_REQUESTS_PER_MINUTE
+                                             / SYNC_MAX_PARALLEL_SHARDS)
+        try:
+            return {"version": shard["version"],
+                    **factory.sync_member_shard(shard["member_nos"], enhanced_data=SYNC_ENHANCED_DATA,
+                                                delta_job_id=shard["delta_job_id"])}
+        finally:
+            factory.close()
+
+    @task(trigger_rule="none_failed")
+    def commit(watermarks: dict, reports: list) -> dict:
+        from llm_agent.src.update_data_to_qdrant import UpdateLatestDataToQdrantV1
 
-from airflow import DAG
-from airflow.operators.bash_operator import BashOperator
+        totals = {version: {"shards": 0, "members": 0, "inserted": 0} for version in watermarks}
+        for report in reports or []:
+            totals[report["version"]]["shards"] += 1
+            totals[report["version"]]["members"] += report["members"]
+            totals[report["version"]]["inserted"] += report["inserted"]
+        for version, (updated_at, member_no) in watermarks.items():
+            UpdateLatestDataToQdrantV1(version_=version).commit_watermark(
+                (datetime.datetime.fromisoformat(updated_at), member_no))
+            print(f"{version}: {totals[version]}, watermark moved to ({updated_at}, {member_no})")
+        return totals
 
+    delta = fetch_delta()
+    reports = sync_shard.expand(shard=delta["shards"])
+    commit(delta["watermarks"], reports)
 
-my_dag = DAG(
-    dag_id="update_latest_data_to_qdrant",
-    start_date=datetime.datetime(2024, 9, 1),
-    schedule="@hourly",
-)
-version = "v1"
 
-run_this = BashOperator(
-    task_id="update_latest_data_from_postgres_to_qdrant",
-    bash_command="cd /Users/tappy/Desktop/llm_agent/llm_agent/src && "
-                 "/Users/tappy/Library/Caches/pypoetry/virtualenvs/llm-agent-X4XTy3ta-py3.11/bin/python update_data_to_qdrant.py",
-    dag=my_dag
-)
+update_latest_data_to_qdrant()
@@ -0,0 +1,60 @@
+"""Stubbed models, tools and members shared by the benchmarks.
+
+The stubs mimic the latency of the real services so that benchmarks measure our own orchestration
+(concurrency, batching, caching) without calling Gemini or DuckDuckGo.
+"""
+import asyncio
+import time
+from typing import List
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from llm_agent.src.utils import Member
+
+
+class StubChatModel:
+    """Chat model returning a fixed answer after `latency` seconds."""
+    def __init__(self, latency: float = 2.0, content: str = "Stub summary"):
+        self.latency = latency
+        self.content = content
+        self.calls = 0
+
+    def invoke(self, prompt, *args, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return AIMessage(content=self.content)
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self.content)
+
+
+class StubSearchTool:
+    """Search tool returning a fixed search result after `latency` seconds."""
+    name = "duckduckgo_results_json"
+
+    def __init__(self, latency: float = 1.0, content: str = "snippet: stub search result"):
+        self.latency = latency
+        self.content = content
+        self.calls = 0
+
+    def invoke(self, tool_call: dict, *args, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return ToolMessage(content=self.content, name=self.name, tool_call_id=tool_call.get("id", ""))
+
+
+def make_members(n: int, n_companies: int = None) -> List[Member]:
+    """Create `n` synthetic members spread across `n_companies` companies (defaults to one company per member)."""
+    n_companies = n_companies or n
+    return [Member(member_no=i,
+                   name=f"Member {i}",
+                   company=f"Company {i % n_companies}",
+                   title="Engineer",
+                   background=f"Background of member {i} working on topic {i % 17}",
+                   company_url=f"https://company-{i % n_companies}.example.com",
+                   linkedin_url=f"https://www.linkedin.com/in/member-{i}/",
+                   versions={"v1": True, "v2": False},
+                   summary="")
+            for i in range(1, n + 1)]
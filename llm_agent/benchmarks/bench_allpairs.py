@@ -0,0 +1,77 @@
+"""Benchmark full-corpus candidate generation: one Qdrant search per member against `AllPairsCandidateEngine`.
+
+The per-member path runs the uncached body of `search_member` for every member (the Redis cache is
+bypassed). The engine is timed for the vector export and the blocked top-k separately, and its candidates
+are compared with Qdrant's (overlap of the top-k sets; Qdrant's HNSW search is approximate).
+
+Usage:
+    python -m llm_agent.benchmarks.bench_allpairs --members 20000 --per-member 500 --block-sizes 128 512
+    python -m llm_agent.benchmarks.bench_allpairs --members 20000 --mmap-dir /tmp
+"""
+import argparse
+import time
+
+from llm_agent.benchmarks._stubs import make_members
+from llm_agent.connectors.qdrant_connector import QdrantConnector
+from llm_agent.src.candidates import AllPairsCandidateEngine, ALLPAIRS_MAX_WORKERS
+
+
+def bench_per_member(qdrant_conn: QdrantConnector, members) -> tuple:
+    start = time.perf_counter()
+    results = [qdrant_conn._search_members_uncached([member], "v1")[0] for member in members]
+    return len(members) / (time.perf_counter() - start), results
+
+
+def bench_engine(qdrant_conn: QdrantConnector, block_size: int, max_workers: int, mmap_dir: str = None) -> dict:
+    engine = AllPairsCandidateEngine(qdrant_conn, "v1", block_size=block_size, max_workers=max_workers,
+                                     mmap_dir=mmap_dir)
+    start = time.perf_counter()
+    engine.load()
+    export_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    top, _ = engine.topk()
+    topk_seconds = time.perf_counter() - start
+    if mmap_dir:
+        engine.close()
+    return {"engine": engine, "export": export_seconds, "topk": topk_seconds,
+            "members/sec": len(top) / (export_seconds + topk_seconds)}
+
+
+def overlap(engine: AllPairsCandidateEngine, members, qdrant_results) -> float:
+    top, _ = engine.topk([engine.row_of[member.member_no] for member in members])
+    shared = sum(len({int(engine.member_nos[row]) for row in rows} & {point.id for point in results})
+                 for rows, results in zip(top, qdrant_results))
+    return shared / max(sum(len(results) for results in qdrant_results), 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=20000)
+    parser.add_argument("--per-member", type=int, default=500, help="Members searched one by one (slow path)")
+    parser.add_argument("--block-sizes", type=int, nargs="+", default=[128, 512])
+    parser.add_argument("--max-workers", type=int, default=ALLPAIRS_MAX_WORKERS)
+    parser.add_argument("--mmap-dir", default=None, help="Also run the engine with memory-mapped vectors")
+    parser.add_argument("--qdrant-url", default=None, help="Qdrant server to use instead of an in-memory one")
+    args = parser.parse_args()
+
+    members = make_members(args.members)
+    db_config = {"url": args.qdrant_url} if args.qdrant_url else {"location": ":memory:"}
+    qdrant_conn = QdrantConnector(db_config=db_config, collection_prefix="bench_allpairs")
+    qdrant_conn.insert_members_bulk(members, version_to_vectorize="v1")
+
+    sample = members[:args.per_member]
+    per_member_rate, qdrant_results = bench_per_member(qdrant_conn, sample)
+    print(f"{'path':>28} | {'export (s)':>10} | {'top-k (s)':>9} | {'members/sec':>11} | {'full corpus (s)':>15}")
+    print(f"{'per-member search_member':>28} | {'':>10} | {'':>9} | {per_member_rate:>11.1f} | "
+          f"{args.members / per_member_rate:>15.1f}")
+    runs = [(f"all-pairs block={block_size}", block_size, None) for block_size in args.block_sizes]
+    if args.mmap_dir:
+        runs.append((f"all-pairs block={args.block_sizes[-1]} mmap", args.block_sizes[-1], args.mmap_dir))
+    engines = []
+    for name, block_size, mmap_dir in runs:
+        result = bench_engine(qdrant_conn, block_size, args.max_workers, mmap_dir)
+        engines.append(result["engine"])
+        print(f"{name:>28} | {result['export']:>10.2f} | {result['topk']:>9.2f} | {result['members/sec']:>11.1f} | "
+              f"{result['export'] + result['topk']:>15.1f}")
+    print(f"\nOverlap of all-pairs and Qdrant top-k on {len(sample)} members: "
+          f"{overlap(engines[0], sample, qdrant_results):.3f}")
@@ -0,0 +1,68 @@
+"""Benchmark the threaded `recommend_many` against the asyncio `arecommend_many` on an in-memory Qdrant.
+
+The chat model is stubbed with a fixed latency, so the numbers reflect how many reranks each path keeps in
+flight. Run with an empty Redis (or none) so that no recommendation is served from the cache.
+
+Usage:
+    python -m llm_agent.benchmarks.bench_async_rerank --members 200 --latency 1.0 --concurrency 8 32
+"""
+import argparse
+import asyncio
+import time
+
+from qdrant_client import AsyncQdrantClient
+
+from llm_agent.benchmarks._stubs import StubChatModel, make_members
+from llm_agent.connectors.qdrant_connector import QdrantConnector, AsyncQdrantConnector
+from llm_agent.src.rerank import LlmReranker
+
+STUB_ANSWER = '{"member_no": 1, "reason": "stub"}'
+
+
+def bench_threaded(members, qdrant_conn: QdrantConnector, latency: float, max_workers: int) -> float:
+    reranker = LlmReranker(StubChatModel(latency, STUB_ANSWER), qdrant_conn=qdrant_conn)
+    reranker.rerank_prompt += f"\n<!-- threaded {max_workers} -->"  # fresh cache namespace per run
+    start = time.perf_counter()
+    for _ in reranker.recommend_many(members, "v1", max_workers=max_workers):
+        pass
+    return len(members) / (time.perf_counter() - start)
+
+
+async def bench_async(members, qdrant_conn: QdrantConnector, latency: float, max_concurrency: int) -> float:
+    # The async client gets its own in-memory store, so load it from the same members
+    client = AsyncQdrantClient(location=":memory:")
+    async_qdrant_conn = AsyncQdrantConnector(collection_prefix=qdrant_conn.collection_prefix, client=client)
+    for member in members:
+        await async_qdrant_conn.client.add(collection_name=qdrant_conn.collection_prefix + "_v1",
+                                           documents=[QdrantConnector._member_document(member)],
+                                           metadata=[member.model_dump()],
+                                           ids=[member.member_no])
+    reranker = LlmReranker(StubChatModel(latency, STUB_ANSWER),
+                           qdrant_conn=qdrant_conn,
+                           async_qdrant_conn=async_qdrant_conn)
+    reranker.rerank_prompt += f"\n<!-- async {max_concurrency} -->"
+    start = time.perf_counter()
+    async for _ in reranker.arecommend_many(members, "v1", max_concurrency=max_concurrency):
+        pass
+    elapsed = time.perf_counter() - start
+    await client.close()
+    return len(members) / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds per stubbed LLM call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32])
+    args = parser.parse_args()
+
+    members = make_members(args.members)
+    qdrant_conn = QdrantConnector(db_config={"location": ":memory:"}, collection_prefix="bench_rerank")
+    qdrant_conn.insert_members_bulk(members, version_to_vectorize="v1")
+
+    print(f"{'path':>10} | {'concurrency':>11} | {'targets/sec':>11}")
+    for concurrency in args.concurrency:
+        threaded = bench_threaded(members, qdrant_conn, args.latency, concurrency)
+        print(f"{'threaded':>10} | {concurrency:>11} | {threaded:>11.1f}")
+        async_ = asyncio.run(bench_async(members, qdrant_conn, args.latency, concurrency))
+        print(f"{'asyncio':>10} | {concurrency:>11} | {async_:>11.1f}")
@@ -0,0 +1,80 @@
+"""Benchmark multi-target batched reranking (`recommend_many(batch_targets=True)`) against one LLM call per target.
+
+Candidates come from an in-memory Qdrant filled with `--members` synthetic members; the gate is disabled so every
+target needs the LLM. The chat model is stubbed: a call takes `--latency` seconds plus `--latency-per-target`
+seconds per target of the prompt (answer length), and answers the first candidate of each target. Run with an
+empty Redis (or none) so that no recommendation is served from the cache.
+
+Usage:
+    python -m llm_agent.benchmarks.bench_batched_rerank --members 500 --max-targets 5 10 20 --concurrency 8
+"""
+import argparse
+import contextlib
+import io
+import json
+import re
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+
+from llm_agent.benchmarks._stubs import make_members
+from llm_agent.connectors.qdrant_connector import QdrantConnector
+from llm_agent.src.rerank import LlmReranker, RerankGate
+
+TARGET_PATTERN = re.compile(r"# Target `target_member_no`: (\d+)\n.*?`member_no`: (\d+)", re.S)
+
+
+class FirstCandidateChatModel:
+    """Stub answering the first candidate of each target of the prompt, single or batched"""
+    def __init__(self, latency: float, latency_per_target: float):
+        self.latency = latency
+        self.latency_per_target = latency_per_target
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+        targets = TARGET_PATTERN.findall(prompt)
+        time.sleep(self.latency + self.latency_per_target * max(len(targets), 1))
+        if not targets:
+            member_no = re.search(r"`member_no`: (\d+)", prompt).group(1)
+            return AIMessage(content=json.dumps({"member_no": member_no, "reason": "stub"}))
+        return AIMessage(content=json.dumps([{"target_member_no": target_no, "member_no": member_no, "reason": "stub"}
+                                             for target_no, member_no in targets]))
+
+
+def bench(qdrant_conn: QdrantConnector, members, args, max_targets: int = None) -> dict:
+    chat_model = FirstCandidateChatModel(args.latency, args.latency_per_target)
+    reranker = LlmReranker(chat_model, qdrant_conn=qdrant_conn, gate=RerankGate(min_candidates=0, margin=None))
+    reranker.rerank_prompt += f"\n<!-- batch {max_targets} {time.time_ns()} -->"  # fresh cache namespace per run
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # one `rerank_gate` line per target
+        for _ in reranker.recommend_many(members, "v1", max_workers=args.concurrency,
+                                         batch_targets=max_targets is not None,
+                                         max_batch_targets=max_targets or 1):
+            pass
+    elapsed = time.perf_counter() - start
+    return {"llm calls": chat_model.calls, "members/sec": len(members) / elapsed, "seconds": elapsed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--max-targets", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds per stubbed LLM call")
+    parser.add_argument("--latency-per-target", type=float, default=0.2, help="Extra seconds per target of a call")
+    args = parser.parse_args()
+
+    members = make_members(args.members)
+    qdrant_conn = QdrantConnector(db_config={"location": ":memory:"}, collection_prefix="bench_batched_rerank")
+    qdrant_conn.insert_members_bulk(members, version_to_vectorize="v1")
+    rows = {"one target per call": bench(qdrant_conn, members, args)}
+    for max_targets in args.max_targets:
+        rows[f"batch max_targets={max_targets}"] = bench(qdrant_conn, members, args, max_targets)
+
+    print(f"{'path':>24} | {'llm calls':>9} | {'members/sec':>11} | {'seconds':>8}")
+    for path, row in rows.items():
+        print(f"{path:>24} | {row['llm calls']:>9} | {row['members/sec']:>11.1f} | {row['seconds']:>8.2f}")
@@ -0,0 +1,74 @@
+"""Benchmark the per-row upload loop against the chunked `MemberBulkIngestor` on Postgres.
+
+Both paths write into the `member_info` table of the configured database, each on its own range of
+`member_no` (the rows are deleted afterwards).
+
+Usage:
+    python -m llm_agent.benchmarks.bench_bulk_ingest --rows 50000 --per-row-rows 500 --chunk-sizes 1000 5000
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import pandas as pd
+
+from llm_agent.benchmarks._stubs import make_members
+from llm_agent.connectors.postgres_connector import PostgresConnector
+from llm_agent.src.bulk_ingest import MemberBulkIngestor
+
+
+def _write_csv(n_rows: int, offset: int) -> str:
+    members = make_members(n_rows)
+    df = pd.DataFrame([member.model_dump() for member in members])
+    df["member_no"] += offset
+    df["versions"] = df["versions"].map(json.dumps)
+    path = tempfile.NamedTemporaryFile(suffix=".csv", delete=False).name
+    df.to_csv(path, index=False)
+    return path
+
+
+def _cleanup(pg_conn: PostgresConnector, start: int, end: int):
+    with pg_conn._cursor(commit=True) as cursor:
+        cursor.execute("DELETE FROM member_info WHERE member_no BETWEEN %s AND %s;", (start, end))
+
+
+def bench_per_row(pg_conn: PostgresConnector, n_rows: int, offset: int) -> float:
+    """The previous upload loop: existence check and single-row insert per member"""
+    members = [member.model_copy(update={"member_no": member.member_no + offset}) for member in make_members(n_rows)]
+    start = time.perf_counter()
+    for member in members:
+        if not pg_conn.get_member_info_by_id(member.member_no):
+            pg_conn.update_member_info([member])
+    rows_per_sec = n_rows / (time.perf_counter() - start)
+    _cleanup(pg_conn, offset, offset + n_rows)
+    return rows_per_sec
+
+
+def bench_bulk(pg_conn: PostgresConnector, n_rows: int, offset: int, chunk_size: int) -> float:
+    path = _write_csv(n_rows, offset)
+    ingestor = MemberBulkIngestor(pg_conn=pg_conn, chunk_size=chunk_size, skip_existing=True)
+    start = time.perf_counter()
+    ingestor.ingest(path)
+    rows_per_sec = n_rows / (time.perf_counter() - start)
+    _cleanup(pg_conn, offset, offset + n_rows)
+    return rows_per_sec
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--per-row-rows", type=int, default=500, help="Rows for the (slow) per-row path")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--offset", type=int, default=10_000_000, help="First member_no used by the benchmark")
+    args = parser.parse_args()
+
+    pg_conn = PostgresConnector()
+    pg_conn.create_table()
+    results = {"per-row": bench_per_row(pg_conn, args.per_row_rows, args.offset)}
+    for chunk_size in args.chunk_sizes:
+        results[f"bulk chunk_size={chunk_size}"] = bench_bulk(pg_conn, args.rows, args.offset, chunk_size)
+
+    print(f"{'path':>24} | {'rows/sec':>10}")
+    for path, rows_per_sec in results.items():
+        print(f"{path:>24} | {rows_per_sec:>10.1f}")
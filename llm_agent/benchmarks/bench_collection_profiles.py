@@ -0,0 +1,93 @@
+"""Benchmark recall, search latency and memory of the collection profiles (`COLLECTION_PROFILES`).
+
+Each profile gets its own collection filled with the same members. Every target is searched by its stored vector
+with the profile's search params; recall@k is measured against an exact (brute-force) search of the same
+collection. RAM is estimated from the profile: float32 vectors unless on disk, quantized vectors kept in RAM,
+the HNSW links (2 * m per point on the base layer) and the payload unless on disk.
+
+HNSW and quantization are only applied by a Qdrant server: the local client searches brute-force whatever the
+profile, so run against a server to compare profiles.
+
+Usage:
+    python -m llm_agent.benchmarks.bench_collection_profiles --qdrant-url http://localhost:6333 --members 100000
+"""
+import argparse
+import statistics
+import time
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import QueryRequest, SearchParams
+
+from llm_agent.benchmarks._stubs import make_members
+from llm_agent.connectors.qdrant_connector import QdrantConnector, COLLECTION_PROFILES, CollectionProfile
+
+DEFAULT_HNSW_M = 16
+INDEXING_TIMEOUT = 600
+
+
+def estimated_ram_bytes(profile: CollectionProfile, n_points: int, dim: int, payload_bytes: int) -> int:
+    ram = 0 if profile.on_disk_vectors else n_points * dim * 4
+    if profile.quantization and profile.quantization_always_ram:
+        ram += n_points * dim // (8 if profile.quantization == "binary" else 1)
+    ram += n_points * 2 * (profile.hnsw_m or DEFAULT_HNSW_M) * 4
+    if not profile.on_disk_payload:
+        ram += payload_bytes
+    return ram
+
+
+def _wait_indexed(client: QdrantClient, collection: str):
+    start = time.perf_counter()
+    while client.get_collection(collection).status != "green" and time.perf_counter() - start < INDEXING_TIMEOUT:
+        time.sleep(1)
+
+
+def bench_profile(client: QdrantClient, profile: CollectionProfile, members, targets, top_k: int) -> dict:
+    qdrant_conn = QdrantConnector(client=client, collection_prefix=f"bench_profile_{profile.name}",
+                                  profiles={"v1": profile})
+    collection = qdrant_conn.collection_name("v1")
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+    qdrant_conn.insert_members_bulk(members, version_to_vectorize="v1")
+    _wait_indexed(client, collection)
+
+    vectors = qdrant_conn._stored_vectors("v1", [target.member_no for target in targets])
+    vector_name = qdrant_conn._vector_name("v1")
+    exact = client.query_batch_points(
+        collection_name=collection,
+        requests=[QueryRequest(query=vector, using=vector_name, filter=qdrant_conn._search_filter("v1", member_no),
+                               params=SearchParams(exact=True), limit=top_k)
+                  for member_no, vector in vectors.items()])
+    latencies, hits = [], 0
+    for (member_no, vector), truth in zip(vectors.items(), exact):
+        start = time.perf_counter()
+        results = qdrant_conn._search_batch_by_vector({member_no: vector}, "v1", return_top_k=top_k)[0]
+        latencies.append(time.perf_counter() - start)
+        hits += len({point.id for point in truth.points} & {result.id for result in results})
+
+    payload_bytes = sum(len(qdrant_conn._member_document(member).encode("utf-8")) + 100 for member in members)
+    dim = len(next(iter(vectors.values())))
+    client.delete_collection(collection)
+    return {"recall@k": hits / max(sum(len(truth.points) for truth in exact), 1),
+            "p50 (ms)": statistics.median(latencies) * 1000,
+            "p95 (ms)": statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) > 1 else latencies[0] * 1000,
+            "est. RAM (MB)": estimated_ram_bytes(profile, len(members), dim, payload_bytes) / 1e6}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qdrant-url", default=None, help="Qdrant server (defaults to an in-memory local client)")
+    parser.add_argument("--members", type=int, default=20000)
+    parser.add_argument("--targets", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--profiles", nargs="+", choices=list(COLLECTION_PROFILES), default=list(COLLECTION_PROFILES))
+    args = parser.parse_args()
+
+    qdrant_client = QdrantClient(url=args.qdrant_url) if args.qdrant_url else QdrantClient(location=":memory:")
+    members = make_members(args.members)
+    results = {name: bench_profile(qdrant_client, COLLECTION_PROFILES[name], members, members[:args.targets],
+                                   args.top_k)
+               for name in args.profiles}
+    columns = list(next(iter(results.values())))
+    print(f"{'profile':>12} | " + " | ".join(f"{column:>13}" for column in columns))
+    for name, result in results.items():
+        print(f"{name:>12} | " + " | ".join(f"{result[column]:>13.3f}" for column in columns))
@@ -0,0 +1,45 @@
+"""Benchmark local embedding throughput (`FastEmbedEmbedder`) by number of cores.
+
+The documents of `--docs` synthetic members are embedded in-process with `--cores` ONNX threads (one model
+spreading each batch over the cores) and with `--cores` worker processes of one thread each (data parallel).
+Worker pools are started and warmed up before timing, as in a long-running sync. Embedding caches are bypassed.
+
+Usage:
+    python -m llm_agent.benchmarks.bench_embedder --docs 4000 --cores 1 2 4 8 --batch-size 64
+"""
+import argparse
+import os
+import time
+
+from llm_agent.benchmarks._stubs import make_members
+from llm_agent.connectors.embedder import FastEmbedEmbedder, FASTEMBED_MODEL
+from llm_agent.connectors.qdrant_connector import QdrantConnector
+
+
+def docs_per_sec(embedder: FastEmbedEmbedder, documents, batch_size: int, parallel=None) -> float:
+    # Warm-up: loads the model(s) and starts the worker processes
+    embedder.embed_documents(documents[:batch_size * (parallel or 1) * 2], batch_size=batch_size, parallel=parallel)
+    start = time.perf_counter()
+    embedder.embed_documents(documents, batch_size=batch_size, parallel=parallel)
+    return len(documents) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=4000)
+    parser.add_argument("--cores", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--model", default=FASTEMBED_MODEL)
+    args = parser.parse_args()
+
+    documents = [QdrantConnector._member_document(member) for member in make_members(args.docs)]
+    print(f"{len(documents)} documents, model {args.model}, batch size {args.batch_size}, {os.cpu_count()} CPUs")
+    print(f"{'cores':>5} | {'in-process docs/sec':>19} | {'workers docs/sec':>16} | {'workers speedup':>15}")
+    baseline = None  # in-process docs/sec on the fewest cores
+    for cores in sorted(set(args.cores)):
+        in_process = docs_per_sec(FastEmbedEmbedder(args.model, threads=cores), documents, args.batch_size)
+        embedder = FastEmbedEmbedder(args.model, threads=1)
+        workers = docs_per_sec(embedder, documents, args.batch_size, parallel=cores)
+        embedder.close()
+        baseline = baseline or in_process
+        print(f"{cores:>5} | {in_process:>19.1f} | {workers:>16.1f} | {workers / baseline:>14.2f}x")
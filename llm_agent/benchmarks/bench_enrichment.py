@@ -0,0 +1,54 @@
+"""Benchmark the concurrent enrichment engine with a stubbed chat model and search tool.
+
+Every run uses a fresh search cache; `--companies` controls how many members share a company.
+
+Usage:
+    python -m llm_agent.benchmarks.bench_enrichment --members 40 --concurrency 1 4 8 16 --rpm 600
+    python -m llm_agent.benchmarks.bench_enrichment --members 1000 --companies 200 --concurrency 16 --no-search-cache
+"""
+import argparse
+import time
+import uuid
+
+from llm_agent.benchmarks._stubs import StubChatModel, StubSearchTool, make_members
+from llm_agent.connectors.redis_connector import LayeredCache
+from llm_agent.src._data_enhance_agent import MemberInfoEnhanceAgent
+from llm_agent.src.enrichment import EnrichmentEngine, TokenBucketRateLimiter
+
+
+def run_benchmark(n_members: int, concurrency: int, rpm: float, llm_latency: float, search_latency: float,
+                  n_companies: int = None, search_cache: bool = True):
+    """Return the throughput in members/minute for one concurrency setting, the per-node timings and the
+    engine report (searches run / saved)."""
+    agent = MemberInfoEnhanceAgent(StubChatModel(latency=llm_latency), None, StubSearchTool(latency=search_latency),
+                                   search_cache=LayeredCache(f"bench_websearch_{uuid.uuid4().hex}"),
+                                   use_search_cache=search_cache)
+    engine = EnrichmentEngine(agent, max_workers=concurrency, rate_limiter=TokenBucketRateLimiter(rpm))
+    members = make_members(n_members, n_companies)
+    start = time.perf_counter()
+    engine.enrich(members, progress=False)
+    elapsed = time.perf_counter() - start
+    agent.close()
+    return n_members / elapsed * 60, agent.node_timing_stats(), engine.last_report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--rpm", type=float, default=600, help="Provider quota in requests per minute")
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--search-latency", type=float, default=1.0)
+    parser.add_argument("--companies", type=int, default=None, help="Distinct companies (default: one per member)")
+    parser.add_argument("--no-search-cache", action="store_true")
+    args = parser.parse_args()
+
+    print(f"members={args.members} rpm={args.rpm} llm_latency={args.llm_latency}s search_latency={args.search_latency}s")
+    print(f"{'concurrency':>12} | {'members/min':>12} | {'searches':>8} | {'saved':>6} | avg seconds per node")
+    for concurrency in args.concurrency:
+        throughput, node_timings, report = run_benchmark(args.members, concurrency, args.rpm, args.llm_latency,
+                                                         args.search_latency, args.companies,
+                                                         not args.no_search_cache)
+        per_node = ", ".join(f"{name}={stats['avg_seconds']:.2f}" for name, stats in node_timings.items())
+        print(f"{concurrency:>12} | {throughput:>12.1f} | {report['searches']:>8} | {report['searches_saved']:>6} | "
+              f"{per_node}")
@@ -0,0 +1,67 @@
+"""Report the cold import time of llm_agent modules from `python -X importtime`.
+
+Each module is imported in a fresh interpreter, so numbers include everything it pulls in. The heaviest
+imports (by cumulative time) are listed per module to show where cold start goes.
+
+Usage:
+    python -m llm_agent.benchmarks.bench_import_time --top 10
+    python -m llm_agent.benchmarks.bench_import_time --modules llm_agent.src.rerank --repeat 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import List, Tuple
+
+DEFAULT_MODULES = [
+    "llm_agent.src.utils",
+    "llm_agent.connectors.redis_connector",
+    "llm_agent.connectors.postgres_connector",
+    "llm_agent.connectors.qdrant_connector",
+    "llm_agent.src.rerank",
+    "llm_agent.src._data_enhance_agent",
+    "llm_agent.src.update_data_to_qdrant",
+    "llm_agent.member_recommendation",
+]
+
+
+def import_time(module: str) -> Tuple[float, List[Tuple[float, str]]]:
+    """Import `module` in a fresh interpreter
+
+    Returns:
+        Tuple[float, List[Tuple[float, str]]]: Cumulative import time of `module` in seconds and
+            (cumulative seconds, name) of every module imported on the way
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr.splitlines()[-1]}")
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative) / 1e6, name.strip()))
+    total = next(seconds for seconds, name in imports if name == module)
+    return total, imports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module (median is reported)")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest imports listed per module")
+    args = parser.parse_args()
+
+    print(f"{'module':>40} | {'import (s)':>10}")
+    heaviest = {}
+    for module in args.modules:
+        runs = [import_time(module) for _ in range(args.repeat)]
+        print(f"{module:>40} | {statistics.median(total for total, _ in runs):>10.3f}")
+        # Top-level third-party packages only, so nested submodules do not crowd the list
+        heaviest[module] = sorted(((seconds, name) for seconds, name in runs[-1][1]
+                                   if "." not in name and not name.startswith("llm_agent")), reverse=True)
+    for module, imports in heaviest.items():
+        print(f"\n{module}: heaviest imports")
+        for seconds, name in imports[:args.top]:
+            print(f"    {name:>36} | {seconds:>8.3f}s")
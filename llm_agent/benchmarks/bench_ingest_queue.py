@@ -0,0 +1,86 @@
+"""Benchmark single-member updates: inline `insert_members([member])` against the write-behind queue.
+
+`--updates` members are submitted one by one, as the demo form (or an Excel upload) does. Inline, each submit
+embeds and upserts its member before returning. Write-behind, each submit only enqueues the `member_no` and a
+worker thread drains the queue in micro-batches. Reported: submit latency (what the UI waits for) and the time
+until every member is searchable. Members are read from an in-memory stand-in of Postgres.
+
+Usage:
+    python -m llm_agent.benchmarks.bench_ingest_queue --updates 500 --batch-size 256 --linger 0.2
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from llm_agent.benchmarks._stubs import make_members
+from llm_agent.connectors.qdrant_connector import QdrantConnector
+from llm_agent.src.ingest_queue import IngestQueue, IngestQueueWorker
+
+
+class InMemoryMembers:
+    """`get_members_by_ids` over a list of members"""
+    def __init__(self, members):
+        self.members = {member.member_no: member for member in members}
+
+    def get_members_by_ids(self, member_nos):
+        return [self.members[member_no] for member_no in sorted(member_nos) if member_no in self.members]
+
+
+def _summary(submit_latencies, total_seconds: float) -> dict:
+    return {"submit p50 (ms)": statistics.median(submit_latencies) * 1000,
+            "submit max (ms)": max(submit_latencies) * 1000,
+            "all written (s)": total_seconds}
+
+
+def bench_inline(qdrant_conn: QdrantConnector, members) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    for member in members:
+        submit = time.perf_counter()
+        qdrant_conn.insert_members([member])
+        latencies.append(time.perf_counter() - submit)
+    return _summary(latencies, time.perf_counter() - start)
+
+
+def bench_write_behind(qdrant_conn: QdrantConnector, members, batch_size: int, linger: float) -> dict:
+    queue = IngestQueue(prefix=f"bench_ingest_queue_{time.time_ns()}")
+    worker = IngestQueueWorker(queue, qdrant_conn, InMemoryMembers(members), batch_size=batch_size, linger=linger)
+    thread = threading.Thread(target=worker.run, kwargs={"max_idle": max(2 * linger, 1.0)}, daemon=True)
+    latencies = []
+    start = time.perf_counter()
+    thread.start()
+    for member in members:
+        submit = time.perf_counter()
+        queue.enqueue([member.member_no])
+        latencies.append(time.perf_counter() - submit)
+    while queue.stats().get("processed", 0) < len(members):
+        time.sleep(0.01)
+    total = time.perf_counter() - start
+    thread.join()
+    return _summary(latencies, total)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--linger", type=float, default=0.2)
+    parser.add_argument("--qdrant-url", default=None, help="Qdrant server to use instead of an in-memory one")
+    args = parser.parse_args()
+
+    db_config = {"url": args.qdrant_url} if args.qdrant_url else {"location": ":memory:"}
+    results = {}
+    for path in ["inline", "write-behind"]:
+        # Distinct members and collections, so neither path finds the other's points or cached vectors
+        offset = 0 if path == "inline" else args.updates
+        members = [member.model_copy(update={"member_no": member.member_no + offset,
+                                             "background": f"{member.background} ({path})"})
+                   for member in make_members(args.updates)]
+        qdrant_conn = QdrantConnector(db_config=db_config, collection_prefix=f"bench_ingest_{path.replace('-', '_')}")
+        results[path] = (bench_inline(qdrant_conn, members) if path == "inline"
+                         else bench_write_behind(qdrant_conn, members, args.batch_size, args.linger))
+    columns = list(results["inline"])
+    print(f"{'path':>12} | " + " | ".join(f"{column:>15}" for column in columns))
+    for path, result in results.items():
+        print(f"{path:>12} | " + " | ".join(f"{result[column]:>15.2f}" for column in columns))
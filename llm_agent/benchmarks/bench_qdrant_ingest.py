@@ -0,0 +1,59 @@
+"""Benchmark per-row `insert_members` against `insert_members_bulk` on an in-memory Qdrant.
+
+Each path starts from an empty collection and an empty embedding cache. The `rerun` rows sync the same
+members again, where unchanged points are skipped without embedding.
+
+Usage:
+    python -m llm_agent.benchmarks.bench_qdrant_ingest --rows 2000 --batch-sizes 16 64 256
+"""
+import argparse
+import time
+import uuid
+
+from llm_agent.benchmarks._stubs import make_members
+from llm_agent.connectors.qdrant_connector import QdrantConnector
+from llm_agent.connectors.redis_connector import LayeredCache
+
+
+def _connector(prefix: str) -> QdrantConnector:
+    return QdrantConnector(db_config={"location": ":memory:"}, collection_prefix=prefix,
+                           embedding_cache=LayeredCache(f"bench_embedding_{uuid.uuid4().hex}"))
+
+
+def bench_per_row(members) -> float:
+    qdrant_conn = _connector("bench_per_row")
+    start = time.perf_counter()
+    qdrant_conn.insert_members(members, version_to_vectorize="v1")
+    return len(members) / (time.perf_counter() - start)
+
+
+def bench_bulk(members, batch_size: int, parallel: int = None):
+    """Rows/sec of the first sync and of a re-run with unchanged members"""
+    qdrant_conn = _connector(f"bench_bulk_{batch_size}")
+    rows_per_sec = []
+    for _ in range(2):
+        start = time.perf_counter()
+        qdrant_conn.insert_members_bulk(members, version_to_vectorize="v1", batch_size=batch_size, parallel=parallel)
+        rows_per_sec.append(len(members) / (time.perf_counter() - start))
+    return tuple(rows_per_sec)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--parallel", type=int, default=None, help="Embedding worker processes for the bulk path")
+    parser.add_argument("--skip-per-row", action="store_true")
+    args = parser.parse_args()
+
+    members = make_members(args.rows)
+    results = {}
+    if not args.skip_per_row:
+        results["per-row"] = bench_per_row(members)
+    for batch_size in args.batch_sizes:
+        results[f"bulk batch_size={batch_size}"], results[f"rerun batch_size={batch_size}"] = \
+            bench_bulk(members, batch_size, args.parallel)
+
+    print(f"{'path':>24} | {'rows/sec':>10}")
+    for path, rows_per_sec in results.items():
+        print(f"{path:>24} | {rows_per_sec:>10.1f}")
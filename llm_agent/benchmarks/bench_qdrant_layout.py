@@ -0,0 +1,100 @@
+"""Benchmark the per-version layout (one collection per version) against the multi-vector layout (one collection,
+one named vector per version) on local on-disk Qdrant storage.
+
+Members are enabled for every version. For each layout the benchmark reports the size of the storage directory,
+the memory held by a client that loads it, and the search latency of all versions of the members:
+    - `search_members`: the public path, cold cache (one query per member and version for the per-version
+      layout, one batched request for the multi-vector layout)
+    - `batched`: uncached batched search (one request per version against one request for all versions)
+
+The local client ignores payload indexes and evaluates the version filter of the multi-vector layout in Python,
+so its search latency is only representative with `--qdrant-url` (storage size and memory are then not measured).
+
+Usage:
+    python -m llm_agent.benchmarks.bench_qdrant_layout --members 5000 --versions v1 v2 --targets 200
+    python -m llm_agent.benchmarks.bench_qdrant_layout --members 50000 --qdrant-url http://localhost:6333
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from qdrant_client import QdrantClient
+
+from llm_agent.benchmarks._stubs import make_members
+from llm_agent.connectors.qdrant_connector import QdrantConnector, MultiVectorQdrantConnector
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def _loaded_memory(path: str) -> int:
+    """Bytes allocated by a local client loading the storage at `path`"""
+    tracemalloc.start()
+    client = QdrantClient(path=path)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    client.close()
+    return current
+
+
+def _connector(layout: str, client: QdrantClient, versions) -> QdrantConnector:
+    if layout == "multi-vector":
+        return MultiVectorQdrantConnector(client=client, collection=f"bench_layout_{time.time_ns()}",
+                                          versions=versions)
+    return QdrantConnector(client=client, collection_prefix=f"bench_layout_{time.time_ns()}")
+
+
+def bench_layout(layout: str, members, targets, versions, qdrant_url: str = None) -> dict:
+    path = None if qdrant_url else tempfile.mkdtemp(prefix=f"bench_{layout}_")
+    client = QdrantClient(url=qdrant_url) if qdrant_url else QdrantClient(path=path)
+    qdrant_conn = _connector(layout, client, versions)
+    start = time.perf_counter()
+    qdrant_conn.insert_members_bulk(members)
+    insert_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    qdrant_conn.search_members(targets)
+    search_members_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if isinstance(qdrant_conn, MultiVectorQdrantConnector):
+        qdrant_conn._search_pairs_uncached([(target, version) for target in targets for version in versions])
+    else:
+        for version in versions:
+            qdrant_conn._search_members_uncached(targets, version)
+    batched_seconds = time.perf_counter() - start
+    if qdrant_url:
+        for version in versions:
+            qdrant_conn.client.delete_collection(qdrant_conn.collection_name(version))
+    qdrant_conn.client.close()
+
+    n_searches = len(targets) * len(versions)
+    return {"insert (s)": insert_seconds,
+            "disk (MB)": _dir_size(path) / 1e6 if path else float("nan"),
+            "memory (MB)": _loaded_memory(path) / 1e6 if path else float("nan"),
+            "search_members (ms)": search_members_seconds / n_searches * 1000,
+            "batched (ms)": batched_seconds / n_searches * 1000}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=5000)
+    parser.add_argument("--versions", nargs="+", default=["v1", "v2"])
+    parser.add_argument("--targets", type=int, default=200, help="Members searched in every version")
+    parser.add_argument("--qdrant-url", default=None, help="Qdrant server to use instead of local storage")
+    args = parser.parse_args()
+
+    members = [member.model_copy(update={"versions": {version: True for version in args.versions}})
+               for member in make_members(args.members)]
+    targets = members[:args.targets]
+
+    results = {layout: bench_layout(layout, members, targets, args.versions, args.qdrant_url)
+               for layout in ["per-version", "multi-vector"]}
+    columns = list(results["per-version"])
+    print(f"{'layout':>12} | " + " | ".join(f"{column:>19}" for column in columns))
+    for layout, result in results.items():
+        print(f"{layout:>12} | " + " | ".join(f"{result[column]:>19.2f}" for column in columns))
+    print("\nsearch latencies are per (member, version) search")
@@ -0,0 +1,107 @@
+"""Benchmark the blue/green re-index (`BlueGreenReindexer`): rebuild throughput and search latency while it runs.
+
+A serving collection is filled with `--members` members, then searched continuously from a background thread,
+first while idle and then during one re-index per `--max-workers` value. The first re-index also turns the plain
+collection into an alias, so failed searches show the instant between deleting it and creating the alias; later
+switches are atomic. Members come from an in-memory stand-in of `PostgresConnector.iter_member_changes`.
+
+The local client is not thread-safe for concurrent upserts into one collection, so without `--qdrant-url` the
+re-index runs with a single worker.
+
+Usage:
+    python -m llm_agent.benchmarks.bench_reindex --members 20000 --max-workers 1 4
+    python -m llm_agent.benchmarks.bench_reindex --members 100000 --qdrant-url http://localhost:6333
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from llm_agent.benchmarks._stubs import make_members
+from llm_agent.connectors.postgres_connector import INITIAL_WATERMARK
+from llm_agent.connectors.qdrant_connector import QdrantConnector
+from llm_agent.src.reindex_qdrant import BlueGreenReindexer
+
+IDLE_SECONDS = 3
+
+
+class InMemoryMemberSource:
+    """`iter_member_changes` over a list of members, ordered by `member_no` as the watermark"""
+    def __init__(self, members):
+        self.members = sorted(members, key=lambda member: member.member_no)
+
+    def iter_member_changes(self, version: str = "v1", since=INITIAL_WATERMARK, batch_size: int = 100):
+        members = [member for member in self.members
+                   if member.versions.get(version, False) and member.member_no > since[1]]
+        for start in range(0, len(members), batch_size):
+            batch = members[start:start + batch_size]
+            yield batch, (None, batch[-1].member_no)
+
+    def rewind_sync_watermark(self, version: str, watermark) -> bool:
+        return False
+
+
+class SearchLoad(threading.Thread):
+    """Search random members continuously, recording latencies and failures until stopped"""
+    def __init__(self, qdrant_conn: QdrantConnector, members):
+        super().__init__(daemon=True)
+        self.qdrant_conn = qdrant_conn
+        self.members = members
+        self.latencies, self.errors = [], 0
+        self.running = threading.Event()
+        self.running.set()
+
+    def run(self):
+        idx = 0
+        while self.running.is_set():
+            member = self.members[idx % len(self.members)]
+            idx += 1
+            start = time.perf_counter()
+            try:
+                self.qdrant_conn._search_members_uncached([member], "v1")
+                self.latencies.append(time.perf_counter() - start)
+            except Exception:
+                self.errors += 1
+
+    def stop(self) -> dict:
+        self.running.clear()
+        self.join()
+        latencies = sorted(self.latencies) or [float("nan")]
+        return {"searches": len(self.latencies), "failed": self.errors,
+                "p50 (ms)": statistics.median(latencies) * 1000,
+                "p95 (ms)": latencies[int(len(latencies) * 0.95)] * 1000}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--max-workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--qdrant-url", default=None, help="Qdrant server to use instead of an in-memory one")
+    args = parser.parse_args()
+
+    members = make_members(args.members)
+    db_config = {"url": args.qdrant_url} if args.qdrant_url else {"location": ":memory:"}
+    qdrant_conn = QdrantConnector(db_config=db_config, collection_prefix="bench_reindex")
+    qdrant_conn.insert_members_bulk(members, version_to_vectorize="v1")
+    targets = members[:1000]
+    max_workers_values = args.max_workers if args.qdrant_url else [1]
+
+    load = SearchLoad(qdrant_conn, targets)
+    load.start()
+    time.sleep(IDLE_SECONDS)
+    rows = [("idle", None, load.stop())]
+    for max_workers in max_workers_values:
+        reindexer = BlueGreenReindexer(qdrant_conn, InMemoryMemberSource(members), batch_size=args.batch_size,
+                                       max_workers=max_workers)
+        load = SearchLoad(qdrant_conn, targets)
+        load.start()
+        report = reindexer.reindex_collection(["v1"], suffix=f"w{max_workers}_{time.time_ns()}")
+        rows.append((f"reindex workers={max_workers}", report, load.stop()))
+    qdrant_conn.client.delete_collection(rows[-1][1]["collection"])
+
+    print(f"{'phase':>20} | {'members/sec':>11} | {'searches':>8} | {'failed':>6} | {'p50 (ms)':>8} | {'p95 (ms)':>8}")
+    for phase, report, search in rows:
+        rate = f"{sum(report['counts'].values()) / report['seconds']:>11.1f}" if report else f"{'':>11}"
+        print(f"{phase:>20} | {rate} | {search['searches']:>8} | {search['failed']:>6} | "
+              f"{search['p50 (ms)']:>8.2f} | {search['p95 (ms)']:>8.2f}")
@@ -0,0 +1,79 @@
+"""Benchmark confidence-gated reranking (`RerankGate` and a cheap model tier) against always calling the full model.
+
+Candidates come from an in-memory Qdrant filled with `--members` synthetic members. Both chat models are stubbed
+with fixed latencies: the cheap one picks the top candidate of its prompt with a confidence drawn uniformly from
+[0, 1) (seeded by the prompt), the full one always answers. Each `--margins` value is run over every member once,
+without the recommendation cache. Reported: share of requests decided by each tier, LLM calls per request and
+latency percentiles.
+
+Usage:
+    python -m llm_agent.benchmarks.bench_rerank_gate --members 200 --margins 0.02 0.05 0.1 --latency 1.0
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import re
+import statistics
+import time
+
+from langchain_core.messages import AIMessage
+
+from llm_agent.benchmarks._stubs import StubChatModel, make_members
+from llm_agent.connectors.qdrant_connector import QdrantConnector
+from llm_agent.src.rerank import LlmReranker, RerankGate, RERANK_CHEAP_MIN_CONFIDENCE
+
+TIERS = ["no_candidates", "few_candidates", "margin", "cheap_model", "full_model", "full_model_fallback"]
+
+
+class TopCandidateChatModel(StubChatModel):
+    """Stub answering the first candidate of the prompt with a pseudo-random confidence"""
+    def invoke(self, prompt, *args, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        member_no = re.search(r"`member_no`: (\d+)", prompt).group(1)
+        confidence = int(hashlib.md5(prompt.encode("utf-8")).hexdigest()[:8], 16) / 16 ** 8
+        return AIMessage(content=f'{{"member_no": {member_no}, "reason": "stub", "confidence": {confidence:.3f}}}')
+
+
+def bench(qdrant_conn: QdrantConnector, similar_items, members, gate: RerankGate, latency: float,
+          cheap_latency: float) -> dict:
+    chat_model = TopCandidateChatModel(latency)
+    cheap_chat_model = TopCandidateChatModel(cheap_latency) if cheap_latency is not None else None
+    reranker = LlmReranker(chat_model, qdrant_conn=qdrant_conn, cheap_chat_model=cheap_chat_model, gate=gate)
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):  # one `rerank_gate` line per request
+        for items, member in zip(similar_items, members):
+            start = time.perf_counter()
+            reranker._rerank_with_version(items, member, "v1")
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    calls = chat_model.calls + (cheap_chat_model.calls if cheap_chat_model else 0)
+    return {**{tier: gate.stats[tier] / len(members) for tier in TIERS},
+            "llm calls/req": calls / len(members),
+            "p50 (ms)": statistics.median(latencies) * 1000,
+            "p95 (ms)": latencies[int(len(latencies) * 0.95)] * 1000}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--margins", type=float, nargs="+", default=[0.02, 0.05, 0.1])
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds per call of the full model")
+    parser.add_argument("--cheap-latency", type=float, default=0.2, help="Seconds per call of the cheap model")
+    args = parser.parse_args()
+
+    members = make_members(args.members)
+    qdrant_conn = QdrantConnector(db_config={"location": ":memory:"}, collection_prefix="bench_rerank_gate")
+    qdrant_conn.insert_members_bulk(members, version_to_vectorize="v1")
+    similar_items = qdrant_conn.search_members_batch(members, "v1")
+    rows = {"always full model": bench(qdrant_conn, similar_items, members,
+                                       RerankGate(min_candidates=0, margin=None), args.latency, None)}
+    for margin in args.margins:
+        rows[f"gate margin={margin}"] = bench(qdrant_conn, similar_items, members, RerankGate(margin=margin),
+                                              args.latency, args.cheap_latency)
+    print(f"cheap model kept at confidence >= {RERANK_CHEAP_MIN_CONFIDENCE}")
+    columns = list(next(iter(rows.values())))
+    print(f"{'path':>20} | " + " | ".join(f"{column:>14}" for column in columns))
+    for path, row in rows.items():
+        print(f"{path:>20} | " + " | ".join(f"{row[column]:>14.2f}" for column in columns))
@@ -0,0 +1,46 @@
+"""Benchmark searching similar members by re-embedded text against searching by stored point vector.
+
+Both paths run on the same in-memory collection with the Redis search cache bypassed, and report how many
+targets per second are searched and how many results come back per target (the target itself is excluded).
+
+Usage:
+    python -m llm_agent.benchmarks.bench_search_by_id --members 2000 --targets 200 --batch-size 50
+"""
+import argparse
+import statistics
+import time
+
+from llm_agent.benchmarks._stubs import make_members
+from llm_agent.connectors.qdrant_connector import QdrantConnector
+
+
+def bench(qdrant_conn: QdrantConnector, targets, batch_size: int) -> dict:
+    start = time.perf_counter()
+    results = []
+    for i in range(0, len(targets), batch_size):
+        results.extend(qdrant_conn._search_members_uncached(targets[i:i + batch_size], "v1"))
+    elapsed = time.perf_counter() - start
+    return {"targets/sec": len(targets) / elapsed,
+            "results/target": statistics.mean(len(res) for res in results),
+            "self matches": sum(target.member_no in [point.id for point in res]
+                                for target, res in zip(targets, results))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--targets", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    members = make_members(args.members)
+    qdrant_conn = QdrantConnector(db_config={"location": ":memory:"}, collection_prefix="bench_search")
+    qdrant_conn.insert_members_bulk(members, version_to_vectorize="v1")
+    targets = members[:args.targets]
+
+    print(f"{'path':>8} | {'targets/sec':>11} | {'results/target':>14} | {'self matches':>12}")
+    for path, search_by_id in [("text", False), ("by id", True)]:
+        qdrant_conn.search_by_id = search_by_id
+        result = bench(qdrant_conn, targets, args.batch_size)
+        print(f"{path:>8} | {result['targets/sec']:>11.1f} | {result['results/target']:>14.1f} | "
+              f"{result['self matches']:>12}")
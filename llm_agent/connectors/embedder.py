@@ -0,0 +1,216 @@
+"""Embedding backends turning member documents and search queries into vectors.
+
+Both the write path (`QdrantConnector.insert_members*`) and the search path embed through an `Embedder`, then
+upsert / query explicit vectors:
+    - `FastEmbedEmbedder` (`fastembed`): local ONNX model. Batches are embedded in-process (ONNX spreads one batch
+      over `threads` cores) or, with `parallel`, spread over a pool of worker processes holding one model each
+      (data parallel, one core per worker by default). The pool stays up between calls, unlike fastembed's
+      `parallel` argument, which starts and loads a new pool on every call.
+    - `GeminiEmbedder` (`gemini`): remote Gemini embedding model, `batch_size` documents per request and up to
+      `max_concurrency` requests in flight.
+
+The backend and model are part of the collection layout (vector name and size): switching them needs a
+re-index into new collections (`reindex_qdrant`).
+"""
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# `fastembed` (local) or `gemini` (remote)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "fastembed")
+# Default model of `QdrantClient.add`, which wrote the existing collections
+FASTEMBED_MODEL = os.getenv("FASTEMBED_MODEL", "BAAI/bge-small-en")
+GEMINI_EMBEDDINGS_MODEL = os.getenv("GEMINI_EMBEDDINGS_MODEL", "models/embedding-001")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+# Worker processes embedding batches in parallel: unset = in-process, 0 = one per core
+EMBED_PARALLEL = int(os.environ["EMBED_PARALLEL"]) if os.getenv("EMBED_PARALLEL") else None
+# ONNX threads per model: unset = all cores in-process, 1 per worker process
+EMBED_THREADS = int(os.environ["EMBED_THREADS"]) if os.getenv("EMBED_THREADS") else None
+GEMINI_EMBED_BATCH_SIZE = int(os.getenv("GEMINI_EMBED_BATCH_SIZE", 100))  # API limit per batch request
+GEMINI_EMBED_MAX_CONCURRENCY = int(os.getenv("GEMINI_EMBED_MAX_CONCURRENCY", 4))
+
+
+class Embedder:
+    """Interface of the embedding backends
+
+    Attributes:
+        model_name (str): Model name, stored with every point and part of the cache keys
+    """
+    model_name: str
+
+    @property
+    def vector_name(self) -> str:
+        """Named vector of the points embedded by this model"""
+        raise NotImplementedError
+
+    @property
+    def dim(self) -> int:
+        raise NotImplementedError
+
+    def embed_documents(self, documents: List[str], batch_size: Optional[int] = None,
+                        parallel: Optional[int] = None) -> List[np.ndarray]:
+        """Vectors of `documents` (float32), in order
+
+        Args:
+            documents (List[str]): Documents to index
+            batch_size (int, optional): Documents per model call / request. Defaults to the embedder's.
+            parallel (int, optional): Worker processes (local backends). Defaults to the embedder's.
+        """
+        raise NotImplementedError
+
+    def embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """Vectors of search `queries` (float32), in order"""
+        raise NotImplementedError
+
+
+@functools.lru_cache(maxsize=None)
+def _fastembed_model(model_name: str, threads: Optional[int] = None):
+    from fastembed import TextEmbedding
+    return TextEmbedding(model_name=model_name, threads=threads)
+
+
+# Model of a worker process, loaded once by `_init_fastembed_worker`
+_worker_model = None
+
+
+def _init_fastembed_worker(model_name: str, threads: Optional[int]):
+    global _worker_model
+    _worker_model = _fastembed_model(model_name, threads)
+
+
+def _fastembed_worker_embed(documents: List[str]) -> np.ndarray:
+    return np.asarray(list(_worker_model.embed(documents, batch_size=len(documents))), dtype=np.float32)
+
+
+class FastEmbedEmbedder(Embedder):
+    """Local fastembed model (see module docstring)
+
+    Args:
+        model_name (str, optional): fastembed model. Defaults to FASTEMBED_MODEL.
+        batch_size (int, optional): Documents per ONNX call. Defaults to EMBED_BATCH_SIZE.
+        parallel (int, optional): Worker processes; None embeds in-process, 0 starts one per core.
+            Defaults to EMBED_PARALLEL.
+        threads (int, optional): ONNX threads per model. Defaults to EMBED_THREADS (all cores in-process, 1 per
+            worker process, so `parallel` workers use `parallel` cores).
+    """
+    def __init__(self,
+                 model_name: str = FASTEMBED_MODEL,
+                 batch_size: int = EMBED_BATCH_SIZE,
+                 parallel: Optional[int] = EMBED_PARALLEL,
+                 threads: Optional[int] = EMBED_THREADS):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.parallel = parallel
+        self.threads = threads
+        self._pools: Dict[int, ProcessPoolExecutor] = {}
+
+    @property
+    def model(self):
+        return _fastembed_model(self.model_name, self.threads)
+
+    @property
+    def vector_name(self) -> str:
+        # Same name as `QdrantClient.add` gives the vectors of its fastembed model
+        return f"fast-{self.model_name.split('/')[-1].lower()}"
+
+    @functools.cached_property
+    def dim(self) -> int:
+        from fastembed import TextEmbedding
+
+        for description in TextEmbedding.list_supported_models():
+            if description["model"] == self.model_name:
+                return description["dim"]
+        return len(self.embed_queries(["dim"])[0])
+
+    def _pool(self, workers: int) -> ProcessPoolExecutor:
+        """Worker processes of `workers` models, started on first use and kept for the next calls"""
+        if workers not in self._pools:
+            # Not `fork`: a forked copy of a running ONNX session can deadlock
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pools[workers] = ProcessPoolExecutor(max_workers=workers,
+                                                       mp_context=multiprocessing.get_context(method),
+                                                       initializer=_init_fastembed_worker,
+                                                       initargs=(self.model_name, self.threads or 1))
+        return self._pools[workers]
+
+    def embed_documents(self, documents: List[str], batch_size: Optional[int] = None,
+                        parallel: Optional[int] = None) -> List[np.ndarray]:
+        batch_size = batch_size or self.batch_size
+        parallel = self.parallel if parallel is None else parallel
+        if parallel == 0:
+            parallel = os.cpu_count()
+        # A single batch is faster in-process than shipped to a worker
+        if not parallel or len(documents) <= batch_size:
+            return [np.asarray(vector, dtype=np.float32)
+                    for vector in self.model.embed(documents, batch_size=batch_size)]
+        batches = [documents[start:start + batch_size] for start in range(0, len(documents), batch_size)]
+        return [vector for vectors in self._pool(parallel).map(_fastembed_worker_embed, batches) for vector in vectors]
+
+    def embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        return [np.asarray(vector, dtype=np.float32) for vector in self.model.query_embed(queries)]
+
+    def close(self):
+        """Stop the worker processes"""
+        for pool in self._pools.values():
+            pool.shutdown()
+        self._pools = {}
+
+
+class GeminiEmbedder(Embedder):
+    """Remote Gemini embedding model (see module docstring)
+
+    Args:
+        model_name (str, optional): Gemini embedding model. Defaults to GEMINI_EMBEDDINGS_MODEL.
+        batch_size (int, optional): Documents per request. Defaults to GEMINI_EMBED_BATCH_SIZE.
+        max_concurrency (int, optional): Requests in flight. Defaults to GEMINI_EMBED_MAX_CONCURRENCY.
+        api_key (str, optional): Defaults to GOOGLE_API_KEY.
+    """
+    def __init__(self,
+                 model_name: str = GEMINI_EMBEDDINGS_MODEL,
+                 batch_size: int = GEMINI_EMBED_BATCH_SIZE,
+                 max_concurrency: int = GEMINI_EMBED_MAX_CONCURRENCY,
+                 api_key: Optional[str] = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="gemini-embed")
+
+    @functools.cached_property
+    def model(self):
+        from llm_agent.src.utils import LlmType, ModelSetup
+
+        return ModelSetup(llm_type=LlmType.GEMINI_EMBEDDINGS,
+                          model_params={"model": self.model_name, "google_api_key": self.api_key})()
+
+    @property
+    def vector_name(self) -> str:
+        return f"gemini-{self.model_name.split('/')[-1].lower()}"
+
+    @functools.cached_property
+    def dim(self) -> int:
+        return len(self.embed_queries(["dim"])[0])
+
+    def embed_documents(self, documents: List[str], batch_size: Optional[int] = None,
+                        parallel: Optional[int] = None) -> List[np.ndarray]:
+        batch_size = batch_size or self.batch_size
+        batches = [documents[start:start + batch_size] for start in range(0, len(documents), batch_size)]
+        return [np.asarray(vector, dtype=np.float32)
+                for vectors in self._executor.map(self.model.embed_documents, batches) for vector in vectors]
+
+    def embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        return [np.asarray(vector, dtype=np.float32) for vector in self._executor.map(self.model.embed_query, queries)]
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedder(backend: str = EMBEDDING_BACKEND) -> Embedder:
+    """Embedder of `backend`, shared by the connectors of the process (one model / worker pool)"""
+    if backend == "fastembed":
+        return FastEmbedEmbedder()
+    if backend == "gemini":
+        return GeminiEmbedder()
+    raise ValueError(f"Unknown embedding backend {backend!r} (expected 'fastembed' or 'gemini')")
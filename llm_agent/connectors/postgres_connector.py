@@ -1,8 +1,14 @@
+import asyncio
+import datetime
 import json
-from typing import List
+from contextlib import contextmanager
+from typing import Dict, List, Iterator, Tuple, Set
 
-import psycopg2
+import asyncpg
+from psycopg2.extras import execute_values
 
+from llm_agent.connectors.redis_connector import invalidate_members
+from llm_agent.connectors.resources import get_pg_pool, PgConnectionPool, PG_POOL_MIN_CONN, PG_POOL_MAX_CONN
 from llm_agent.src.utils import Member
 
 PG_HOST = "localhost"
@@ -22,6 +28,28 @@ MEMBER_INFO_COLS = [
     "updated_at",
     "versions"
 ]
+# Columns needed to build a `Member`
+MEMBER_COLS = [
+    "member_no",
+    "name",
+    "company",
+    "title",
+    "background",
+    "company_url",
+    "linkedin_url",
+    "summary",
+    "versions"
+]
+# Rows sent per `execute_values` statement
+WRITE_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 100
+# Rows updated within this lag are left to the next sync, so transactions still in flight are not skipped
+SYNC_SAFETY_LAG = "1 minute"
+# Enrichment job rows older than this are deleted when a new job starts
+ENRICHMENT_JOB_RETENTION = "30 days"
+# (last synced `updated_at`, last synced `member_no`) of a version
+Watermark = Tuple[datetime.datetime, int]
+INITIAL_WATERMARK: Watermark = (datetime.datetime.min, -1)
 
 CREATE_MEMBER_TABLE_QUERY = """
     CREATE TABLE IF NOT EXISTS member_info (
@@ -37,11 +65,30 @@ CREATE_MEMBER_TABLE_QUERY = """
         updated_at TIMESTAMP DEFAULT NOW(),
         versions JSONB
     );
+    CREATE INDEX IF NOT EXISTS member_info_updated_at_idx ON member_info (updated_at, member_no);
+    CREATE INDEX IF NOT EXISTS member_info_versions_idx ON member_info USING GIN (versions jsonb_path_ops);
+    CREATE TABLE IF NOT EXISTS member_sync_watermark (
+        version VARCHAR(32) PRIMARY KEY,
+        last_updated_at TIMESTAMP NOT NULL,
+        last_member_no INT NOT NULL,
+        synced_at TIMESTAMP DEFAULT NOW()
+    );
+    CREATE TABLE IF NOT EXISTS member_enrichment_job (
+        job_id VARCHAR(128) NOT NULL,
+        member_no INT NOT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'pending',
+        attempts INT NOT NULL DEFAULT 0,
+        error TEXT,
+        input_hash VARCHAR(64),
+        updated_at TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (job_id, member_no)
+    );
+    ALTER TABLE member_enrichment_job ADD COLUMN IF NOT EXISTS input_hash VARCHAR(64);
     """
 
 INSERT_MEMBER_INFO_QUERY = """
          INSERT INTO member_info (member_no, name, company, title, background, company_url, linkedin_url, summary, versions)
-         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+         VALUES %s
          ON CONFLICT (member_no) DO UPDATE
          SET name = EXCLUDED.name,
              company = EXCLUDED.company,
@@ -50,7 +97,71 @@ INSERT_MEMBER_INFO_QUERY = """
              company_url = EXCLUDED.company_url,
              linkedin_url = EXCLUDED.linkedin_url,
              summary = EXCLUDED.summary,
-             versions = EXCLUDED.versions;
+             versions = EXCLUDED.versions,
+             updated_at = NOW()
+         WHERE (member_info.name, member_info.company, member_info.title, member_info.background,
+                member_info.company_url, member_info.linkedin_url, member_info.summary, member_info.versions)
+               IS DISTINCT FROM
+               (EXCLUDED.name, EXCLUDED.company, EXCLUDED.title, EXCLUDED.background,
+                EXCLUDED.company_url, EXCLUDED.linkedin_url, EXCLUDED.summary, EXCLUDED.versions);
+         """
+
+# Insert only members that do not exist yet, returning the `member_no` of the inserted rows
+INSERT_NEW_MEMBER_INFO_QUERY = """
+         INSERT INTO member_info (member_no, name, company, title, background, company_url, linkedin_url, summary, versions)
+         VALUES %s
+         ON CONFLICT (member_no) DO NOTHING
+         RETURNING member_no;
+         """
+
+# Write back LLM summaries without touching `updated_at`, so enrichment does not re-trigger the sync
+UPDATE_MEMBER_SUMMARY_QUERY = """
+         UPDATE member_info
+         SET summary = data.summary
+         FROM (VALUES %s) AS data (member_no, summary)
+         WHERE member_info.member_no = data.member_no;
+         """
+
+UPSERT_SYNC_WATERMARK_QUERY = """
+         INSERT INTO member_sync_watermark (version, last_updated_at, last_member_no, synced_at)
+         VALUES (%s, %s, %s, NOW())
+         ON CONFLICT (version) DO UPDATE
+         SET last_updated_at = EXCLUDED.last_updated_at,
+             last_member_no = EXCLUDED.last_member_no,
+             synced_at = EXCLUDED.synced_at;
+         """
+
+# Move a watermark back only, so changes after the given one are synced again
+REWIND_SYNC_WATERMARK_QUERY = """
+         UPDATE member_sync_watermark
+         SET last_updated_at = %s, last_member_no = %s, synced_at = NOW()
+         WHERE version = %s AND (last_updated_at, last_member_no) > (%s, %s);
+         """
+
+# Per-member state of an enrichment job: `pending`, `done` or `failed` (with the last error), for the member
+# input it was reached with (`input_hash`); a member registered again with another input is pending again
+INSERT_ENRICHMENT_JOB_QUERY = """
+         INSERT INTO member_enrichment_job (job_id, member_no, input_hash)
+         VALUES %s
+         ON CONFLICT (job_id, member_no) DO UPDATE
+         SET input_hash = EXCLUDED.input_hash,
+             status = 'pending',
+             attempts = 0,
+             error = NULL,
+             updated_at = NOW()
+         WHERE member_enrichment_job.input_hash IS DISTINCT FROM EXCLUDED.input_hash;
+         """
+
+UPDATE_ENRICHMENT_JOB_QUERY = """
+         UPDATE member_enrichment_job
+         SET status = data.status,
+             error = data.error,
+             attempts = member_enrichment_job.attempts + 1,
+             updated_at = NOW()
+         FROM (VALUES %s) AS data (job_id, member_no, status, error, input_hash)
+         WHERE member_enrichment_job.job_id = data.job_id
+           AND member_enrichment_job.member_no = data.member_no
+           AND member_enrichment_job.input_hash IS NOT DISTINCT FROM data.input_hash;
          """
 
 # Database connection details
@@ -62,26 +173,37 @@ pg_config = {
 
 
 class PostgresConnector:
-    def __init__(self, db_config: dict = None):
+    """Postgres connector borrowing connections from the process-wide pool of `db_config`"""
+    def __init__(self, db_config: dict = None, pool: PgConnectionPool = None):
         if db_config is None:
             db_config = pg_config
         self.db_config = db_config
-        self._connect()
+        self.pool = pool or get_pg_pool(db_config)
+
+    @contextmanager
+    def _cursor(self, commit: bool = False):
+        """Borrow a connection for the duration of the block and release it afterwards"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                yield cursor
+            if commit:
+                conn.commit()
 
-    def _connect(self):
-        self.conn = psycopg2.connect(**self.db_config)
-        self.cursor = self.conn.cursor()
+    def health_check(self) -> bool:
+        return self.pool.health_check()
 
+    def pool_stats(self) -> dict:
+        return self.pool.stats()
 
     def create_table(self, query: str = CREATE_MEMBER_TABLE_QUERY):
-        self.cursor.execute(query)
+        with self._cursor(commit=True) as cursor:
+            cursor.execute(query)
 
-    def update_member_info(self, members: List[Member]):
-        """ Update member info in the Postgres database
-        Args:
-            members (List[Member]): List of Member objects to update in the database
-        """
-        data = [(
+    @staticmethod
+    def _member_rows(members: List[Member]) -> List[tuple]:
+        # One row per `member_no` (the last one wins): a multi-row upsert cannot touch the same row twice
+        members = {member.member_no: member for member in members}.values()
+        return [(
             member.member_no,
             member.name,
             member.company,
@@ -92,23 +214,146 @@ class PostgresConnector:
             member.summary,
             json.dumps(member.versions)
         ) for member in members]
+
+    def update_member_info(self, members: List[Member], page_size: int = WRITE_PAGE_SIZE):
+        """ Update member info in the Postgres database
+
+        `updated_at` is bumped only for rows whose content actually changed, and cached results computed
+        for the updated members are invalidated.
+
+        Args:
+            members (List[Member]): List of Member objects to update in the database
+            page_size (int, optional): Rows sent per statement. Defaults to WRITE_PAGE_SIZE.
+        """
+        data = self._member_rows(members)
         if data:
-            self.cursor.executemany(INSERT_MEMBER_INFO_QUERY, data)
-            self.conn.commit()
+            with self._cursor(commit=True) as cursor:
+                execute_values(cursor, INSERT_MEMBER_INFO_QUERY, data, page_size=page_size)
+            invalidate_members([row[0] for row in data])
         else:
             print("No data to update.")
 
+    def insert_new_members(self, members: List[Member], page_size: int = WRITE_PAGE_SIZE) -> Set[int]:
+        """ Insert members whose `member_no` does not exist yet, leaving existing rows untouched
+
+        Returns:
+            Set[int]: `member_no` of the inserted members
+        """
+        data = self._member_rows(members)
+        if not data:
+            return set()
+        with self._cursor(commit=True) as cursor:
+            inserted = execute_values(cursor, INSERT_NEW_MEMBER_INFO_QUERY, data, page_size=page_size, fetch=True)
+        return {row[0] for row in inserted}
+
+    def get_existing_member_nos(self, member_nos: List[int]) -> Set[int]:
+        """ Subset of `member_nos` already stored, checked with a single query"""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT member_no FROM member_info WHERE member_no = ANY(%s);", (list(member_nos),))
+            return {row[0] for row in cursor.fetchall()}
+
+    def update_member_summaries(self, members: List[Member]):
+        """ Write back `summary` of existing members, leaving `updated_at` (the sync watermark) untouched"""
+        data = [(member.member_no, member.summary) for member in members]
+        if data:
+            with self._cursor(commit=True) as cursor:
+                execute_values(cursor, UPDATE_MEMBER_SUMMARY_QUERY, data)
+
+    def get_sync_watermark(self, version: str) -> Watermark:
+        """ Last synced (`updated_at`, `member_no`) of `version`, or INITIAL_WATERMARK if never synced"""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT last_updated_at, last_member_no FROM member_sync_watermark WHERE version = %s;",
+                           (version,))
+            row = cursor.fetchone()
+        return tuple(row) if row else INITIAL_WATERMARK
+
+    def set_sync_watermark(self, version: str, watermark: Watermark):
+        with self._cursor(commit=True) as cursor:
+            cursor.execute(UPSERT_SYNC_WATERMARK_QUERY, (version, *watermark))
+
+    def rewind_sync_watermark(self, version: str, watermark: Watermark) -> bool:
+        """ Move the sync watermark of `version` back to `watermark` if it is past it (a version never synced
+        is left as is, its next sync is a full one)
+
+        Returns:
+            bool: Whether the watermark was moved back
+        """
+        with self._cursor(commit=True) as cursor:
+            cursor.execute(REWIND_SYNC_WATERMARK_QUERY, (*watermark, version, *watermark))
+            return cursor.rowcount > 0
+
+    def create_enrichment_job(self, job_id: str, input_hashes: Dict[int, str]):
+        """ Register the members of `input_hashes` (`member_no` -> hash of the enrichment input) as pending in
+        `job_id`; members registered with the same hash keep their state, so re-creating the job of an
+        interrupted run resumes it, while members whose input changed since are pending again"""
+        data = [(job_id, member_no, input_hash) for member_no, input_hash in input_hashes.items()]
+        with self._cursor(commit=True) as cursor:
+            cursor.execute("DELETE FROM member_enrichment_job WHERE updated_at < NOW() - %s::interval;",
+                           (ENRICHMENT_JOB_RETENTION,))
+            if data:
+                execute_values(cursor, INSERT_ENRICHMENT_JOB_QUERY, data, page_size=WRITE_PAGE_SIZE)
+
+    def get_enrichment_todo(self, job_id: str, max_attempts: int) -> Set[int]:
+        """ `member_no` of `job_id` still to enrich: pending, or failed fewer than `max_attempts` times"""
+        with self._cursor() as cursor:
+            cursor.execute("""
+                SELECT member_no FROM member_enrichment_job
+                WHERE job_id = %s AND (status = 'pending' OR (status = 'failed' AND attempts < %s));
+                """, (job_id, max_attempts))
+            return {row[0] for row in cursor.fetchall()}
+
+    def get_enrichment_job_counts(self, job_id: str) -> Dict[str, int]:
+        """ Number of members of `job_id` per status"""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT status, COUNT(*) FROM member_enrichment_job WHERE job_id = %s GROUP BY status;",
+                           (job_id,))
+            return dict(cursor.fetchall())
+
+    def checkpoint_enrichment(self, job_id: str, done: List[Member], failed: List[Tuple[int, str]],
+                              input_hashes: Dict[int, str]):
+        """ Write back the summaries of `done` and record the job state of `done` and `failed`
+        (`member_no`, error) in one transaction; the state is left as is for members registered again with
+        another input (`input_hashes`, see `create_enrichment_job`) in the meantime"""
+        states = ([(job_id, member.member_no, "done", None, input_hashes[member.member_no]) for member in done]
+                  + [(job_id, member_no, "failed", error, input_hashes[member_no]) for member_no, error in failed])
+        if not states:
+            return
+        with self._cursor(commit=True) as cursor:
+            if done:
+                execute_values(cursor, UPDATE_MEMBER_SUMMARY_QUERY,
+                               [(member.member_no, member.summary) for member in done])
+            execute_values(cursor, UPDATE_ENRICHMENT_JOB_QUERY, states)
+
     def get_member_info_by_id(self, member_no: int, to_member_object: bool = False):
         select_query = """
         SELECT * FROM member_info WHERE member_no = %s;
         """
-        self.cursor.execute(select_query, (member_no,))
-        member_info = self.cursor.fetchall()
+        with self._cursor() as cursor:
+            cursor.execute(select_query, (member_no,))
+            member_info = cursor.fetchall()
         return self._to_member(member_info) if to_member_object else member_info
 
 
-    def _to_member(self, data: List[tuple]):
-        res_dict = [{k: v for k,v in zip(MEMBER_INFO_COLS, i)} for i in data]
+    def get_members_by_ids(self, member_nos: List[int]) -> List[Member]:
+        """ Get members for all `member_nos` with a single query (missing ids are skipped)"""
+        select_query = """
+        SELECT * FROM member_info WHERE member_no = ANY(%s) ORDER BY member_no;
+        """
+        with self._cursor() as cursor:
+            cursor.execute(select_query, (list(member_nos),))
+            return self._to_member(cursor.fetchall())
+
+    def get_members_by_range(self, member_no_start: int, member_no_end: int) -> List[Member]:
+        """ Get members with `member_no` between `member_no_start` and `member_no_end` (inclusive)"""
+        select_query = """
+        SELECT * FROM member_info WHERE member_no BETWEEN %s AND %s ORDER BY member_no;
+        """
+        with self._cursor() as cursor:
+            cursor.execute(select_query, (member_no_start, member_no_end))
+            return self._to_member(cursor.fetchall())
+
+    def _to_member(self, data: List[tuple], cols: List[str] = MEMBER_INFO_COLS):
+        res_dict = [{k: v for k,v in zip(cols, i)} for i in data]
         res_member = [Member(**i) for i in res_dict]
         return res_member
 
@@ -126,10 +371,119 @@ class PostgresConnector:
               )
         ORDER BY member_no;
         """
-        self.cursor.execute(query)
-        member_info = self.cursor.fetchall()
+        with self._cursor() as cursor:
+            cursor.execute(query)
+            member_info = cursor.fetchall()
         return self._to_member(member_info)
 
+    def iter_member_changes(self,
+                            version: str = 'v1',
+                            since: Watermark = INITIAL_WATERMARK,
+                            batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Tuple[List[Member], Watermark]]:
+        """ Stream members of `version` changed after the `since` watermark, in batches of `Member`
+
+        Rows are ordered by (`updated_at`, `member_no`) and each batch is one keyset query (`LIMIT batch_size`
+        after the last row of the previous batch), which is served by `member_info_updated_at_idx`, while the
+        version flag is served by the GIN index on `versions`. Every query borrows a pooled connection only for
+        its own duration, so no connection or transaction stays open while the caller processes a batch (which
+        would hold back vacuum). The upper bound (`NOW()` minus SYNC_SAFETY_LAG) is fixed at the first query.
+
+        Args:
+            version (str, optional): Version flag to filter on. Defaults to 'v1'.
+            since (Watermark, optional): Last synced (`updated_at`, `member_no`). Defaults to INITIAL_WATERMARK
+                (all members, i.e. a full re-vectorization).
+            batch_size (int, optional): Members per yielded batch. Defaults to STREAM_BATCH_SIZE.
+
+        Yields:
+            Tuple[List[Member], Watermark]: next batch of members and the watermark right after that batch
+        """
+        query = f"""
+        SELECT {', '.join(MEMBER_COLS)}, updated_at
+        FROM member_info
+        WHERE versions @> %s::jsonb
+          AND (updated_at, member_no) > (%s, %s)
+          AND updated_at < %s
+        ORDER BY updated_at, member_no
+        LIMIT %s;
+        """
+        with self._cursor() as cursor:
+            cursor.execute("SELECT NOW() - %s::interval;", (SYNC_SAFETY_LAG,))
+            until = cursor.fetchone()[0]
+        watermark = since
+        while True:
+            with self._cursor() as cursor:
+                cursor.execute(query, (json.dumps({version: True}), *watermark, until, batch_size))
+                batch = cursor.fetchall()
+            if not batch:
+                return
+            watermark = (batch[-1][-1], batch[-1][0])
+            yield self._to_member([row[:-1] for row in batch], MEMBER_COLS), watermark
+            if len(batch) < batch_size:
+                return
+
+
+class AsyncPostgresConnector:
+    """asyncio counterpart of the read path of `PostgresConnector`, backed by an `asyncpg` pool
+
+    The pool is created on first use inside the running event loop.
+    """
+    def __init__(self, db_config: dict = None, min_size: int = PG_POOL_MIN_CONN, max_size: int = PG_POOL_MAX_CONN):
+        if db_config is None:
+            db_config = pg_config
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+
+    @staticmethod
+    async def _init_connection(conn):
+        await conn.set_type_codec('jsonb', encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(**self.db_config,
+                                                           min_size=self.min_size,
+                                                           max_size=self.max_size,
+                                                           init=self._init_connection)
+        return self._pool
+
+    async def _fetch_members(self, query: str, *args) -> List[Member]:
+        pool = await self._get_pool()
+        rows = await pool.fetch(query, *args)
+        return [Member(**dict(row)) for row in rows]
+
+    async def health_check(self) -> bool:
+        try:
+            pool = await self._get_pool()
+            return await pool.fetchval("SELECT 1;") == 1
+        except (asyncpg.PostgresError, OSError):
+            return False
+
+    async def get_member_info_by_id(self, member_no: int, to_member_object: bool = False):
+        if to_member_object:
+            return await self._fetch_members(f"SELECT {', '.join(MEMBER_COLS)} FROM member_info WHERE member_no = $1;",
+                                             member_no)
+        pool = await self._get_pool()
+        rows = await pool.fetch("SELECT * FROM member_info WHERE member_no = $1;", member_no)
+        return [tuple(row) for row in rows]
+
+    async def get_members_by_ids(self, member_nos: List[int]) -> List[Member]:
+        return await self._fetch_members(f"SELECT {', '.join(MEMBER_COLS)} FROM member_info "
+                                         f"WHERE member_no = ANY($1::int[]) ORDER BY member_no;", list(member_nos))
+
+    async def get_members_by_range(self, member_no_start: int, member_no_end: int) -> List[Member]:
+        return await self._fetch_members(f"SELECT {', '.join(MEMBER_COLS)} FROM member_info "
+                                         f"WHERE member_no BETWEEN $1 AND $2 ORDER BY member_no;",
+                                         member_no_start, member_no_end)
+
+    async def aclose(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
 
 if __name__ == "__main__":
     pg_conn = PostgresConnector()
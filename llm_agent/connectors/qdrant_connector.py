@@ -1,17 +1,47 @@
-from typing import List, Optional, Dict, Union
+from __future__ import annotations
 
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import QueryResponse
-from qdrant_client.models import VectorParams, Distance
+import asyncio
+import hashlib
+import os
+from collections import defaultdict
+from typing import List, Optional, Dict, Tuple, Union, Iterator, Literal, TYPE_CHECKING
 
-from llm_agent.connectors.redis_connector import redis_member_ver_cache
+import numpy as np
+from pydantic import BaseModel, Field
+
+from llm_agent.connectors.embedder import Embedder, get_embedder, EMBED_BATCH_SIZE
+from llm_agent.connectors.redis_connector import (redis_member_ver_cache, async_redis_member_ver_cache, get_generation,
+                                                  aget_generation, bump_generation, LayeredCache)
+from llm_agent.connectors.resources import get_qdrant_client, get_async_qdrant_client
 from llm_agent.src.utils import Member
 
+if TYPE_CHECKING:
+    # `qdrant_client` is imported when the first client is created, not when this module is imported
+    from qdrant_client import QdrantClient, AsyncQdrantClient
+    from qdrant_client.http.models import QueryResponse
+    from qdrant_client.models import Distance
+
 QDRANT_HOST = "localhost"
 QDRANT_PORT = 6333
-VECTOR_SIZE = 100
 RETURN_TOP_K = 5
+UPSERT_CHUNK_SIZE = 1024
+EXPORT_PAGE_SIZE = 2048
 MEMBER_COLLECTION_PREFIX = "member_enhanced"
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", 30*24*60*60))  # 30 days in seconds
+# Payload field holding the hash of the embedded document, compared to skip unchanged members
+CONTENT_HASH_FIELD = "content_hash"
+EMBEDDING_MODEL_FIELD = "embedding_model"
+# Search indexed members with their stored vector (query by point id) instead of embedding their text
+SEARCH_BY_ID = os.getenv("SEARCH_BY_ID", "true").lower() in ("1", "true", "yes")
+# Storage layout: one collection per version (`per_version`) or one collection with named vectors (`multi_vector`)
+QDRANT_LAYOUT = os.getenv("QDRANT_LAYOUT", "per_version")
+MULTI_VECTOR_COLLECTION = os.getenv("MULTI_VECTOR_COLLECTION", MEMBER_COLLECTION_PREFIX + "_multi")
+MULTI_VECTOR_VERSIONS = os.getenv("MULTI_VECTOR_VERSIONS", "v1,v2").split(",")
+VERSION_FLAG_PREFIX = "in_"
+# Collection profile of every version, and per-version overrides as "v1=balanced,v2=low_memory"
+QDRANT_COLLECTION_PROFILE = os.getenv("QDRANT_COLLECTION_PROFILE", "default")
+QDRANT_VERSION_PROFILES = dict(item.split("=", 1) for item in os.getenv("QDRANT_VERSION_PROFILES", "").split(",")
+                               if "=" in item)
 
 # Qdrant connection details
 qdrant_config = {
@@ -20,82 +50,453 @@ qdrant_config = {
 }
 
 
+class CollectionProfile(BaseModel):
+    """Storage and search settings of a collection (None keeps the Qdrant default)
+
+    With quantization, the quantized vectors are searched (kept in RAM with `quantization_always_ram`) and the
+    `oversampling` x limit best candidates are rescored with the original vectors, which can then live on disk
+    (`on_disk_vectors`).
+    """
+    name: str = Field(..., title="Profile name, part of the search cache namespace")
+    hnsw_m: Optional[int] = Field(None, title="Edges per node of the HNSW graph")
+    hnsw_ef_construct: Optional[int] = Field(None, title="Neighbours considered while building the HNSW graph")
+    search_ef: Optional[int] = Field(None, title="Neighbours considered at search time")
+    quantization: Optional[Literal["scalar", "binary"]] = Field(None, title="Vector quantization")
+    quantization_always_ram: bool = Field(True, title="Keep the quantized vectors in RAM")
+    rescore: bool = Field(True, title="Rescore quantized search results with the original vectors")
+    oversampling: Optional[float] = Field(None, title="Candidates fetched per result before rescoring")
+    on_disk_vectors: bool = Field(False, title="Keep the original vectors on disk (memory-mapped)")
+    on_disk_payload: bool = Field(False, title="Keep the payload on disk")
+
+    def hnsw_config(self):
+        from qdrant_client.models import HnswConfigDiff
+
+        if self.hnsw_m is None and self.hnsw_ef_construct is None:
+            return None
+        return HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def quantization_config(self):
+        from qdrant_client.models import (ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+                                          BinaryQuantization, BinaryQuantizationConfig)
+
+        if self.quantization == "scalar":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99,
+                                                                      always_ram=self.quantization_always_ram))
+        if self.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=self.quantization_always_ram))
+        return None
+
+    def search_params(self):
+        from qdrant_client.models import SearchParams, QuantizationSearchParams
+
+        if self.search_ef is None and self.quantization is None:
+            return None
+        quantization = QuantizationSearchParams(rescore=self.rescore, oversampling=self.oversampling) \
+            if self.quantization else None
+        return SearchParams(hnsw_ef=self.search_ef, quantization=quantization)
+
+
+COLLECTION_PROFILES = {
+    # Qdrant defaults, everything in RAM
+    "default": CollectionProfile(name="default"),
+    # Denser graph and wider search for the best recall, everything in RAM
+    "high_recall": CollectionProfile(name="high_recall", hnsw_m=32, hnsw_ef_construct=256, search_ef=256),
+    # int8 vectors in RAM (1/4 of the float32 size), originals on disk for rescoring
+    "balanced": CollectionProfile(name="balanced", hnsw_m=16, hnsw_ef_construct=128, search_ef=128,
+                                  quantization="scalar", oversampling=2.0, on_disk_vectors=True),
+    # 1-bit vectors in RAM (1/32 of the float32 size), originals and payload on disk
+    "low_memory": CollectionProfile(name="low_memory", hnsw_m=16, hnsw_ef_construct=100, search_ef=128,
+                                    quantization="binary", oversampling=3.0, on_disk_vectors=True,
+                                    on_disk_payload=True),
+}
+
+
+def version_profiles(
+        profiles: Optional[Dict[str, Union[str, CollectionProfile]]] = None) -> Dict[str, CollectionProfile]:
+    """Per-version profiles: `profiles` (names or profiles) over QDRANT_VERSION_PROFILES"""
+    merged = {**QDRANT_VERSION_PROFILES, **(profiles or {})}
+    return {version: COLLECTION_PROFILES[profile] if isinstance(profile, str) else profile
+            for version, profile in merged.items()}
+
+
+def member_search_text(member: Member) -> str:
+    """Query text used to search similar members of `member`"""
+    member_str = member.summary
+    if not member_str:
+        member_str = f"{member.name} {member.company} {member.title} {member.background}"
+    return member_str
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _exclude_ids_filter(member_nos: List[int]):
+    from qdrant_client.models import Filter, HasIdCondition
+    return Filter(must_not=[HasIdCondition(has_id=list(member_nos))])
+
+
+def _to_query_response(point, document_field: str = "document") -> QueryResponse:
+    """`ScoredPoint` of `query_points` -> the `QueryResponse` returned by `client.query`"""
+    from qdrant_client.fastembed_common import QueryResponse
+    payload = point.payload or {}
+    return QueryResponse(id=point.id, embedding=None, sparse_embedding=None, metadata=payload,
+                         document=payload.get(document_field, ""), score=point.score)
+
+
+async def _no_results() -> list:
+    return []
+
+
+# Vectors by (embedding model, document hash), shared by every collection and sync run
+EMBEDDING_CACHE = LayeredCache("embedding", ttl=EMBEDDING_CACHE_TTL)
+
 
 class QdrantConnector:
     """Qdrant connector class to insert and search members"""
     def __init__(self,
                  db_config: dict = None,
-                 collection_prefix: str = MEMBER_COLLECTION_PREFIX):
+                 collection_prefix: str = MEMBER_COLLECTION_PREFIX,
+                 client: QdrantClient = None,
+                 embedding_cache: LayeredCache = None,
+                 search_by_id: bool = SEARCH_BY_ID,
+                 profiles: Optional[Dict[str, Union[str, CollectionProfile]]] = None,
+                 embedder: Optional[Embedder] = None):
         if not db_config:
             db_config = qdrant_config
-        self.db_config = qdrant_config
+        self.db_config = db_config
         self.collection_prefix = collection_prefix
-        self.client = QdrantClient(**db_config)
-
-    def _create_collection(self,
-                           collection_name: str,
-                           vector_size: int = VECTOR_SIZE,
-                           distance: Distance = Distance.COSINE):
-        if not self.client.collection_exists(collection_name):
-            self.client.create_collection(
-                collection_name=collection_name,
-                vectors_config=VectorParams(size=vector_size, distance=distance)
-            )
-            print(f"Collection {collection_name} created successfully")
-
-    def _insert(self, collection: str,member_str: List[str], member_no: List[int]) -> None:
-        # self._create_collection(collection_name=collection)
-        self.client.add(
+        # Share one client (and its HTTP connection pool) per config across the process
+        self.client = client or get_qdrant_client(db_config)
+        self.embedding_cache = embedding_cache or EMBEDDING_CACHE
+        self.search_by_id = search_by_id
+        self.profiles = version_profiles(profiles)
+        # Embeds documents and queries; the vectors are upserted / searched explicitly
+        self.embedder = embedder or get_embedder()
+
+    def profile(self, version: str) -> CollectionProfile:
+        """Collection profile of `version` (QDRANT_COLLECTION_PROFILE unless overridden)"""
+        return self.profiles.get(version) or COLLECTION_PROFILES[QDRANT_COLLECTION_PROFILE]
+
+    def collection_name(self, version: str) -> str:
+        """Collection holding the points of `version` (one collection per version); an alias of the collection
+        built by the last blue/green re-index (`reindex_qdrant`), if any"""
+        return self.collection_prefix + "_" + version
+
+    def staging_connector(self, suffix: str) -> QdrantConnector:
+        """Connector with the same client and settings writing to new collections (`<prefix>__<suffix>_<version>`),
+        which the blue/green re-index builds before pointing the current collection names at them"""
+        return QdrantConnector(db_config=self.db_config, collection_prefix=f"{self.collection_prefix}__{suffix}",
+                               client=self.client, embedding_cache=self.embedding_cache,
+                               search_by_id=self.search_by_id, profiles=self.profiles, embedder=self.embedder)
+
+    def _vector_name(self, version: str) -> str:
+        return self.embedder.vector_name
+
+    def _document_field(self, version: str) -> str:
+        return "document"
+
+    def _search_filter(self, version: str, exclude_member_no: Optional[int] = None):
+        """Filter of the points searchable in `version`, without `exclude_member_no`"""
+        return _exclude_ids_filter([exclude_member_no]) if exclude_member_no is not None else None
+
+    def cache_namespace(self, version: str) -> str:
+        """Cache namespace of search results in `version`: collection, its generation, the embedding model and
+        the search mode"""
+        collection = self.collection_name(version)
+        return (f"{collection}:g{get_generation(collection)}:{self.embedder.model_name}:"
+                f"{'id' if self.search_by_id else 'text'}:{self.profile(version).name}")
+
+    def invalidate_collection_cache(self, collection: str):
+        """Invalidate cached searches / recommendations of `collection` after its points changed"""
+        bump_generation(collection)
+
+    def health_check(self) -> bool:
+        try:
+            self.client.get_collections()
+            return True
+        except Exception:
+            return False
+
+    def _vector_params(self, profile: CollectionProfile):
+        """Vector size and distance of the embedding model, storage and index settings of `profile`"""
+        from qdrant_client.models import VectorParams, Distance
+
+        return VectorParams(size=self.embedder.dim, distance=Distance.COSINE, on_disk=profile.on_disk_vectors or None,
+                            quantization_config=profile.quantization_config(), hnsw_config=profile.hnsw_config())
+
+    def _ensure_collection(self, version: str):
+        """Create the collection of `version` with its profile; the vector size follows the embedding model"""
+        collection = self.collection_name(version)
+        if self.client.collection_exists(collection):
+            return
+        profile = self.profile(version)
+        self.client.create_collection(collection_name=collection,
+                                      vectors_config={self._vector_name(version): self._vector_params(profile)},
+                                      on_disk_payload=profile.on_disk_payload or None)
+        print(f"Collection {collection} created successfully with profile {profile.name}")
+
+    def update_collection_profile(self, version: str, profile: Optional[Union[str, CollectionProfile]] = None):
+        """Apply `profile` (defaults to the configured one) to the existing collection of `version`
+
+        Qdrant rebuilds the HNSW graph / quantized vectors in the background; searches keep working meanwhile.
+        """
+        from qdrant_client.models import VectorParamsDiff, CollectionParamsDiff, Disabled
+
+        profile = COLLECTION_PROFILES[profile] if isinstance(profile, str) else profile or self.profile(version)
+        collection = self.collection_name(version)
+        self.client.update_collection(
             collection_name=collection,
-            documents=member_str,
-            ids=member_no
-        )
+            vectors_config={self._vector_name(version): VectorParamsDiff(
+                hnsw_config=profile.hnsw_config(),
+                quantization_config=profile.quantization_config() or Disabled.DISABLED,
+                on_disk=profile.on_disk_vectors)},
+            collection_params=CollectionParamsDiff(on_disk_payload=profile.on_disk_payload))
+        self.profiles[version] = profile
+        self.invalidate_collection_cache(collection)
+        print(f"Collection {collection} updated to profile {profile.name}")
+
+    def _stored_hashes(self, version: str, member_nos: List[int]) -> Dict[int, str]:
+        """`member_no` -> content hash of the points already stored (if embedded with the current model)"""
+        collection = self.collection_name(version)
+        if not self.client.collection_exists(collection):
+            return {}
+        points = self.client.retrieve(collection_name=collection,
+                                      ids=member_nos,
+                                      with_payload=[CONTENT_HASH_FIELD, EMBEDDING_MODEL_FIELD],
+                                      with_vectors=False)
+        return {point.id: point.payload.get(CONTENT_HASH_FIELD) for point in points
+                if point.payload.get(EMBEDDING_MODEL_FIELD) == self.embedder.model_name}
 
-    def _search(self, member_str: str, version: str, return_top_k: int = RETURN_TOP_K) -> List[QueryResponse]:
-        search_results = self.client.query(
-            collection_name=self.collection_prefix + "_" + version,
-            query_text=member_str,
-            limit=return_top_k
+    def _embed(self, documents: List[str], batch_size: int = EMBED_BATCH_SIZE,
+               parallel: Optional[int] = None) -> Tuple[Dict[str, np.ndarray], int]:
+        """Vectors of `documents` by content hash: cached ones are reused, only the rest is embedded
+
+        Returns:
+            Tuple[Dict[str, np.ndarray], int]: Vectors by content hash and the number of documents embedded
+        """
+        model_name = self.embedder.model_name
+        by_hash = {content_hash(doc): doc for doc in documents}
+        cache_keys = {f"{self.embedding_cache.name}:{model_name}:{doc_hash}": doc_hash for doc_hash in by_hash}
+        cached = self.embedding_cache.get_many(list(cache_keys))
+        vectors = {cache_keys[key]: vector for key, vector in cached.items()}
+        missing = [doc_hash for doc_hash in by_hash if doc_hash not in vectors]
+        if missing:
+            embeddings = self.embedder.embed_documents([by_hash[doc_hash] for doc_hash in missing],
+                                                       batch_size=batch_size, parallel=parallel)
+            new_vectors = dict(zip(missing, embeddings))
+            self.embedding_cache.set_many({f"{self.embedding_cache.name}:{model_name}:{doc_hash}": vector
+                                           for doc_hash, vector in new_vectors.items()})
+            vectors.update(new_vectors)
+        return vectors, len(missing)
+
+    def _upsert_members(self,
+                        version: str,
+                        members: List[Member],
+                        batch_size: int = EMBED_BATCH_SIZE,
+                        parallel: Optional[int] = None,
+                        skip_unchanged: bool = True) -> Dict[str, int]:
+        """Write `members` to the collection of `version`, embedding only documents that are not stored or cached yet
+
+        Returns:
+            Dict[str, int]: Counts of `embedded`, `reused` (vector from the embedding cache or a duplicate
+                document) and `skipped` (unchanged point) members
+        """
+        from qdrant_client.models import PointStruct
+
+        documents = [self._member_document(member) for member in members]
+        hashes = [content_hash(doc) for doc in documents]
+        stored = self._stored_hashes(version, [member.member_no for member in members]) if skip_unchanged else {}
+        changed = [idx for idx, member in enumerate(members) if stored.get(member.member_no) != hashes[idx]]
+        counts = {"embedded": 0, "reused": 0, "skipped": len(members) - len(changed)}
+        if not changed:
+            return counts
+
+        vectors, counts["embedded"] = self._embed([documents[idx] for idx in changed],
+                                                  batch_size=batch_size, parallel=parallel)
+        counts["reused"] = len(changed) - counts["embedded"]
+        collection = self.collection_name(version)
+        self._ensure_collection(version)
+        vector_name = self._vector_name(version)
+        points = [PointStruct(id=members[idx].member_no,
+                              vector={vector_name: vectors[hashes[idx]].tolist()},
+                              payload={"document": documents[idx],
+                                       CONTENT_HASH_FIELD: hashes[idx],
+                                       EMBEDDING_MODEL_FIELD: self.embedder.model_name})
+                  for idx in changed]
+        self.client.upload_points(collection_name=collection, points=points, batch_size=batch_size, wait=True)
+        return counts
+
+    def _embed_queries(self, texts: List[str]) -> List[np.ndarray]:
+        return self.embedder.embed_queries(texts) if texts else []
+
+    def _query_vectors(self, queries: List[Tuple[Optional[int], List[float]]], version: str,
+                       return_top_k: int = RETURN_TOP_K) -> List[List[QueryResponse]]:
+        """One `query_batch_points` request for (member_no to exclude, query vector) pairs"""
+        from qdrant_client.models import QueryRequest
+
+        if not queries:
+            return []
+        vector_name = self._vector_name(version)
+        document_field = self._document_field(version)
+        responses = self.client.query_batch_points(
+            collection_name=self.collection_name(version),
+            requests=[QueryRequest(query=list(vector), using=vector_name,
+                                   filter=self._search_filter(version, member_no),
+                                   params=self.profile(version).search_params(), limit=return_top_k,
+                                   with_payload=[document_field])
+                      for member_no, vector in queries]
         )
-        return search_results
+        return [[_to_query_response(point, document_field) for point in response.points] for response in responses]
+
+    def _search(self, member_str: str, version: str, return_top_k: int = RETURN_TOP_K,
+                exclude_member_no: Optional[int] = None) -> List[QueryResponse]:
+        return self._search_batch([member_str], version, return_top_k,
+                                  [exclude_member_no] if exclude_member_no is not None else None)[0]
+
+    def _search_batch(self, member_strs: List[str], version: str, return_top_k: int = RETURN_TOP_K,
+                      exclude_member_nos: Optional[List[int]] = None) -> List[List[QueryResponse]]:
+        """Embed `member_strs` in one call and search them in one request, each without its member"""
+        exclude_member_nos = exclude_member_nos or [None] * len(member_strs)
+        return self._query_vectors(list(zip(exclude_member_nos, self._embed_queries(member_strs))), version,
+                                   return_top_k)
+
+    def _stored_vectors(self, version: str, member_nos: List[int]) -> Dict[int, List[float]]:
+        """Stored vectors of the members of `member_nos` already indexed in `version`"""
+        collection = self.collection_name(version)
+        if not self.client.collection_exists(collection):
+            return {}
+        vector_name = self._vector_name(version)
+        points = self.client.retrieve(collection_name=collection, ids=member_nos, with_payload=False,
+                                      with_vectors=[vector_name])
+        return {point.id: point.vector[vector_name] for point in points if vector_name in (point.vector or {})}
+
+    def _search_batch_by_vector(self, vectors: Dict[int, List[float]], version: str,
+                                return_top_k: int = RETURN_TOP_K) -> List[List[QueryResponse]]:
+        """Nearest members of each stored vector, excluding its own point (no embedding)"""
+        return self._query_vectors(list(vectors.items()), version, return_top_k)
+
+    def _search_members_uncached(self, members: List[Member], version: str) -> List[List[QueryResponse]]:
+        """Search by stored vector for indexed members (when `search_by_id`) and by text for the rest"""
+        vectors = self._stored_vectors(version, [member.member_no for member in members]) \
+            if self.search_by_id else {}
+        by_id = [idx for idx, member in enumerate(members) if member.member_no in vectors]
+        by_text = [idx for idx, member in enumerate(members) if member.member_no not in vectors]
+        results = [None] * len(members)
+        if by_id:
+            id_results = self._search_batch_by_vector({members[idx].member_no: vectors[members[idx].member_no]
+                                                       for idx in by_id}, version)
+            for idx, res in zip(by_id, id_results):
+                results[idx] = res
+        if by_text:
+            text_results = self._search_batch([self._member_query(members[idx]) for idx in by_text], version,
+                                              exclude_member_nos=[members[idx].member_no for idx in by_text])
+            for idx, res in zip(by_text, text_results):
+                results[idx] = res
+        return results
+
+    @staticmethod
+    def _member_query(member: Member) -> str:
+        return member_search_text(member)
+
+    @staticmethod
+    def _member_document(member: Member) -> str:
+        member_str = member.summary
+        if not member_str:
+            member_str = f"Member info: {member.name} {member.company} {member.title} {member.background}"
+        return member_str
+
+    @staticmethod
+    def _group_by_version(members: List[Member],
+                          version_to_vectorize: Optional[str] = None) -> Dict[str, List[Member]]:
+        grouped = defaultdict(list)
+        for member in members:
+            versions = [version_to_vectorize] if version_to_vectorize else list(member.versions)
+            for version in versions:
+                if member.versions.get(version, False):
+                    grouped[version].append(member)
+        return grouped
+
+    def insert_members_bulk(self,
+                            members: List[Member],
+                            version_to_vectorize: Optional[str] = None,
+                            batch_size: int = EMBED_BATCH_SIZE,
+                            chunk_size: int = UPSERT_CHUNK_SIZE,
+                            parallel: Optional[int] = None,
+                            skip_unchanged: bool = True) -> Dict[str, int]:
+        """Insert members into Qdrant in batches
+
+        Members are grouped by version (same version rules as `insert_members`), then each group is
+        handled in chunks of `chunk_size` documents: members whose stored point already has the same content
+        hash are skipped, vectors of known documents come from the embedding cache, and only new text is
+        embedded (`batch_size` documents per embedding call and upsert request).
+
+        Args:
+            members (List[Member]): List of members to insert
+            version_to_vectorize (Optional[str], optional): Version to vectorize. Defaults to None.
+            batch_size (int, optional): Documents per embedding call and upsert request. Defaults to EMBED_BATCH_SIZE.
+            chunk_size (int, optional): Documents held in memory per collection at once. Defaults to UPSERT_CHUNK_SIZE.
+            parallel (Optional[int], optional): Number of worker processes embedding batches in parallel.
+                Defaults to None (the embedder's setting, EMBED_PARALLEL).
+            skip_unchanged (bool, optional): Skip members whose stored point has the same content hash.
+                Defaults to True.
+
+        Returns:
+            Dict[str, int]: Number of points written per collection
+        """
+        inserted = defaultdict(int)
+        totals = {"embedded": 0, "reused": 0, "skipped": 0}
+        for version, version_members in self._group_by_version(members, version_to_vectorize).items():
+            collection = self.collection_name(version)
+            written = 0
+            for start in range(0, len(version_members), chunk_size):
+                counts = self._upsert_members(version, version_members[start:start + chunk_size],
+                                              batch_size=batch_size, parallel=parallel, skip_unchanged=skip_unchanged)
+                written += counts["embedded"] + counts["reused"]
+                for name, count in counts.items():
+                    totals[name] += count
+            inserted[collection] += written
+            if written:
+                self.invalidate_collection_cache(collection)
+        inserted = dict(inserted)
+        print(f"{len(members)} Members inserted successfully in bulk: {inserted} "
+              f"(embedded: {totals['embedded']}, reused: {totals['reused']}, skipped: {totals['skipped']})")
+        return inserted
 
     def insert_members(self, members: List[Member], version_to_vectorize: Optional[str] = None) -> None:
         """Insert members into Qdrant
 
         Update different versions by `member.versions` flags (and validate the version flag is True).
         If `version_to_vectorize` is provided, only vectorize the specified version,
-        otherwise, vectorize all versions.
+        otherwise, vectorize all versions. Unchanged members are skipped (see `insert_members_bulk`).
 
         Args:
             members (List[Member]): List of members to insert
             version_to_vectorize (Optional[str], optional): Version to vectorize. Defaults to None.
         """
         # Update by members
+        collections = set()
+        totals = {"embedded": 0, "reused": 0, "skipped": 0}
         for member in members:
-            member_str = member.summary
-            if not member_str:
-                member_str = f"Member info: {member.name} {member.company} {member.title} {member.background}"
-
+            for version, version_members in self._group_by_version([member], version_to_vectorize).items():
+                counts = self._upsert_members(version, version_members)
+                if counts["embedded"] or counts["reused"]:
+                    collections.add(self.collection_name(version))
+                for name, count in counts.items():
+                    totals[name] += count
+        for collection in collections:
+            self.invalidate_collection_cache(collection)
+        print(f"{len(members)} Members inserted successfully "
+              f"(embedded: {totals['embedded']}, reused: {totals['reused']}, skipped: {totals['skipped']})")
 
-            if version_to_vectorize:
-                if member.versions.get(version_to_vectorize, False):
-                    self._insert(self.collection_prefix + "_" + version_to_vectorize,
-                                [member_str],
-                                [member.member_no])
-            else:
-                for version, is_using in member.versions.items():
-                    if is_using:
-                        self._insert(self.collection_prefix + "_" + version,
-                                    [member_str],
-                                    [member.member_no])
-        print(f"{len(members)} Members inserted successfully")
-
-    @redis_member_ver_cache()
+    @redis_member_ver_cache(key_fields=member_search_text, key_prefix="search_member")
     def search_member(self, member: Member, version: str) -> List[QueryResponse]:
-        member_str = member.summary
-        if not member_str:
-            member_str = f"{member.name} {member.company} {member.title} {member.background}"
-        search_results = self._search(member_str, version=version)
+        """`RETURN_TOP_K` most similar members of `member` in `version`, never `member` itself"""
+        vectors = self._stored_vectors(version, [member.member_no]) if self.search_by_id else {}
+        if vectors:
+            return self._search_batch_by_vector(vectors, version=version)[0]
+        member_str = self._member_query(member)
+        search_results = self._search(member_str, version=version, exclude_member_no=member.member_no)
         return search_results
 
 
@@ -110,8 +511,65 @@ class QdrantConnector:
             search_results.append(res)
         return search_results
 
+    def search_members_batch(self, members: List[Member], version: str) -> List[Dict[str, List[QueryResponse]]]:
+        """Search similar members of all `members` in `version` with batched Qdrant requests
+
+        Shares the `search_member` cache: hits are looked up with one MGET and only the misses are searched
+        (one batch by stored vector for indexed members, one batch by text for the others).
+
+        Returns:
+            List[Dict[str, List[QueryResponse]]]: `{version: results}` per member, aligned with `members`
+        """
+        if not members:
+            return []
+        search_results = QdrantConnector.search_member.get_many(self, members, version)
+        missing = [idx for idx in range(len(members)) if idx not in search_results]
+        if missing:
+            missing_members = [members[idx] for idx in missing]
+            missing_results = self._search_members_uncached(missing_members, version)
+            QdrantConnector.search_member.set_many(self, missing_members, version, missing_results)
+            search_results.update(zip(missing, missing_results))
+        return [{version: search_results[idx]} for idx in range(len(members))]
+
+    def count_members(self, version: str) -> int:
+        """Number of points stored in `version` (0 if its collection does not exist)"""
+        collection = self.collection_name(version)
+        if not self.client.collection_exists(collection):
+            return 0
+        return self.client.count(collection_name=collection, count_filter=self._search_filter(version),
+                                 exact=True).count
+
+    def export_vectors(self, version: str,
+                       page_size: int = EXPORT_PAGE_SIZE) -> Iterator[Tuple[List[int], np.ndarray, List[str]]]:
+        """Page through every point of `version` with its stored vector, without embedding anything
+
+        Yields:
+            Tuple[List[int], np.ndarray, List[str]]: `member_no`, vectors (float32, one row each) and documents
+                of a page of points
+        """
+        collection = self.collection_name(version)
+        if not self.client.collection_exists(collection):
+            return
+        vector_name = self._vector_name(version)
+        document_field = self._document_field(version)
+        offset = None
+        while True:
+            points, offset = self.client.scroll(collection_name=collection,
+                                                scroll_filter=self._search_filter(version),
+                                                limit=page_size,
+                                                offset=offset,
+                                                with_payload=[document_field],
+                                                with_vectors=[vector_name])
+            if points:
+                yield ([point.id for point in points],
+                       np.asarray([point.vector[vector_name] for point in points], dtype=np.float32),
+                       [point.payload.get(document_field, "") for point in points])
+            if offset is None:
+                return
+
     def delete_collection(self, collection_name: str):
         self.client.delete_collection(collection_name)
+        self.invalidate_collection_cache(collection_name)
         print(f"Collection {collection_name} deleted successfully")
 
     def list_collections(self):
@@ -122,6 +580,530 @@ class QdrantConnector:
         return res
 
 
+class MultiVectorQdrantConnector(QdrantConnector):
+    """`QdrantConnector` storing every version in one collection, with one named vector per version
+
+    A member is one point (id `member_no`) whatever the number of versions it is enabled for. Each version has
+    its own named vector, document, content hash and embedding model fields, and an indexed boolean flag
+    (`in_<version>`) that restricts searches to the members of that version; the flag is cleared when the
+    member's version flag is turned off. Searches of several versions go out as one batched request
+    (`search_members`).
+
+    The async search path of this layout is `AsyncMultiVectorQdrantConnector`.
+
+    Args:
+        db_config (dict, optional): Qdrant connection details. Defaults to `qdrant_config`.
+        collection (str, optional): Collection holding all versions. Defaults to MULTI_VECTOR_COLLECTION.
+        versions (List[str], optional): Versions with a named vector; fixed when the collection is created.
+            Defaults to MULTI_VECTOR_VERSIONS.
+        client (QdrantClient, optional): Defaults to the shared client of `db_config`.
+        embedding_cache (LayeredCache, optional): Defaults to EMBEDDING_CACHE.
+        search_by_id (bool, optional): Search indexed members with their stored vector. Defaults to SEARCH_BY_ID.
+        profiles (Dict[str, Union[str, CollectionProfile]], optional): Profile of each named vector (the payload
+            is on disk if any version asks for it). Defaults to QDRANT_VERSION_PROFILES.
+        embedder (Embedder, optional): Defaults to the configured backend (`get_embedder`).
+    """
+    def __init__(self,
+                 db_config: dict = None,
+                 collection: str = MULTI_VECTOR_COLLECTION,
+                 versions: Optional[List[str]] = None,
+                 client: QdrantClient = None,
+                 embedding_cache: LayeredCache = None,
+                 search_by_id: bool = SEARCH_BY_ID,
+                 profiles: Optional[Dict[str, Union[str, CollectionProfile]]] = None,
+                 embedder: Optional[Embedder] = None):
+        super().__init__(db_config=db_config, collection_prefix=collection, client=client,
+                         embedding_cache=embedding_cache, search_by_id=search_by_id, profiles=profiles,
+                         embedder=embedder)
+        self.collection = collection
+        self.versions = list(versions or MULTI_VECTOR_VERSIONS)
+
+    def collection_name(self, version: str) -> str:
+        return self.collection
+
+    def staging_connector(self, suffix: str) -> MultiVectorQdrantConnector:
+        return MultiVectorQdrantConnector(db_config=self.db_config, collection=f"{self.collection}__{suffix}",
+                                          versions=self.versions, client=self.client,
+                                          embedding_cache=self.embedding_cache, search_by_id=self.search_by_id,
+                                          profiles=self.profiles, embedder=self.embedder)
+
+    def _vector_name(self, version: str) -> str:
+        return version
+
+    def _document_field(self, version: str) -> str:
+        return f"document_{version}"
+
+    @staticmethod
+    def _version_flag(version: str) -> str:
+        return f"{VERSION_FLAG_PREFIX}{version}"
+
+    def _search_filter(self, version: str, exclude_member_no: Optional[int] = None):
+        from qdrant_client.models import Filter, FieldCondition, MatchValue, HasIdCondition
+
+        return Filter(must=[FieldCondition(key=self._version_flag(version), match=MatchValue(value=True))],
+                      must_not=[HasIdCondition(has_id=[exclude_member_no])] if exclude_member_no is not None else None)
+
+    def _ensure_collection(self, version: str):
+        from qdrant_client.models import PayloadSchemaType
+
+        if self.client.collection_exists(self.collection):
+            return
+        profiles = {version: self.profile(version) for version in self.versions}
+        # Same size and distance as the per-version collections, one profile per vector
+        vectors_config = {version: self._vector_params(profile) for version, profile in profiles.items()}
+        self.client.create_collection(collection_name=self.collection,
+                                      vectors_config=vectors_config,
+                                      on_disk_payload=any(profile.on_disk_payload for profile in profiles.values())
+                                      or None)
+        for version in self.versions:
+            self.client.create_payload_index(collection_name=self.collection,
+                                             field_name=self._version_flag(version),
+                                             field_schema=PayloadSchemaType.BOOL)
+        print(f"Collection {self.collection} created successfully with vectors "
+              f"{ {version: profile.name for version, profile in profiles.items()} }")
+
+    def _stored_points(self, member_nos: List[int]):
+        """Stored points of `member_nos` with their vectors and payload, by `member_no`"""
+        if not self.client.collection_exists(self.collection):
+            return {}
+        points = self.client.retrieve(collection_name=self.collection, ids=member_nos, with_payload=True,
+                                      with_vectors=True)
+        return {point.id: point for point in points}
+
+    @staticmethod
+    def _embedding_model_field(version: str) -> str:
+        return f"{EMBEDDING_MODEL_FIELD}_{version}"
+
+    def _stored_hash(self, point, version: str) -> Optional[str]:
+        # A cleared version flag (see `_clear_disabled_versions`) is rewritten even if the document is unchanged
+        if (point is None or not point.payload.get(self._version_flag(version))
+                or point.payload.get(self._embedding_model_field(version)) != self.embedder.model_name):
+            return None
+        return point.payload.get(f"{CONTENT_HASH_FIELD}_{version}")
+
+    def _stored_hashes(self, version: str, member_nos: List[int]) -> Dict[int, str]:
+        hashes = {member_no: self._stored_hash(point, version)
+                  for member_no, point in self._stored_points(member_nos).items()}
+        return {member_no: doc_hash for member_no, doc_hash in hashes.items() if doc_hash is not None}
+
+    def _write_points(self, rows: List[Tuple[int, str, List[float], str]], stored: dict,
+                      batch_size: int = EMBED_BATCH_SIZE):
+        """Write (member_no, version, vector, document) rows as one point per member
+
+        Points are rewritten with the vectors and payload fields of their other versions (from `stored`, see
+        `_stored_points`), so writing one version keeps the others.
+        """
+        from qdrant_client.models import PointStruct
+
+        unknown = {version for _, version, _, _ in rows} - set(self.versions)
+        if unknown:
+            raise ValueError(f"Versions {sorted(unknown)} have no vector in {self.collection} "
+                             f"(versions: {self.versions})")
+        self._ensure_collection(rows[0][1])  # one collection holds every version
+        points = {}
+        for member_no, version, vector, document in rows:
+            if member_no not in points:
+                point = stored.get(member_no)
+                points[member_no] = PointStruct(id=member_no,
+                                                vector=dict(point.vector) if point else {},
+                                                payload=dict(point.payload) if point else {})
+            points[member_no].vector[version] = list(vector)
+            points[member_no].payload.update({self._document_field(version): document,
+                                              f"{CONTENT_HASH_FIELD}_{version}": content_hash(document),
+                                              self._embedding_model_field(version): self.embedder.model_name,
+                                              self._version_flag(version): True})
+        self.client.upload_points(collection_name=self.collection, points=list(points.values()),
+                                  batch_size=batch_size, wait=True)
+
+    def _upsert_member_versions(self,
+                                member_versions: List[Tuple[Member, str]],
+                                batch_size: int = EMBED_BATCH_SIZE,
+                                parallel: Optional[int] = None,
+                                skip_unchanged: bool = True) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Write (member, version) pairs, all versions of a member in one point and one embedded document
+
+        Returns:
+            Tuple[Dict[str, int], Dict[str, int]]: Counts of `embedded`, `reused` and `skipped` vectors (as in
+                `QdrantConnector._upsert_members`) and the number of vectors written per version
+        """
+        documents = [self._member_document(member) for member, _ in member_versions]
+        stored = self._stored_points(list({member.member_no for member, _ in member_versions}))
+        changed = [idx for idx, (member, version) in enumerate(member_versions)
+                   if not skip_unchanged
+                   or self._stored_hash(stored.get(member.member_no), version) != content_hash(documents[idx])]
+        counts = {"embedded": 0, "reused": 0, "skipped": len(member_versions) - len(changed)}
+        written = defaultdict(int)
+        if not changed:
+            return counts, written
+
+        vectors, counts["embedded"] = self._embed([documents[idx] for idx in changed],
+                                                  batch_size=batch_size, parallel=parallel)
+        counts["reused"] = len(changed) - counts["embedded"]
+        self._write_points([(member_versions[idx][0].member_no, member_versions[idx][1],
+                             vectors[content_hash(documents[idx])].tolist(), documents[idx])
+                            for idx in changed],
+                           stored=stored,
+                           batch_size=batch_size)
+        for idx in changed:
+            written[member_versions[idx][1]] += 1
+        return counts, written
+
+    def _clear_disabled_versions(self, members: List[Member],
+                                 version_to_vectorize: Optional[str] = None) -> Dict[str, int]:
+        """Clear the `in_<version>` flag of the stored points of `members` whose version flag is off, so they
+        stop showing up in the searches of that version
+
+        Returns:
+            Dict[str, int]: Number of points cleared per version
+        """
+        versions = [version for version in ([version_to_vectorize] if version_to_vectorize else self.versions)
+                    if version in self.versions]
+        disabled = {version: {member.member_no for member in members if not member.versions.get(version, False)}
+                    for version in versions}
+        member_nos = set().union(*disabled.values())
+        if not member_nos or not self.client.collection_exists(self.collection):
+            return {}
+        points = self.client.retrieve(collection_name=self.collection, ids=list(member_nos),
+                                      with_payload=[self._version_flag(version) for version in versions],
+                                      with_vectors=False)
+        cleared = {}
+        for version in versions:
+            flag = self._version_flag(version)
+            stale = [point.id for point in points
+                     if point.id in disabled[version] and (point.payload or {}).get(flag)]
+            if stale:
+                self.client.set_payload(collection_name=self.collection, payload={flag: False}, points=stale,
+                                        wait=True)
+                cleared[version] = len(stale)
+        return cleared
+
+    def _upsert_members(self,
+                        version: str,
+                        members: List[Member],
+                        batch_size: int = EMBED_BATCH_SIZE,
+                        parallel: Optional[int] = None,
+                        skip_unchanged: bool = True) -> Dict[str, int]:
+        counts, _ = self._upsert_member_versions([(member, version) for member in members], batch_size=batch_size,
+                                                 parallel=parallel, skip_unchanged=skip_unchanged)
+        return counts
+
+    def insert_members_bulk(self,
+                            members: List[Member],
+                            version_to_vectorize: Optional[str] = None,
+                            batch_size: int = EMBED_BATCH_SIZE,
+                            chunk_size: int = UPSERT_CHUNK_SIZE,
+                            parallel: Optional[int] = None,
+                            skip_unchanged: bool = True) -> Dict[str, int]:
+        """Same as `QdrantConnector.insert_members_bulk`, writing every version of a member in one point (and
+        clearing the versions turned off, see `_clear_disabled_versions`)
+
+        Returns:
+            Dict[str, int]: Number of vectors written per version
+        """
+        inserted = defaultdict(int)
+        cleared = defaultdict(int)
+        totals = {"embedded": 0, "reused": 0, "skipped": 0}
+        for start in range(0, len(members), chunk_size):
+            for version, count in self._clear_disabled_versions(members[start:start + chunk_size],
+                                                                version_to_vectorize).items():
+                cleared[version] += count
+            grouped = self._group_by_version(members[start:start + chunk_size], version_to_vectorize)
+            member_versions = [(member, version) for version, version_members in grouped.items()
+                               for member in version_members]
+            counts, written = self._upsert_member_versions(member_versions, batch_size=batch_size, parallel=parallel,
+                                                           skip_unchanged=skip_unchanged)
+            for name, count in counts.items():
+                totals[name] += count
+            for version, count in written.items():
+                inserted[version] += count
+        if any(inserted.values()) or cleared:
+            self.invalidate_collection_cache(self.collection)
+        print(f"{len(members)} Members inserted successfully in bulk into {self.collection}: {dict(inserted)} "
+              f"(embedded: {totals['embedded']}, reused: {totals['reused']}, skipped: {totals['skipped']}"
+              f"{f', cleared: {dict(cleared)}' if cleared else ''})")
+        return dict(inserted)
+
+    def import_vectors(self, rows: List[Tuple[int, str, List[float], str]],
+                       batch_size: int = UPSERT_CHUNK_SIZE) -> Dict[str, int]:
+        """Write already embedded (member_no, version, vector, document) rows, e.g. exported from the per-version
+        layout. Rows whose version is already stored with the same document are skipped.
+
+        Returns:
+            Dict[str, int]: Number of vectors written per version
+        """
+        stored = self._stored_points(list({member_no for member_no, _, _, _ in rows}))
+        rows = [(member_no, version, vector, document) for member_no, version, vector, document in rows
+                if self._stored_hash(stored.get(member_no), version) != content_hash(document)]
+        written = defaultdict(int)
+        for _, version, _, _ in rows:
+            written[version] += 1
+        if rows:
+            self._write_points(rows, stored=stored, batch_size=batch_size)
+        return dict(written)
+
+    def _query_batch(self, queries: List[Tuple[str, int, List[float]]],
+                     return_top_k: int = RETURN_TOP_K) -> List[List[QueryResponse]]:
+        """One `query_batch_points` request for (version, member_no to exclude, query vector) triples"""
+        from qdrant_client.models import QueryRequest
+
+        if not queries:
+            return []
+        responses = self.client.query_batch_points(
+            collection_name=self.collection,
+            requests=[QueryRequest(query=list(vector), using=version, filter=self._search_filter(version, member_no),
+                                   params=self.profile(version).search_params(), limit=return_top_k,
+                                   with_payload=[self._document_field(version)])
+                      for version, member_no, vector in queries]
+        )
+        return [[_to_query_response(point, self._document_field(version)) for point in response.points]
+                for (version, _, _), response in zip(queries, responses)]
+
+    def _search_pairs_uncached(self, pairs: List[Tuple[Member, str]]) -> List[List[QueryResponse]]:
+        """Search all (member, version) pairs with one retrieve, one embedding call and one query request"""
+        stored = {}
+        if self.search_by_id and pairs and self.client.collection_exists(self.collection):
+            points = self.client.retrieve(collection_name=self.collection,
+                                          ids=list({member.member_no for member, _ in pairs}),
+                                          with_payload=False,
+                                          with_vectors=sorted({version for _, version in pairs}))
+            stored = {(point.id, version): vector for point in points
+                      for version, vector in (point.vector or {}).items()}
+        by_text = [idx for idx, (member, version) in enumerate(pairs) if (member.member_no, version) not in stored]
+        text_vectors = dict(zip(by_text, self._embed_queries([self._member_query(pairs[idx][0]) for idx in by_text])))
+        return self._query_batch([(version, member.member_no,
+                                   stored.get((member.member_no, version), text_vectors.get(idx)))
+                                  for idx, (member, version) in enumerate(pairs)])
+
+    def _search_members_uncached(self, members: List[Member], version: str) -> List[List[QueryResponse]]:
+        return self._search_pairs_uncached([(member, version) for member in members])
+
+    def search_members(self, members: List[Member],
+                       version_to_search: Optional[str] = None) -> List[Dict[str, List[QueryResponse]]]:
+        """Same as `QdrantConnector.search_members`, with the searches of every (member, version) pair that is not
+        cached sent as one batched request"""
+        pairs = []
+        for idx, member in enumerate(members):
+            if not version_to_search:
+                versions = [version for version, is_using in member.versions.items() if is_using]
+            else:
+                versions = [version_to_search] if member.versions.get(version_to_search, False) else []
+            pairs.extend((idx, version) for version in versions)
+        search_results = [{} for _ in members]
+        missing = []
+        for version in {version for _, version in pairs}:
+            version_idx = [idx for idx, pair_version in pairs if pair_version == version]
+            cached = QdrantConnector.search_member.get_many(self, [members[idx] for idx in version_idx], version)
+            for pos, idx in enumerate(version_idx):
+                if pos in cached:
+                    search_results[idx][version] = cached[pos]
+                else:
+                    missing.append((idx, version))
+        results = self._search_pairs_uncached([(members[idx], version) for idx, version in missing])
+        for (idx, version), result in zip(missing, results):
+            search_results[idx][version] = result
+        for version in {version for _, version in missing}:
+            version_missing = [(idx, result) for (idx, pair_version), result in zip(missing, results)
+                               if pair_version == version]
+            QdrantConnector.search_member.set_many(self, [members[idx] for idx, _ in version_missing], version,
+                                                   [result for _, result in version_missing])
+        return search_results
+
+
+def make_qdrant_connector(layout: str = QDRANT_LAYOUT, **kwargs) -> QdrantConnector:
+    """Connector of the configured storage layout: one collection per version (`per_version`) or one collection
+    with a named vector per version (`multi_vector`)"""
+    if layout == "multi_vector":
+        return MultiVectorQdrantConnector(**kwargs)
+    if layout == "per_version":
+        return QdrantConnector(**kwargs)
+    raise ValueError(f"Unknown Qdrant layout {layout!r} (expected 'per_version' or 'multi_vector')")
+
+
+class AsyncQdrantConnector:
+    """asyncio counterpart of the search path of `QdrantConnector` (shares its cache entries)
+
+    Uses the process-wide client of `db_config` (closed by `resources.close_all`), or `client`, which stays
+    owned by the caller.
+    """
+    def __init__(self,
+                 db_config: dict = None,
+                 collection_prefix: str = MEMBER_COLLECTION_PREFIX,
+                 client: AsyncQdrantClient = None,
+                 search_by_id: bool = SEARCH_BY_ID,
+                 profiles: Optional[Dict[str, Union[str, CollectionProfile]]] = None,
+                 embedder: Optional[Embedder] = None):
+        if not db_config:
+            db_config = qdrant_config
+        self.db_config = db_config
+        self.collection_prefix = collection_prefix
+        self.client = client or get_async_qdrant_client(db_config)
+        self.search_by_id = search_by_id
+        self.profiles = version_profiles(profiles)
+        self.embedder = embedder or get_embedder()
+
+    def profile(self, version: str) -> CollectionProfile:
+        return self.profiles.get(version) or COLLECTION_PROFILES[QDRANT_COLLECTION_PROFILE]
+
+    def collection_name(self, version: str) -> str:
+        return self.collection_prefix + "_" + version
+
+    def _vector_name(self, version: str) -> str:
+        return self.embedder.vector_name
+
+    def _document_field(self, version: str) -> str:
+        return "document"
+
+    def _search_filter(self, version: str, exclude_member_no: Optional[int] = None):
+        return _exclude_ids_filter([exclude_member_no]) if exclude_member_no is not None else None
+
+    async def acache_namespace(self, version: str) -> str:
+        collection = self.collection_name(version)
+        return (f"{collection}:g{await aget_generation(collection)}:{self.embedder.model_name}:"
+                f"{'id' if self.search_by_id else 'text'}:{self.profile(version).name}")
+
+    async def _query_vectors(self, queries: List[Tuple[Optional[int], List[float]]], version: str,
+                             return_top_k: int = RETURN_TOP_K) -> List[List[QueryResponse]]:
+        from qdrant_client.models import QueryRequest
+
+        if not queries:
+            return []
+        responses = await self.client.query_batch_points(
+            collection_name=self.collection_name(version),
+            requests=[QueryRequest(query=list(vector), using=self._vector_name(version),
+                                   filter=self._search_filter(version, member_no),
+                                   params=self.profile(version).search_params(), limit=return_top_k,
+                                   with_payload=[self._document_field(version)])
+                      for member_no, vector in queries]
+        )
+        return [[_to_query_response(point, self._document_field(version)) for point in response.points]
+                for response in responses]
+
+    async def _search(self, member_str: str, version: str, return_top_k: int = RETURN_TOP_K,
+                      exclude_member_no: Optional[int] = None) -> List[QueryResponse]:
+        return (await self._search_batch([member_str], version, return_top_k,
+                                         [exclude_member_no] if exclude_member_no is not None else None))[0]
+
+    async def _search_batch(self, member_strs: List[str], version: str, return_top_k: int = RETURN_TOP_K,
+                            exclude_member_nos: Optional[List[int]] = None) -> List[List[QueryResponse]]:
+        # Embedding is CPU-bound (or a blocking request): keep it off the event loop
+        vectors = await asyncio.to_thread(self.embedder.embed_queries, member_strs) if member_strs else []
+        exclude_member_nos = exclude_member_nos or [None] * len(member_strs)
+        return await self._query_vectors(list(zip(exclude_member_nos, vectors)), version, return_top_k)
+
+    async def _stored_vectors(self, version: str, member_nos: List[int]) -> Dict[int, List[float]]:
+        collection = self.collection_name(version)
+        if not await self.client.collection_exists(collection):
+            return {}
+        vector_name = self._vector_name(version)
+        points = await self.client.retrieve(collection_name=collection, ids=member_nos, with_payload=False,
+                                            with_vectors=[vector_name])
+        return {point.id: point.vector[vector_name] for point in points if vector_name in (point.vector or {})}
+
+    async def _search_batch_by_vector(self, vectors: Dict[int, List[float]], version: str,
+                                      return_top_k: int = RETURN_TOP_K) -> List[List[QueryResponse]]:
+        return await self._query_vectors(list(vectors.items()), version, return_top_k)
+
+    async def _search_members_uncached(self, members: List[Member], version: str) -> List[List[QueryResponse]]:
+        vectors = await self._stored_vectors(version, [member.member_no for member in members]) \
+            if self.search_by_id else {}
+        by_id = [idx for idx, member in enumerate(members) if member.member_no in vectors]
+        by_text = [idx for idx, member in enumerate(members) if member.member_no not in vectors]
+        id_results, text_results = await asyncio.gather(
+            self._search_batch_by_vector({members[idx].member_no: vectors[members[idx].member_no] for idx in by_id},
+                                         version) if by_id else _no_results(),
+            self._search_batch([member_search_text(members[idx]) for idx in by_text], version,
+                               exclude_member_nos=[members[idx].member_no for idx in by_text])
+            if by_text else _no_results())
+        results = [None] * len(members)
+        for idx, res in [*zip(by_id, id_results), *zip(by_text, text_results)]:
+            results[idx] = res
+        return results
+
+    @async_redis_member_ver_cache(key_fields=member_search_text, key_prefix="search_member")
+    async def search_member(self, member: Member, version: str) -> List[QueryResponse]:
+        vectors = await self._stored_vectors(version, [member.member_no]) if self.search_by_id else {}
+        if vectors:
+            return (await self._search_batch_by_vector(vectors, version=version))[0]
+        return await self._search(member_search_text(member), version=version, exclude_member_no=member.member_no)
+
+    async def search_members(self, members: List[Member],
+                             version_to_search: Optional[str] = None) -> List[Dict[str, List[QueryResponse]]]:
+        """Same as `QdrantConnector.search_members`, with every (member, version) search running concurrently"""
+        pairs = []
+        for idx, member in enumerate(members):
+            if not version_to_search:
+                versions = [version for version, is_using in member.versions.items() if is_using]
+            else:
+                versions = [version_to_search] if member.versions.get(version_to_search, False) else []
+            pairs.extend((idx, version) for version in versions)
+        results = await asyncio.gather(*[self.search_member(members[idx], version) for idx, version in pairs])
+        search_results = [{} for _ in members]
+        for (idx, version), res in zip(pairs, results):
+            search_results[idx][version] = res
+        return search_results
+
+    async def search_members_batch(self, members: List[Member], version: str) -> List[Dict[str, List[QueryResponse]]]:
+        """Same as `QdrantConnector.search_members_batch`"""
+        if not members:
+            return []
+        search_results = await AsyncQdrantConnector.search_member.get_many(self, members, version)
+        missing = [idx for idx in range(len(members)) if idx not in search_results]
+        if missing:
+            missing_members = [members[idx] for idx in missing]
+            missing_results = await self._search_members_uncached(missing_members, version)
+            await AsyncQdrantConnector.search_member.set_many(self, missing_members, version, missing_results)
+            search_results.update(zip(missing, missing_results))
+        return [{version: search_results[idx]} for idx in range(len(members))]
+
+
+class AsyncMultiVectorQdrantConnector(AsyncQdrantConnector):
+    """asyncio counterpart of the search path of `MultiVectorQdrantConnector` (shares its cache entries)
+
+    Args:
+        db_config (dict, optional): Qdrant connection details. Defaults to `qdrant_config`.
+        collection (str, optional): Collection holding all versions. Defaults to MULTI_VECTOR_COLLECTION.
+        client (AsyncQdrantClient, optional): Defaults to the shared async client of `db_config`.
+        search_by_id (bool, optional): Search indexed members with their stored vector. Defaults to SEARCH_BY_ID.
+        profiles (Dict[str, Union[str, CollectionProfile]], optional): Defaults to QDRANT_VERSION_PROFILES.
+        embedder (Embedder, optional): Defaults to the configured backend (`get_embedder`).
+    """
+    def __init__(self,
+                 db_config: dict = None,
+                 collection: str = MULTI_VECTOR_COLLECTION,
+                 client: AsyncQdrantClient = None,
+                 search_by_id: bool = SEARCH_BY_ID,
+                 profiles: Optional[Dict[str, Union[str, CollectionProfile]]] = None,
+                 embedder: Optional[Embedder] = None):
+        super().__init__(db_config=db_config, collection_prefix=collection, client=client,
+                         search_by_id=search_by_id, profiles=profiles, embedder=embedder)
+        self.collection = collection
+
+    def collection_name(self, version: str) -> str:
+        return self.collection
+
+    def _vector_name(self, version: str) -> str:
+        return version
+
+    def _document_field(self, version: str) -> str:
+        return f"document_{version}"
+
+    def _search_filter(self, version: str, exclude_member_no: Optional[int] = None):
+        from qdrant_client.models import Filter, FieldCondition, MatchValue, HasIdCondition
+
+        return Filter(must=[FieldCondition(key=MultiVectorQdrantConnector._version_flag(version),
+                                           match=MatchValue(value=True))],
+                      must_not=[HasIdCondition(has_id=[exclude_member_no])] if exclude_member_no is not None else None)
+
+
+def make_async_qdrant_connector(qdrant_conn: QdrantConnector) -> AsyncQdrantConnector:
+    """Async connector reading the same layout, collections and settings as `qdrant_conn`"""
+    kwargs = dict(db_config=qdrant_conn.db_config, search_by_id=qdrant_conn.search_by_id,
+                  profiles=qdrant_conn.profiles, embedder=qdrant_conn.embedder)
+    if isinstance(qdrant_conn, MultiVectorQdrantConnector):
+        return AsyncMultiVectorQdrantConnector(collection=qdrant_conn.collection, **kwargs)
+    return AsyncQdrantConnector(collection_prefix=qdrant_conn.collection_prefix, **kwargs)
+
+
 if __name__ == "__main__":
     data = Member(member_no=10,
                   name="ROBERT CANTRELL",
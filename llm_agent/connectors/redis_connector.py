@@ -1,10 +1,19 @@
+import asyncio
+import hashlib
 import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Tuple, Optional, Iterable
 
-import redis
 import json
 import functools
 import os
 
+import redis
+
+from llm_agent.connectors.resources import get_redis_client, get_async_redis_client
 from llm_agent.src.utils import Member
 
 # Connect to Redis server
@@ -12,8 +21,21 @@ REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
 REDIS_PORT = os.getenv('REDIS_PORT', 6379)
 REDIS_DB = os.getenv('REDIS_DB', 0)
 REDIS_CACHE_TTL = os.getenv('REDIS_CACHE_TTL', 2*24*60*60) # 2 days in seconds
+LOCAL_CACHE_MAXSIZE = int(os.getenv('LOCAL_CACHE_MAXSIZE', 1024))
+LOCAL_CACHE_TTL = int(os.getenv('LOCAL_CACHE_TTL', 5*60))  # 5 minutes in seconds
+GENERATION_LOCAL_TTL = int(os.getenv('GENERATION_LOCAL_TTL', 10))  # seconds a process trusts its generation copy
+GENERATION_PREFIX = "cache_generation"
+MEMBER_INDEX_PREFIX = "cache_index:member"
+
+
+def redis_client():
+    """Process-wide Redis client, created on first use"""
+    return get_redis_client(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
 
-redis_client = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
+
+def async_redis_client():
+    """Process-wide asyncio Redis client, created on first use"""
+    return get_async_redis_client(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
 
 
 def redis_cache(ttl=REDIS_CACHE_TTL):
@@ -23,12 +45,12 @@ def redis_cache(ttl=REDIS_CACHE_TTL):
             # Generate a unique key based on the function name and its arguments
             key = f"{func.__name__}:{json.dumps(args)}:{json.dumps(kwargs)}"
             # Check if the result is already cached in Redis
-            cached_result = redis_client.get(key)
+            cached_result = redis_client().get(key)
             if cached_result:
                 return json.loads(cached_result)
             # Call the function and cache the result
             result = func(*args, **kwargs)
-            redis_client.setex(key, ttl, json.dumps(result))
+            redis_client().setex(key, ttl, json.dumps(result))
             return result
         return wrapper
     return decorator
@@ -40,35 +62,442 @@ def redis_cache_pkl(ttl=REDIS_CACHE_TTL):
             # Generate a unique key based on the function name and its arguments
             key = f"{func.__name__}:{json.dumps(args)}:{json.dumps(kwargs)}"
             # Check if the result is already cached in Redis
-            cached_result = redis_client.get(key)
+            cached_result = redis_client().get(key)
             if cached_result:
                 return pickle.loads(cached_result)
             # Call the function and cache the result
             result = func(*args, **kwargs)
-            redis_client.setex(key, ttl, pickle.dumps(result))
+            redis_client().setex(key, ttl, pickle.dumps(result))
             return result
         return wrapper
     return decorator
 
-def redis_member_ver_cache(ttl=REDIS_CACHE_TTL):
+class LocalTTLCache:
+    """Bounded, thread-safe in-process LRU cache whose entries expire after `ttl` seconds"""
+    def __init__(self, maxsize: int = LOCAL_CACHE_MAXSIZE, ttl: float = LOCAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return False, None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheStats:
+    """Hit / miss / latency counters of one cached function"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.shared_misses = 0  # misses served by another in-flight call (single-flight)
+        self.redis_errors = 0
+        self.computes = 0
+        self.lookup_time = 0.0
+        self.compute_time = 0.0
+
+    def incr(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            lookups = self.local_hits + self.redis_hits + self.misses + self.shared_misses
+            return {"local_hits": self.local_hits,
+                    "redis_hits": self.redis_hits,
+                    "misses": self.misses,
+                    "shared_misses": self.shared_misses,
+                    "redis_errors": self.redis_errors,
+                    "computes": self.computes,
+                    "hit_ratio": (self.local_hits + self.redis_hits) / lookups if lookups else 0.0,
+                    "avg_lookup_ms": self.lookup_time / lookups * 1000 if lookups else 0.0,
+                    "avg_compute_ms": self.compute_time / self.computes * 1000 if self.computes else 0.0}
+
+
+# Stats and caches of every function decorated with `redis_member_ver_cache`, by qualified name
+CACHE_STATS: Dict[str, CacheStats] = {}
+CACHES: Dict[str, "LayeredCache"] = {}
+
+
+def cache_stats() -> Dict[str, dict]:
+    """Hit / miss / latency counters of every cached function"""
+    return {name: stats.as_dict() for name, stats in CACHE_STATS.items()}
+
+
+class LayeredCache:
+    """Two-tier cache: bounded in-process LRU/TTL in front of Redis (pickled values).
+
+    Redis errors are counted and treated as misses so that an unavailable cache never fails the request.
+    Concurrent misses of the same key within the process share a single computation (single-flight).
+    """
+    def __init__(self, name: str, ttl=REDIS_CACHE_TTL, local_cache: LocalTTLCache = None):
+        self.name = name
+        self.ttl = int(ttl)
+        self.local = local_cache or LocalTTLCache()
+        self.stats = CACHE_STATS.setdefault(name, CacheStats())
+        CACHES[name] = self
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._ainflight: Dict[str, asyncio.Future] = {}
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Look up `keys` in the local tier, then the rest with one Redis MGET. Returns the hits only."""
+        start = time.perf_counter()
+        found, missing = {}, []
+        for key in keys:
+            hit, value = self.local.get(key)
+            if hit:
+                found[key] = value
+            else:
+                missing.append(key)
+        redis_hits = 0
+        if missing:
+            try:
+                for key, cached_result in zip(missing, redis_client().mget(missing)):
+                    if cached_result is not None:
+                        found[key] = pickle.loads(cached_result)
+                        self.local.set(key, found[key])
+                        redis_hits += 1
+            except redis.RedisError:
+                self.stats.incr(redis_errors=1)
+        self.stats.incr(local_hits=len(keys) - len(missing),
+                        redis_hits=redis_hits,
+                        lookup_time=time.perf_counter() - start)
+        return found
+
+    def set_many(self, items: Dict[str, Any], member_nos: Optional[Dict[str, int]] = None):
+        """Store `items` in both tiers, writing to Redis with one pipelined batch of SETEX
+
+        `member_nos` maps keys to the member they were computed for, so `invalidate_members` can find them.
+        """
+        for key, value in items.items():
+            self.local.set(key, value)
+        if not items:
+            return
+        try:
+            pipe = redis_client().pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.setex(key, self.ttl, pickle.dumps(value))
+            for key, member_no in (member_nos or {}).items():
+                pipe.sadd(_member_index_key(member_no), key)
+                pipe.expire(_member_index_key(member_no), self.ttl)
+            pipe.execute()
+        except redis.RedisError:
+            self.stats.incr(redis_errors=1)
+
+    def delete_many(self, keys: List[str]):
+        for key in keys:
+            self.local.delete(key)
+        if not keys:
+            return
+        try:
+            redis_client().delete(*keys)
+        except redis.RedisError:
+            self.stats.incr(redis_errors=1)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], member_no: Optional[int] = None) -> Any:
+        found = self.get_many([key])
+        if key in found:
+            return found[key]
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self.stats.incr(shared_misses=1)
+            return future.result()
+        try:
+            start = time.perf_counter()
+            result = compute()
+            self.stats.incr(misses=1, computes=1, compute_time=time.perf_counter() - start)
+            self.set_many({key: result}, None if member_no is None else {key: member_no})
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+
+    async def aget_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Async `get_many` through `redis.asyncio`"""
+        start = time.perf_counter()
+        found, missing = {}, []
+        for key in keys:
+            hit, value = self.local.get(key)
+            if hit:
+                found[key] = value
+            else:
+                missing.append(key)
+        redis_hits = 0
+        if missing:
+            try:
+                for key, cached_result in zip(missing, await async_redis_client().mget(missing)):
+                    if cached_result is not None:
+                        found[key] = pickle.loads(cached_result)
+                        self.local.set(key, found[key])
+                        redis_hits += 1
+            except redis.RedisError:
+                self.stats.incr(redis_errors=1)
+        self.stats.incr(local_hits=len(keys) - len(missing),
+                        redis_hits=redis_hits,
+                        lookup_time=time.perf_counter() - start)
+        return found
+
+    async def aset_many(self, items: Dict[str, Any], member_nos: Optional[Dict[str, int]] = None):
+        """Async `set_many` through `redis.asyncio`"""
+        for key, value in items.items():
+            self.local.set(key, value)
+        if not items:
+            return
+        try:
+            pipe = async_redis_client().pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.setex(key, self.ttl, pickle.dumps(value))
+            for key, member_no in (member_nos or {}).items():
+                pipe.sadd(_member_index_key(member_no), key)
+                pipe.expire(_member_index_key(member_no), self.ttl)
+            await pipe.execute()
+        except redis.RedisError:
+            self.stats.incr(redis_errors=1)
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Any], member_no: Optional[int] = None) -> Any:
+        """Async `get_or_compute`: `compute` returns an awaitable; single-flight within the event loop"""
+        found = await self.aget_many([key])
+        if key in found:
+            return found[key]
+        future = self._ainflight.get(key)
+        if future is not None:
+            self.stats.incr(shared_misses=1)
+            return await asyncio.shield(future)
+        future = self._ainflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            start = time.perf_counter()
+            result = await compute()
+            self.stats.incr(misses=1, computes=1, compute_time=time.perf_counter() - start)
+            await self.aset_many({key: result}, None if member_no is None else {key: member_no})
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when no other coroutine was waiting for it
+            future.exception()
+            raise
+        finally:
+            self._ainflight.pop(key, None)
+
+
+def _hash_key(*parts: str) -> str:
+    return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _member_index_key(member_no: int) -> str:
+    return f"{MEMBER_INDEX_PREFIX}:{member_no}"
+
+
+_generation_cache = LocalTTLCache(maxsize=256, ttl=GENERATION_LOCAL_TTL)
+
+
+def get_generation(name: str) -> int:
+    """Current generation of `name` (e.g. a Qdrant collection), used as part of cache keys.
+
+    Other processes see a bump within GENERATION_LOCAL_TTL seconds.
+    """
+    hit, generation = _generation_cache.get(name)
+    if hit:
+        return generation
+    try:
+        generation = int(redis_client().get(f"{GENERATION_PREFIX}:{name}") or 0)
+    except redis.RedisError:
+        return 0
+    _generation_cache.set(name, generation)
+    return generation
+
+
+async def aget_generation(name: str) -> int:
+    """Async `get_generation` through `redis.asyncio`"""
+    hit, generation = _generation_cache.get(name)
+    if hit:
+        return generation
+    try:
+        generation = int(await async_redis_client().get(f"{GENERATION_PREFIX}:{name}") or 0)
+    except redis.RedisError:
+        return 0
+    _generation_cache.set(name, generation)
+    return generation
+
+
+def bump_generation(name: str) -> int:
+    """Invalidate every cache entry keyed on the generation of `name`"""
+    try:
+        generation = int(redis_client().incr(f"{GENERATION_PREFIX}:{name}"))
+    except redis.RedisError:
+        _generation_cache.delete(name)
+        return 0
+    _generation_cache.set(name, generation)
+    return generation
+
+
+def invalidate_members(member_nos: Iterable[int]):
+    """Drop every cached result computed for `member_nos` from Redis and from this process' local tier"""
+    index_keys = [_member_index_key(member_no) for member_no in member_nos]
+    if not index_keys:
+        return
+    try:
+        pipe = redis_client().pipeline(transaction=False)
+        for index_key in index_keys:
+            pipe.smembers(index_key)
+        keys = [key.decode() if isinstance(key, bytes) else key for members in pipe.execute() for key in members]
+        redis_client().delete(*keys, *index_keys)
+    except redis.RedisError:
+        return
+    for cache in CACHES.values():
+        for key in keys:
+            cache.local.delete(key)
+
+
+def _member_cache_key(prefix: str, member: Member, key_fields: Optional[Callable[[Member], Any]],
+                      namespace: str, version: str, kwargs: dict) -> str:
+    content = key_fields(member) if key_fields else member.model_dump(mode="json")
+    return f"{prefix}:" + _hash_key(json.dumps(content, sort_keys=True), namespace, str(version),
+                                    json.dumps(kwargs, sort_keys=True))
+
+
+def _check_member_args(args):
+    if len(args) < 3:
+        raise ValueError("Function requires at least 2 arguments")
+    if not isinstance(args[1], Member):
+        raise ValueError("First argument should be of type Member")
+
+
+def redis_member_ver_cache(ttl=REDIS_CACHE_TTL,
+                           key_fields: Optional[Callable[[Member], Any]] = None,
+                           key_prefix: Optional[str] = None,
+                           local_maxsize: int = LOCAL_CACHE_MAXSIZE,
+                           local_ttl: float = LOCAL_CACHE_TTL):
+    """Cache methods called as `method(self, member: Member, version: str, **kwargs)`
+
+    Results are cached in a `LayeredCache` under a content-addressed key
+    `<func>:<hash of key_fields(member), namespace, version, kwargs>`, where:
+        - `key_fields(member)` returns only the member data that affects the result (JSON serializable),
+          so unrelated edits keep hitting the cache. Defaults to the whole member.
+        - `namespace` is `self.cache_namespace(version)` when the instance defines it, e.g. prompt version,
+          model name and Qdrant collection generation, so a change of any of them never serves stale results.
+    `<func>` is `key_prefix` (defaults to the function name); async variants use the same prefix to share entries.
+
+    The decorated function exposes:
+        - `get_many(instance, members, version)`: cached results by index of `members` (one MGET)
+        - `set_many(instance, members, version, results)`: store results (one pipelined SETEX batch)
+        - `cache`: the underlying `LayeredCache`, and `cache_stats()`: its hit / miss / latency counters
+    """
     def decorator(func):
+        cache = LayeredCache(func.__qualname__, ttl=ttl, local_cache=LocalTTLCache(local_maxsize, local_ttl))
+
+        def cache_key(instance, member: Member, version: str, **kwargs) -> str:
+            namespace = instance.cache_namespace(version) if hasattr(instance, "cache_namespace") else ""
+            return _member_cache_key(key_prefix or func.__name__, member, key_fields, namespace, version, kwargs)
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # Generate a unique key based on the function name and its arguments
-            if len(args) < 3:
-                raise ValueError("Function requires at least 2 arguments")
-            if not isinstance(args[1], Member):
-                raise ValueError("First argument should be of type Member")
-            member_str = f"{func.__name__}:{args[1].model_dump_json()}"
-            version = f"{func.__name__}:{args[2]}"
-            key = f"{func.__name__}:{member_str}:{version}:{json.dumps(kwargs)}"
-            # Check if the result is already cached in Redis
-            cached_result = redis_client.get(key)
-            if cached_result:
-                return pickle.loads(cached_result)
-            # Call the function and cache the result
-            result = func(*args, **kwargs)
-            redis_client.setex(key, ttl, pickle.dumps(result))
-            return result
+            _check_member_args(args)
+            key = cache_key(args[0], args[1], args[2], **kwargs)
+            return cache.get_or_compute(key, lambda: func(*args, **kwargs), member_no=args[1].member_no)
+
+        def get_many(instance, members: List[Member], version: str, **kwargs) -> Dict[int, Any]:
+            keys = [cache_key(instance, member, version, **kwargs) for member in members]
+            found = cache.get_many(keys)
+            cache.stats.incr(misses=len(keys) - len(found))
+            return {idx: found[key] for idx, key in enumerate(keys) if key in found}
+
+        def set_many(instance, members: List[Member], version: str, results: List[Any], **kwargs):
+            keys = [cache_key(instance, member, version, **kwargs) for member in members]
+            cache.set_many(dict(zip(keys, results)),
+                           member_nos={key: member.member_no for key, member in zip(keys, members)})
+
+        wrapper.cache = cache
+        wrapper.cache_key = cache_key
+        wrapper.get_many = get_many
+        wrapper.set_many = set_many
+        wrapper.cache_stats = cache.stats.as_dict
+        return wrapper
+    return decorator
+
+
+def async_redis_member_ver_cache(ttl=REDIS_CACHE_TTL,
+                                 key_fields: Optional[Callable[[Member], Any]] = None,
+                                 key_prefix: Optional[str] = None,
+                                 local_maxsize: int = LOCAL_CACHE_MAXSIZE,
+                                 local_ttl: float = LOCAL_CACHE_TTL):
+    """Async counterpart of `redis_member_ver_cache` for `async def method(self, member: Member, version: str)`
+
+    Uses `redis.asyncio` and `self.acache_namespace(version)` when defined (falls back to `cache_namespace`).
+    With the same `key_prefix`, `key_fields` and namespace as a sync method, both share cache entries.
+    """
+    def decorator(func):
+        cache = LayeredCache(func.__qualname__, ttl=ttl, local_cache=LocalTTLCache(local_maxsize, local_ttl))
+
+        async def cache_key(instance, member: Member, version: str, **kwargs) -> str:
+            if hasattr(instance, "acache_namespace"):
+                namespace = await instance.acache_namespace(version)
+            else:
+                namespace = instance.cache_namespace(version) if hasattr(instance, "cache_namespace") else ""
+            return _member_cache_key(key_prefix or func.__name__, member, key_fields, namespace, version, kwargs)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            _check_member_args(args)
+            key = await cache_key(args[0], args[1], args[2], **kwargs)
+            return await cache.aget_or_compute(key, lambda: func(*args, **kwargs), member_no=args[1].member_no)
+
+        async def get_many(instance, members: List[Member], version: str, **kwargs) -> Dict[int, Any]:
+            keys = [await cache_key(instance, member, version, **kwargs) for member in members]
+            found = await cache.aget_many(keys)
+            cache.stats.incr(misses=len(keys) - len(found))
+            return {idx: found[key] for idx, key in enumerate(keys) if key in found}
+
+        async def set_many(instance, members: List[Member], version: str, results: List[Any], **kwargs):
+            keys = [await cache_key(instance, member, version, **kwargs) for member in members]
+            await cache.aset_many(dict(zip(keys, results)),
+                                  member_nos={key: member.member_no for key, member in zip(keys, members)})
+
+        wrapper.cache = cache
+        wrapper.cache_key = cache_key
+        wrapper.get_many = get_many
+        wrapper.set_many = set_many
+        wrapper.cache_stats = cache.stats.as_dict
         return wrapper
     return decorator
@@ -0,0 +1,257 @@
+"""Shared resource layer for the connectors.
+
+Holds one bounded Postgres connection pool per database config and one Qdrant / Redis client per config
+for the whole process, so connectors borrow connections instead of opening new ones on every instantiation.
+"""
+import asyncio
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, TYPE_CHECKING
+
+import psycopg2
+import redis
+import redis.asyncio
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+if TYPE_CHECKING:
+    from qdrant_client import AsyncQdrantClient, QdrantClient
+
+PG_POOL_MIN_CONN = int(os.getenv("PG_POOL_MIN_CONN", 1))
+PG_POOL_MAX_CONN = int(os.getenv("PG_POOL_MAX_CONN", 10))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", 30))  # seconds to wait for a free connection
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 20))
+
+_lock = threading.Lock()
+_pg_pools: Dict[tuple, "PgConnectionPool"] = {}
+_qdrant_clients: Dict[tuple, "QdrantClient"] = {}
+_async_qdrant_clients: Dict[tuple, "AsyncQdrantClient"] = {}
+_redis_clients: Dict[tuple, redis.StrictRedis] = {}
+_async_redis_clients: Dict[tuple, redis.asyncio.Redis] = {}
+
+
+def _config_key(config: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in config.items()))
+
+
+class PgConnectionPool:
+    """Bounded thread-safe psycopg2 pool.
+
+    At most `maxconn` connections are open at once; `getconn` waits up to `timeout` seconds for one to be
+    released instead of raising. Released connections stay open (LIFO) for reuse, and broken ones are
+    discarded and replaced lazily. (`psycopg2.pool.ThreadedConnectionPool` closes every connection above
+    `minconn` on release, which reintroduces the connect latency under load.)
+    """
+    def __init__(self,
+                 db_config: dict,
+                 minconn: int = PG_POOL_MIN_CONN,
+                 maxconn: int = PG_POOL_MAX_CONN,
+                 timeout: float = PG_POOL_TIMEOUT):
+        self.db_config = db_config
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._idle = [psycopg2.connect(**db_config) for _ in range(minconn)]
+        self._in_use = 0
+        self._borrows = 0
+        self._connects = minconn
+        self._wait_time = 0.0
+        self._discarded = 0
+
+    def getconn(self, timeout: Optional[float] = None):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout if timeout is None else timeout):
+            raise PoolError(f"No Postgres connection available after {self.timeout}s (maxconn={self.maxconn})")
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None or conn.closed:
+                conn = psycopg2.connect(**self.db_config)
+                with self._lock:
+                    self._connects += 1
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self._borrows += 1
+            self._wait_time += time.perf_counter() - start
+        return conn
+
+    def putconn(self, conn, close: bool = False):
+        close = close or bool(conn.closed)
+        if not close and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            # Never hand out a connection with a dangling transaction
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                close = True
+        with self._lock:
+            self._in_use -= 1
+            if close:
+                self._discarded += 1
+            else:
+                self._idle.append(conn)
+        if close and not conn.closed:
+            conn.close()
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection and always release it, discarding it if it broke"""
+        conn = self.getconn()
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.putconn(conn, close=True)
+            raise
+        except BaseException:
+            self.putconn(conn)
+            raise
+        else:
+            self.putconn(conn)
+
+    def health_check(self) -> bool:
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1;")
+                    return cursor.fetchone() == (1,)
+        except (psycopg2.Error, PoolError):
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"minconn": self.minconn,
+                    "maxconn": self.maxconn,
+                    "in_use": self._in_use,
+                    "idle": len(self._idle),
+                    "borrows": self._borrows,
+                    "connects": self._connects,
+                    "avg_wait_ms": self._wait_time / self._borrows * 1000 if self._borrows else 0.0,
+                    "discarded": self._discarded}
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def get_pg_pool(db_config: dict) -> PgConnectionPool:
+    """Return the process-wide pool for `db_config`, creating it on first use"""
+    key = _config_key(db_config)
+    with _lock:
+        if key not in _pg_pools:
+            _pg_pools[key] = PgConnectionPool(db_config)
+        return _pg_pools[key]
+
+
+def get_qdrant_client(db_config: dict) -> "QdrantClient":
+    """Return the process-wide Qdrant client for `db_config`, creating it on first use"""
+    key = _config_key(db_config)
+    with _lock:
+        if key not in _qdrant_clients:
+            from qdrant_client import QdrantClient
+            _qdrant_clients[key] = QdrantClient(**db_config)
+        return _qdrant_clients[key]
+
+
+def get_async_qdrant_client(db_config: dict) -> "AsyncQdrantClient":
+    """Return the process-wide asyncio Qdrant client for `db_config` (to be used from a single event loop)"""
+    key = _config_key(db_config)
+    with _lock:
+        if key not in _async_qdrant_clients:
+            from qdrant_client import AsyncQdrantClient
+            _async_qdrant_clients[key] = AsyncQdrantClient(**db_config)
+        return _async_qdrant_clients[key]
+
+
+def get_redis_client(host: str, port: int, db: int) -> redis.StrictRedis:
+    """Return the process-wide Redis client, backed by a bounded blocking connection pool"""
+    key = (host, str(port), str(db))
+    with _lock:
+        if key not in _redis_clients:
+            pool = redis.BlockingConnectionPool(host=host, port=port, db=db, max_connections=REDIS_MAX_CONNECTIONS)
+            _redis_clients[key] = redis.StrictRedis(connection_pool=pool)
+        return _redis_clients[key]
+
+
+def get_async_redis_client(host: str, port: int, db: int) -> redis.asyncio.Redis:
+    """Return the process-wide asyncio Redis client (to be used from a single event loop)"""
+    key = (host, str(port), str(db))
+    with _lock:
+        if key not in _async_redis_clients:
+            pool = redis.asyncio.BlockingConnectionPool(host=host, port=port, db=db,
+                                                        max_connections=REDIS_MAX_CONNECTIONS)
+            _async_redis_clients[key] = redis.asyncio.Redis(connection_pool=pool)
+        return _async_redis_clients[key]
+
+
+def health_check() -> Dict[str, bool]:
+    """Check every resource created so far in this process"""
+    status = {}
+    for key, pool in list(_pg_pools.items()):
+        status[f"postgres:{dict(key).get('host')}"] = pool.health_check()
+    for key, client in list(_qdrant_clients.items()):
+        name = f"qdrant:{dict(key).get('host') or dict(key).get('location')}"
+        try:
+            client.get_collections()
+            status[name] = True
+        except Exception:
+            status[name] = False
+    for key, client in list(_redis_clients.items()):
+        try:
+            status[f"redis:{key[0]}"] = bool(client.ping())
+        except redis.RedisError:
+            status[f"redis:{key[0]}"] = False
+    return status
+
+
+def pool_metrics() -> Dict[str, dict]:
+    """Pool usage of every resource created so far in this process"""
+    metrics = {f"postgres:{dict(key).get('host')}": pool.stats() for key, pool in list(_pg_pools.items())}
+    for key, client in list(_redis_clients.items()):
+        pool = client.connection_pool
+        metrics[f"redis:{key[0]}"] = {"maxconn": pool.max_connections,
+                                      "in_use": len(pool._connections) - pool.pool.qsize() + pool.pool.queue.count(None),
+                                      "created": len(pool._connections)}
+    return metrics
+
+
+def _close_async_client(client: "AsyncQdrantClient"):
+    """Close an asyncio client from sync code: scheduled on the running event loop if any, else in a new one"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    try:
+        if loop is None:
+            asyncio.run(client.close())
+        else:
+            loop.create_task(client.close())
+    except Exception as e:  # the loop its connections were bound to may be gone at exit
+        print(f"Failed to close async Qdrant client ({e})")
+
+
+@atexit.register
+def close_all():
+    """Close every shared resource (registered with `atexit`)"""
+    with _lock:
+        for pool in _pg_pools.values():
+            pool.close()
+        for client in _qdrant_clients.values():
+            client.close()
+        for client in _redis_clients.values():
+            client.connection_pool.disconnect()
+        for client in _async_qdrant_clients.values():
+            _close_async_client(client)
+        _pg_pools.clear()
+        _qdrant_clients.clear()
+        _async_qdrant_clients.clear()
+        _redis_clients.clear()
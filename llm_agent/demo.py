@@ -3,17 +3,46 @@ import streamlit as st
 from pydantic import ValidationError
 
 from llm_agent.connectors.postgres_connector import PostgresConnector
-from llm_agent.connectors.qdrant_connector import QdrantConnector
-from llm_agent.member_recommendation import recommend_member_by_id
-from llm_agent.src.rerank import reranker_setup
-
-pg_conn = PostgresConnector()
-qdrant_conn = QdrantConnector()
-reranker = reranker_setup()
+from llm_agent.connectors.qdrant_connector import QdrantConnector, make_qdrant_connector
+from llm_agent.member_recommendation import recommend_member_by_id, recommend_members_by_range
+from llm_agent.src.bulk_ingest import MemberBulkIngestor
+from llm_agent.src.candidates import AllPairsCandidateEngine, all_pairs_worthwhile
+from llm_agent.src.ingest_queue import IngestQueue
+from llm_agent.src.rerank import reranker_setup, LlmReranker
 
 from llm_agent.src.utils import Member
 
 
+# Streamlit re-runs this script on every interaction: build the connectors and the Gemini client once per process
+@st.cache_resource
+def get_pg_conn() -> PostgresConnector:
+    return PostgresConnector()
+
+
+@st.cache_resource
+def get_qdrant_conn() -> QdrantConnector:
+    return make_qdrant_connector()
+
+
+@st.cache_resource
+def get_reranker() -> LlmReranker:
+    return reranker_setup(qdrant_conn=get_qdrant_conn())
+
+
+@st.cache_resource
+def get_candidate_engine(version: str) -> AllPairsCandidateEngine:
+    # Vectors are exported on first use and reloaded only when the collection changes (see `refresh`)
+    return AllPairsCandidateEngine(get_qdrant_conn(), version)
+
+
+@st.cache_resource
+def get_ingest_queue() -> IngestQueue:
+    return IngestQueue()
+
+
+INGEST_STATUS_REFRESH = 2  # seconds between refreshes of the ingest queue status
+
+
 def wide_space_default():
     st.set_page_config(layout="wide")
 
@@ -27,9 +56,27 @@ def update_member_info(member: Member):
     st.write("Received Member object:", member)
 
 
+@st.fragment(run_every=INGEST_STATUS_REFRESH)
+def ingest_queue_status():
+    """Polled status of the write-behind queue, and of the members submitted in this session"""
+    queue = get_ingest_queue()
+    stats = queue.stats()
+    if not stats["worker_alive"]:
+        st.warning("No ingest worker is running: queued members are written to `Qdrant` once one is started "
+                   "(`python -m llm_agent.src.ingest_queue`)")
+    st.caption(f"`Qdrant` ingest queue: {stats['pending']} queued, {stats['processing']} processing, "
+               f"{int(stats.get('processed', 0))} written, {int(stats.get('failed', 0))} failed")
+    for member_no, status in queue.status(st.session_state.get("ingest_submitted", [])).items():
+        error = f" ({status['error']})" if status["error"] else ""
+        st.caption(f"Member {member_no}: {status['state']}{error}")
+
+
 def update_member_info_tab():
+    pg_conn, ingest_queue = get_pg_conn(), get_ingest_queue()
     st.header("Update Member Information")
     update_qdrant_immediately = st.checkbox("Update data immediately to Vector search engine (`Qdrant`)")
+    if update_qdrant_immediately:
+        ingest_queue_status()
     with st.form("Update member information"):
         member_no = st.number_input("Member number", min_value=1, step=1)
         name = st.text_input("Member name")
@@ -61,7 +108,9 @@ def update_member_info_tab():
                 else:
                     pg_conn.update_member_info([member])
                     if update_qdrant_immediately:
-                        qdrant_conn.insert_members([member])
+                        # Write-behind: the ingest worker embeds and upserts it with the other queued members
+                        ingest_queue.enqueue([member.member_no])
+                        st.session_state["ingest_submitted"] = [member.member_no]
             except ValidationError as e:
                 st.error(f"Validation error: {e}")
 
@@ -80,24 +129,29 @@ def update_member_info_tab():
             """
         )
         st.header("Upload Excel File")
-        uploaded_file = st.file_uploader("Choose an XLSX file", type="xlsx")
+        uploaded_file = st.file_uploader("Choose an XLSX or CSV file", type=["xlsx", "csv"])
         if uploaded_file is not None:
+            ingestor = MemberBulkIngestor(pg_conn=pg_conn,
+                                          skip_existing=True,
+                                          vectorize=update_qdrant_immediately,
+                                          queue=ingest_queue)
+            status = st.empty()
+            written, skipped, invalid = 0, [], []
             try:
-                df = pd.read_excel(uploaded_file)
-                for idx, row in df.iterrows():
-                    try:
-                        member = Member(**row.to_dict())
-                        old_data = pg_conn.get_member_info_by_id(member.member_no)
-                        if old_data:
-                            st.warning("Member already exists. Please update with new `member_no`.")
-                        else:
-                            pg_conn.update_member_info([member])
-                            if update_qdrant_immediately:
-                                qdrant_conn.insert_members([member])
-                    except ValidationError as e:
-                        st.error(f"Validation error in row {idx + 1}: {e}")
+                for report in ingestor.iter_ingest(uploaded_file):
+                    written += report["written"]
+                    skipped.extend(report["skipped_existing"])
+                    invalid.extend(report["invalid"])
+                    status.write(f"Chunk {report['chunk'] + 1}: {report['written']}/{report['rows']} rows written "
+                                 f"in {report['seconds']:.2f}s (total written: {written})")
             except Exception as e:
-                st.error(f"Error reading Excel file: {e}")
+                st.error(f"Error reading file: {e}")
+            st.success(f"{written} members written.")
+            if skipped:
+                st.warning(f"{len(skipped)} members already exist and were skipped. Please update with new "
+                           f"`member_no`: {skipped[:20]}{' ...' if len(skipped) > 20 else ''}")
+            for idx, error in invalid[:20]:
+                st.error(f"Validation error in row {idx}: {error}")
 
 
 def member_recommendation_tab():
@@ -107,7 +161,8 @@ def member_recommendation_tab():
         recommendation_version = st.selectbox("Version of LLM pipeline to use", options=["v1", "v2"], index=0)
         res_submitted = st.form_submit_button("Validate & Send")
         if res_submitted:
-            res = recommend_member_by_id(target_member_no, recommendation_version)
+            res = recommend_member_by_id(target_member_no, recommendation_version,
+                                         pg_conn=get_pg_conn(), reranker=get_reranker())
             df_res = pd.DataFrame([res], index=[1])
             st.write("Recommendation for member:", target_member_no)
             st.table(df_res)
@@ -123,9 +178,24 @@ def member_recommendation_bulk():
         res_submitted = st.form_submit_button("Validate & Send")
 
         if res_submitted:
-            index = list(range(target_member_no_start, target_member_no_end+1))
-            res = [recommend_member_by_id(i, recommendation_version) for i in index]
-            df_res = pd.DataFrame(res, index=index)
+            # Stream results into the table as soon as each rerank finishes
+            n_targets = max(target_member_no_end - target_member_no_start + 1, 1)
+            progress_bar = st.progress(0.0)
+            table_placeholder = st.empty()
+            res = []
+            # Small ranges use the batched Qdrant search, only large ones export the whole collection
+            candidates = None
+            if all_pairs_worthwhile(n_targets, get_qdrant_conn().count_members(recommendation_version)):
+                candidates = get_candidate_engine(recommendation_version).refresh()
+            for rec in recommend_members_by_range(target_member_no_start, target_member_no_end,
+                                                  recommendation_version,
+                                                  pg_conn=get_pg_conn(), reranker=get_reranker(),
+                                                  candidates=candidates):
+                res.append(rec)
+                df_res = pd.DataFrame(res).sort_values("member_no").set_index("member_no", drop=False)
+                table_placeholder.table(df_res)
+                progress_bar.progress(min(len(res) / n_targets, 1.0))
+            table_placeholder.empty()
     if df_res is not None:
         st.write("Recommendation for member:", target_member_no_start, "to", target_member_no_end)
         st.table(df_res)
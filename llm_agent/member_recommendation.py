@@ -1,8 +1,9 @@
 """Recommendation for members based on LLMagent data"""
-from typing import List
+from typing import List, Iterator, Optional, AsyncIterator
 
-from llm_agent.connectors.postgres_connector import PostgresConnector
-from llm_agent.src.rerank import reranker_setup
+from llm_agent.connectors.postgres_connector import PostgresConnector, AsyncPostgresConnector
+from llm_agent.src.candidates import AllPairsCandidateEngine
+from llm_agent.src.rerank import reranker_setup, LlmReranker, DEFAULT_RERANK_CONCURRENCY
 from llm_agent.src.update_data_to_qdrant import UpdateLatestDataToQdrantV1
 from llm_agent.src.utils import Member
 
@@ -17,25 +18,100 @@ def _format_result_pairs(member_no: int, results: dict):
 
 def recommend_member_by_id(member_no: int,
                            version_to_search: str,
-                           format_columns: bool = True):
+                           format_columns: bool = True,
+                           pg_conn: Optional[PostgresConnector] = None,
+                           reranker: Optional[LlmReranker] = None):
     """Recommend members based on the given member_no"""
-    pg_conn = PostgresConnector()
+    pg_conn = pg_conn or PostgresConnector()
     member_data = pg_conn.get_member_info_by_id(member_no, to_member_object=True)
     print(member_data)
-    reranker = reranker_setup()
+    reranker = reranker or reranker_setup()
     result = reranker.recommend(member_data[0], version_to_search)
     return _format_result_pairs(member_no, result) if format_columns else result
 
 
+def recommend_members(members: List[Member],
+                      version_to_search: str,
+                      format_columns: bool = True,
+                      reranker: Optional[LlmReranker] = None,
+                      max_workers: int = DEFAULT_RERANK_CONCURRENCY,
+                      candidates: Optional[AllPairsCandidateEngine] = None,
+                      batch_targets: bool = False) -> Iterator[dict]:
+    """Recommend members for all `members`, yielding each result as soon as it is ready (several members per
+    LLM call with `batch_targets`)"""
+    reranker = reranker or reranker_setup()
+    for member, result in reranker.recommend_many(members, version_to_search, max_workers=max_workers,
+                                                  candidates=candidates, batch_targets=batch_targets):
+        yield _format_result_pairs(member.member_no, result) if format_columns else result
+
+
+def recommend_members_by_ids(member_nos: List[int],
+                             version_to_search: str,
+                             format_columns: bool = True,
+                             pg_conn: Optional[PostgresConnector] = None,
+                             reranker: Optional[LlmReranker] = None,
+                             max_workers: int = DEFAULT_RERANK_CONCURRENCY) -> Iterator[dict]:
+    """Recommend members for the given `member_nos` (loaded with one query), yielding results as they finish"""
+    pg_conn = pg_conn or PostgresConnector()
+    members = pg_conn.get_members_by_ids(member_nos)
+    yield from recommend_members(members, version_to_search, format_columns, reranker, max_workers)
+
+
+def recommend_members_by_range(member_no_start: int,
+                               member_no_end: int,
+                               version_to_search: str,
+                               format_columns: bool = True,
+                               pg_conn: Optional[PostgresConnector] = None,
+                               reranker: Optional[LlmReranker] = None,
+                               max_workers: int = DEFAULT_RERANK_CONCURRENCY,
+                               candidates: Optional[AllPairsCandidateEngine] = None) -> Iterator[dict]:
+    """Recommend members with `member_no` in [`member_no_start`, `member_no_end`], yielding results as they finish"""
+    pg_conn = pg_conn or PostgresConnector()
+    members = pg_conn.get_members_by_range(member_no_start, member_no_end)
+    yield from recommend_members(members, version_to_search, format_columns, reranker, max_workers, candidates)
+
+
+async def arecommend_member_by_id(member_no: int,
+                                  version_to_search: str,
+                                  pg_conn: AsyncPostgresConnector,
+                                  reranker: LlmReranker,
+                                  format_columns: bool = True):
+    """Async `recommend_member_by_id` for serving from an event loop"""
+    member_data = await pg_conn.get_member_info_by_id(member_no, to_member_object=True)
+    result = await reranker.arecommend(member_data[0], version_to_search)
+    return _format_result_pairs(member_no, result) if format_columns else result
+
+
+async def arecommend_members_by_ids(member_nos: List[int],
+                                    version_to_search: str,
+                                    pg_conn: AsyncPostgresConnector,
+                                    reranker: LlmReranker,
+                                    format_columns: bool = True,
+                                    max_concurrency: int = DEFAULT_RERANK_CONCURRENCY) -> AsyncIterator[dict]:
+    """Async `recommend_members_by_ids`, yielding results as they finish"""
+    members = await pg_conn.get_members_by_ids(member_nos)
+    async for member, result in reranker.arecommend_many(members, version_to_search, max_concurrency=max_concurrency):
+        yield _format_result_pairs(member.member_no, result) if format_columns else result
+
+
 def create_member_rec_pairs(members: List[Member],
                             version_to_search: str,
-                            format_columns: bool = True):
-    """Recommend members based on the given member"""
+                            format_columns: bool = True,
+                            max_workers: int = DEFAULT_RERANK_CONCURRENCY,
+                            use_all_pairs: bool = True,
+                            batch_targets: bool = True):
+    """Recommend members based on the given member
+
+    With `use_all_pairs`, the candidates of all members are computed at once in memory from the stored
+    vectors (`AllPairsCandidateEngine`) instead of one Qdrant query per member. With `batch_targets`, several
+    members are reranked per LLM call (`LlmReranker.rerank_batch`).
+    """
     reranker = reranker_setup()
-    results = []
-    for member in members:
-        result = reranker.recommend(member, version_to_search)
-        results.append(result)
+    candidates = AllPairsCandidateEngine(reranker.qdrant_conn, version_to_search).load() if use_all_pairs else None
+    results = {member.member_no: result
+               for member, result in reranker.recommend_many(members, version_to_search, max_workers=max_workers,
+                                                             candidates=candidates, batch_targets=batch_targets)}
+    results = [results[member.member_no] for member in members]
     if format_columns:
         results = [_format_result_pairs(i.member_no, j) for i,j in zip(members, results)]
     return results
@@ -48,4 +124,4 @@ if __name__ == "__main__":
     all_members = update_latest_data_to_qdrant_v1.new_members
     print(len(all_members))
     res = create_member_rec_pairs(all_members, "v1")
-    print(res)
\ No newline at end of file
+    print(res)
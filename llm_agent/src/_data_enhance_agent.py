@@ -1,30 +1,71 @@
 """Create a API call(agent) for augmenting member information with web search data.
 """
 
+import functools
 import operator
 import os
-from typing import List, TypedDict, Annotated
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Tuple, TypedDict, Annotated
+from urllib.parse import urlsplit
 
-from langchain_community.tools import DuckDuckGoSearchResults
-from langchain_core.messages import ToolMessage, AnyMessage
-from langchain_core.prompts import PromptTemplate
-from langgraph.graph import StateGraph
+from langchain_core.messages import AnyMessage
 
-from llm_agent.src.utils import Member, LlmType, load_prompt_template, ModelSetup
+from llm_agent.connectors.redis_connector import LayeredCache, _hash_key
+from llm_agent.src.utils import Member, LlmType, load_prompt_template, ModelSetup, PROMPT_PATH
 
 GEMINI_MODEL = "gemini-1.5-pro"
 GEMINI_EMBEDDINGS_MODEL = "models/embedding-001"
 DEFAULT_TEMPERATURE = 0
-DEFAULT_GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY", default=GOOGLE_API_KEY)
+DEFAULT_GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 DEFAULT_PROMPT_VERSION = "1.0.0"
-DEFAULT_PROMPT_PATH = "../llm_agent/prompts"
-
-DATA_ENHANCE_PROMPT = load_prompt_template(filename="data_enhance.yaml",
-                                           path=DEFAULT_PROMPT_PATH,
-                                           version=DEFAULT_PROMPT_VERSION)
+DEFAULT_PROMPT_PATH = PROMPT_PATH
 
 DEFAULT_LLM = LlmType.GEMINI
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", 15))  # seconds per web search, from when it starts
+# Threads running web searches, shared by all members enriched concurrently with the same agent
+SEARCH_MAX_WORKERS = int(os.getenv("SEARCH_MAX_WORKERS", 16))
+# Seconds a search may wait for a free search thread before it is given up
+SEARCH_QUEUE_TIMEOUT = float(os.getenv("SEARCH_QUEUE_TIMEOUT", 60))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 7*24*60*60))  # 7 days in seconds
+SEARCH_CACHE_PREFIX = "websearch"
+# Search results shared by every agent of the process (and across processes through Redis)
+WEBSEARCH_CACHE = LayeredCache(SEARCH_CACHE_PREFIX, ttl=SEARCH_CACHE_TTL)
+
+
+def normalize_url(url: str) -> str:
+    """`https://www.Example.com/about/?ref=x` -> `example.com/about`"""
+    url = (url or "").strip().lower()
+    if not url:
+        return ""
+    parts = urlsplit(url if "://" in url else f"//{url}")
+    host = parts.netloc.removeprefix("www.")
+    return f"{host}{parts.path}".rstrip("/")
+
+
+def company_search_key(member: Member) -> str:
+    """What the company search depends on: the company URL, or the company name when there is no URL"""
+    return normalize_url(member.company_url) or " ".join(member.company.lower().split())
+
+
+def linkedin_search_key(member: Member) -> str:
+    return normalize_url(member.linkedin_url) or " ".join(f"{member.name} {member.company}".lower().split())
+
+
+def default_data_enhance_prompt() -> str:
+    return load_prompt_template(filename="data_enhance.yaml",
+                                path=DEFAULT_PROMPT_PATH,
+                                version=DEFAULT_PROMPT_VERSION)
+
+
+def __getattr__(name: str):
+    # `DATA_ENHANCE_PROMPT` is read from disk on first access instead of at import
+    if name == "DATA_ENHANCE_PROMPT":
+        return default_data_enhance_prompt()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class MemberInfoAgentState(TypedDict):
@@ -33,48 +74,132 @@ class MemberInfoAgentState(TypedDict):
     system_message: str
     company_expand: bool
     linkedin_expand: bool
+    # Each search branch writes its own key, so the parallel branches never overwrite each other
+    company_search_result: str
+    linkedin_search_result: str
+    # Seconds spent per node, merged across branches
+    timings: Annotated[Dict[str, float], operator.or_]
 
 
 class MemberInfoEnhanceAgent:
-    def __init__(self, chat_model, emb_model, search_tool):
+    """Summarize a member from its profile plus company and LinkedIn web searches
+
+    The graph fans out `company_search` and `linkedin_search` in parallel and joins them in `summarize`.
+    Each search is bounded by `search_timeout` seconds from when it starts on one of the SEARCH_MAX_WORKERS
+    search threads (and by SEARCH_QUEUE_TIMEOUT while waiting for one); a search that fails or times out
+    contributes nothing to the prompt instead of failing the member (and is not cached). A thread cannot be
+    stopped, so the search tool should also time out its own HTTP calls (see `agent_setup`). `close` releases
+    the search threads.
+
+    Search results are cached by normalized company / LinkedIn URL in `search_cache`, so members of the
+    same company share one company search; `use_search_cache=False` always searches.
+    """
+    def __init__(self,
+                 chat_model,
+                 emb_model,
+                 search_tool,
+                 search_timeout: float = SEARCH_TIMEOUT,
+                 search_cache: Optional[LayeredCache] = None,
+                 use_search_cache: bool = True):
         self.chat_model = chat_model
         self.emb_model = emb_model
         self.search_tool = search_tool
+        self.search_timeout = search_timeout
+        self.search_cache = (search_cache or WEBSEARCH_CACHE) if use_search_cache else None
+        self._search_executor = ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS,
+                                                   thread_name_prefix="member_websearch")
+        self._timings_lock = threading.Lock()
+        self._node_timings: Dict[str, List[float]] = defaultdict(list)
         self._build_graph()
 
     def _build_graph(self):
+        from langgraph.graph import StateGraph, START, END
+
         graph = StateGraph(MemberInfoAgentState)
-        graph.add_node("company_search", self._company_websearch)
-        graph.add_node("linkedin_search", self._linkedin_websearch)
-        graph.add_node("summarize", self._summarize)
-        graph.add_edge("company_search", "linkedin_search")
-        graph.add_edge("linkedin_search", "summarize")
-        graph.set_entry_point("company_search")
-        graph.set_finish_point("summarize")
+        graph.add_node("company_search", self._timed("company_search", self._company_websearch))
+        graph.add_node("linkedin_search", self._timed("linkedin_search", self._linkedin_websearch))
+        graph.add_node("summarize", self._timed("summarize", self._summarize))
+        graph.add_edge(START, "company_search")
+        graph.add_edge(START, "linkedin_search")
+        # `summarize` waits for both branches
+        graph.add_edge(["company_search", "linkedin_search"], "summarize")
+        graph.add_edge("summarize", END)
         self.graph = graph.compile()  # Compile the graph
 
+    def _timed(self, name: str, node: Callable[[MemberInfoAgentState], dict]):
+        def timed_node(state: MemberInfoAgentState) -> dict:
+            start = time.perf_counter()
+            update = node(state)
+            elapsed = time.perf_counter() - start
+            with self._timings_lock:
+                self._node_timings[name].append(elapsed)
+            return {**update, 'timings': {name: elapsed}}
+        return timed_node
+
+    def node_timing_stats(self) -> Dict[str, dict]:
+        """Calls, total and average seconds per graph node since the agent was created"""
+        with self._timings_lock:
+            return {name: {"calls": len(timings),
+                           "total_seconds": sum(timings),
+                           "avg_seconds": sum(timings) / len(timings)}
+                    for name, timings in self._node_timings.items()}
+
+    def _invoke_search(self, query: str, tool_call_id: str) -> str:
+        started = threading.Event()
+        started_at = []
+
+        def search():
+            started_at.append(time.monotonic())
+            started.set()
+            return self.search_tool.invoke({"args": {"query": query, "max_result": 5}, "id": tool_call_id,
+                                            "name": self.search_tool.name, "type": "tool_call"})
+
+        future = self._search_executor.submit(search)
+        # Time spent queued behind other searches does not count against `search_timeout`
+        if not started.wait(SEARCH_QUEUE_TIMEOUT) and future.cancel():
+            raise FutureTimeoutError()
+        started.wait()
+        remaining = self.search_timeout - (time.monotonic() - started_at[0])
+        return str(future.result(timeout=max(remaining, 0)).content)
+
+    def _websearch(self, query: str, tool_call_id: str, cache_key: str) -> str:
+        compute = functools.partial(self._invoke_search, query, tool_call_id)
+        try:
+            if self.search_cache is None:
+                return compute()
+            key = f"{self.search_cache.name}:{tool_call_id}:" + _hash_key(cache_key)
+            return self.search_cache.get_or_compute(key, compute)
+        except FutureTimeoutError:
+            print(f"{tool_call_id} timed out after {self.search_timeout}s, summarizing without it")
+        except Exception as e:
+            print(f"{tool_call_id} failed ({e!r}), summarizing without it")
+        return ""
+
+    def close(self):
+        """Release the search threads; searches still running are left to finish on their own"""
+        self._search_executor.shutdown(wait=False, cancel_futures=True)
+
+    def search_cache_stats(self) -> dict:
+        """Counters of the search cache (hits, misses, searches run) since the process started"""
+        return self.search_cache.stats.as_dict() if self.search_cache is not None else {}
+
     def _company_websearch(self, state: MemberInfoAgentState):
         if state.get('company_expand') == False:
-            return {'messages': [ToolMessage(content='', name='skip_tool', tool_call_id='company_websearch')]}
+            return {'company_search_result': ''}
         memberinfo = state['memberinfo']
         query = f"Search for company information for company {memberinfo.company} with URL {memberinfo.company_url}."
-        search_results = self.search_tool.invoke(
-            {"args": {"query": query, "max_result": 5}, "id": "company_websearch", "name": self.search_tool.name,
-             "type": "tool_call"})
-        return {'messages': [search_results]}
+        return {'company_search_result': self._websearch(query, "company_websearch", company_search_key(memberinfo))}
 
     def _linkedin_websearch(self, state: MemberInfoAgentState):
-        if state.get('company_expand') == False:
-            return {'messages': [ToolMessage(content='', name='skip_tool', tool_call_id='linkedin_websearch')]}
+        if state.get('linkedin_expand') == False:
+            return {'linkedin_search_result': ''}
         memberinfo = state.get('memberinfo')
         query = f"Search for linkedin profile for {memberinfo.name} with link {memberinfo.linkedin_url}"
-        search_results = self.search_tool.invoke(
-            {"args": {"query": query, "max_result": 5}, "id": "linkedin_websearch", "name": self.search_tool.name,
-             "type": "tool_call"})
-        return {'messages': [search_results]}
+        return {'linkedin_search_result': self._websearch(query, "linkedin_websearch",
+                                                          linkedin_search_key(memberinfo))}
 
     def _summarize(self, state: MemberInfoAgentState):
-        messages = state['messages']
+        from langchain_core.prompts import PromptTemplate
 
         # Memberinfo
         memberinfo_str = "## Member information" + \
@@ -82,22 +207,15 @@ class MemberInfoEnhanceAgent:
 
         # Company websearch info
         company_websearch_str = ""
-        try:
-            if state['messages'][0].content and state.get('company_expand'):
-                company_websearch_str = "## Company url searched from the web:\n" + \
-                                        str(state['messages'][0].content) + "\n"
-        except:
-            company_websearch_str = ""
+        if state.get('company_search_result') and state.get('company_expand'):
+            company_websearch_str = "## Company url searched from the web:\n" + \
+                                    state['company_search_result'] + "\n"
 
         # Linkin websearch info
         linkedin_websearch_str = ""
-        try:
-            if state['messages'][1].content and state.get('linkedin_expand'):
-                linkedin_websearch_str = "## Linkedin url searched from the web:\n" + \
-                                         str(state['messages'][0].content) + \
-                                         "\n"
-        except:
-            linkedin_websearch_str = ""
+        if state.get('linkedin_search_result') and state.get('linkedin_expand'):
+            linkedin_websearch_str = "## Linkedin url searched from the web:\n" + \
+                                     state['linkedin_search_result'] + "\n"
 
         summarized_prompt = PromptTemplate(
             input_variables=["memberinfo", "company_expand", "linkedin_expand"],
@@ -110,18 +228,18 @@ class MemberInfoEnhanceAgent:
 
     def summarized_with_enhanced_data(self,
                                       member: Member,
-                                      default_prompt: str = DATA_ENHANCE_PROMPT,
+                                      default_prompt: str = None,
                                       web_expand_company: bool = True,
                                       web_expand_linkedin: bool = True) -> str:
         """summarized_with_enhanced_data Enhance data information for searching the web using Duckduckgo search API
             1. Search for company Info given `company` & `company_url`
-            2. Search for member linkedin profile given `linkedin_url`
+            2. Search for member linkedin profile given `linkedin_url` (in parallel with 1.)
             3. LLM summarize member info and company info
             4. Return the result
 
         Args:
             member (Member): member information
-            default_prompt (str, optional): Prompt template. Defaults to PROMPT.
+            default_prompt (str, optional): Prompt template. Defaults to the `data_enhance.yaml` prompt.
             web_expand_company (bool, optional): Expand company information. Defaults to True.
             web_expand_linkedin (bool, optional): Expand linkedin information. Defaults to True.
 
@@ -129,13 +247,25 @@ class MemberInfoEnhanceAgent:
             str: summarized information
         """
 
+        summary, _ = self.summarize_with_timings(member, default_prompt, web_expand_company, web_expand_linkedin)
+        return summary
+
+    def summarize_with_timings(self,
+                               member: Member,
+                               default_prompt: str = None,
+                               web_expand_company: bool = True,
+                               web_expand_linkedin: bool = True) -> Tuple[str, Dict[str, float]]:
+        """Same as `summarized_with_enhanced_data`, also returning the seconds spent in each graph node"""
         initial_state = {"messages": [],
                          "memberinfo": member,
-                         "system_message": default_prompt,
+                         "system_message": default_prompt or default_data_enhance_prompt(),
                          "company_expand": web_expand_company,
-                         "linkedin_expand": web_expand_linkedin}
+                         "linkedin_expand": web_expand_linkedin,
+                         "company_search_result": "",
+                         "linkedin_search_result": "",
+                         "timings": {}}
         result = self.graph.invoke(initial_state)
-        return result['messages'][-1].content
+        return result['messages'][-1].content, result['timings']
 
     def get_embedding(self, text: str) -> List[float]:
         """get_embedding Get the embedding of the text
@@ -158,11 +288,32 @@ def agent_setup():
                            model_params={"model": GEMINI_EMBEDDINGS_MODEL,
                                          "google_api_key": DEFAULT_GEMINI_API_KEY})()
 
-    search_tool = DuckDuckGoSearchResults()
+    from langchain_community.tools import DuckDuckGoSearchResults
+    search_tool = DuckDuckGoSearchResults(api_wrapper=_duckduckgo_api_wrapper(SEARCH_TIMEOUT))
 
     return MemberInfoEnhanceAgent(chat_model, emb_model, search_tool)
 
 
+def _duckduckgo_api_wrapper(timeout: float):
+    """DuckDuckGo search wrapper whose HTTP client times out after `timeout` seconds, so a hung search frees
+    its thread (the langchain wrapper builds `DDGS()` with the library default)"""
+    from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+
+    class TimeoutDuckDuckGoSearchAPIWrapper(DuckDuckGoSearchAPIWrapper):
+        def _ddgs_text(self, query: str, max_results: Optional[int] = None) -> List[Dict[str, str]]:
+            try:
+                from ddgs import DDGS
+            except ImportError:
+                from duckduckgo_search import DDGS
+
+            with DDGS(timeout=timeout) as ddgs:
+                results = ddgs.text(query, region=self.region, safesearch=self.safesearch, timelimit=self.time,
+                                    max_results=max_results or self.max_results, backend=self.backend)
+                return [result for result in results] if results else []
+
+    return TimeoutDuckDuckGoSearchAPIWrapper()
+
+
 if __name__ == "__main__":
     from pathlib import Path
     current_working_directory = Path.cwd()
@@ -180,7 +331,7 @@ if __name__ == "__main__":
 
     initial_state = {"messages": [],
                      "memberinfo": member_10,
-                     "system_message": DATA_ENHANCE_PROMPT,
+                     "system_message": default_data_enhance_prompt(),
                      "company_expand": True,
                      "linkedin_expand": False}
 
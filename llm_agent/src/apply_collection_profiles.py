@@ -0,0 +1,27 @@
+"""
+Apply collection profiles (HNSW, quantization, on-disk storage, see `COLLECTION_PROFILES`) to existing Qdrant
+collections. New collections get their profile when they are created; this updates the ones created before.
+
+Qdrant rebuilds the index / quantized vectors in the background and keeps serving searches meanwhile.
+
+Usage:
+    python -m llm_agent.src.apply_collection_profiles --versions v1 v2 --profile balanced
+    QDRANT_VERSION_PROFILES="v1=balanced,v2=low_memory" python -m llm_agent.src.apply_collection_profiles
+"""
+import argparse
+
+from llm_agent.connectors.qdrant_connector import COLLECTION_PROFILES, make_qdrant_connector
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--versions", nargs="+", default=["v1", "v2"])
+    parser.add_argument("--profile", choices=list(COLLECTION_PROFILES), default=None,
+                        help="Profile applied to every version (defaults to the configured profile of each version)")
+    args = parser.parse_args()
+
+    qdrant_conn = make_qdrant_connector()
+    for version in args.versions:
+        if qdrant_conn.client.collection_exists(qdrant_conn.collection_name(version)):
+            qdrant_conn.update_collection_profile(version, args.profile)
+        else:
+            print(f"Collection {qdrant_conn.collection_name(version)} does not exist, skipped")
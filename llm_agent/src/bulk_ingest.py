@@ -0,0 +1,181 @@
+"""Chunked ingestion of member spreadsheets (xlsx / csv) into Postgres and Qdrant.
+
+Files are read `chunk_size` rows at a time, each chunk is cleaned column-wise with pandas, and every
+chunk costs a constant number of round trips: one `= ANY` existence check, one multi-row insert and
+one batched Qdrant upsert.
+"""
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterator, List, Tuple, Optional, Union, IO
+
+import pandas as pd
+from pydantic import ValidationError
+
+from llm_agent.connectors.postgres_connector import PostgresConnector
+from llm_agent.connectors.qdrant_connector import QdrantConnector, make_qdrant_connector
+from llm_agent.src.ingest_queue import IngestQueue
+from llm_agent.src.utils import Member
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", 5000))
+MEMBER_TEXT_FIELDS = ["name", "company", "title", "background", "company_url", "linkedin_url", "summary"]
+DEFAULT_VERSIONS = {"v1": True, "v2": False}
+
+Source = Union[str, Path, IO]
+
+
+def _source_suffix(source: Source) -> str:
+    name = source if isinstance(source, (str, Path)) else getattr(source, "name", "")
+    return Path(str(name)).suffix.lower()
+
+
+def _iter_excel_chunks(source: Source, chunk_size: int) -> Iterator[pd.DataFrame]:
+    # `pd.read_excel` has no `chunksize`, so stream the rows of the first sheet with openpyxl instead
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(col).strip() if col is not None else "" for col in next(rows, [])]
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def read_member_chunks(source: Source, chunk_size: int = INGEST_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Read an xlsx or csv file (path or uploaded file object) `chunk_size` rows at a time"""
+    if _source_suffix(source) == ".csv":
+        yield from pd.read_csv(source, chunksize=chunk_size)
+    else:
+        yield from _iter_excel_chunks(source, chunk_size)
+
+
+def _parse_versions(value) -> dict:
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str) and value.strip():
+        return json.loads(value)
+    return DEFAULT_VERSIONS
+
+
+def validate_member_chunk(df: pd.DataFrame) -> Tuple[List[Member], List[Tuple[int, str]]]:
+    """Turn a raw chunk into members
+
+    Cleaning is done per column (numeric `member_no`, empty strings for missing text, parsed `versions`);
+    only the rows left are validated as `Member`.
+
+    Args:
+        df (pd.DataFrame): Raw rows, index is the row number in the file
+
+    Returns:
+        Tuple[List[Member], List[Tuple[int, str]]]: Valid members and (row number, error) of invalid rows
+    """
+    errors = []
+    df = df.copy()
+    df["member_no"] = pd.to_numeric(df["member_no"], errors="coerce") if "member_no" in df else float("nan")
+    missing_no = df["member_no"].isna() | (df["member_no"] % 1 != 0)
+    errors.extend((idx, "Missing or invalid member_no") for idx in df.index[missing_no])
+    df = df[~missing_no]
+
+    for col in MEMBER_TEXT_FIELDS:
+        df[col] = df[col].fillna("").astype(str).str.strip() if col in df else ""
+    missing_name = df["name"] == ""
+    errors.extend((idx, "Missing name") for idx in df.index[missing_name])
+    df = df[~missing_name]
+
+    records = df[["member_no"] + MEMBER_TEXT_FIELDS].astype({"member_no": int}).to_dict("records")
+    versions = df["versions"].tolist() if "versions" in df else [DEFAULT_VERSIONS] * len(records)
+    members = []
+    for idx, record, version in zip(df.index, records, versions):
+        try:
+            members.append(Member(**record, versions=_parse_versions(version)))
+        except (ValidationError, ValueError) as e:
+            errors.append((idx, str(e)))
+    return members, errors
+
+
+class MemberBulkIngestor:
+    """Load member files into Postgres (and optionally Qdrant) chunk by chunk
+
+    Args:
+        pg_conn (PostgresConnector, optional): Defaults to a new connector on the shared pool.
+        qdrant_conn (QdrantConnector, optional): Needed only when `vectorize` is True.
+        chunk_size (int, optional): Rows read, validated and written at once. Defaults to INGEST_CHUNK_SIZE.
+        skip_existing (bool, optional): Keep stored members untouched and only insert new `member_no`
+            (the demo upload), instead of upserting every row (the batch script). Defaults to False.
+        vectorize (bool, optional): Also upsert the written members into Qdrant. Defaults to False.
+        queue (IngestQueue, optional): Enqueue the written members for the ingest worker instead of upserting
+            them inline (write-behind). Defaults to None.
+    """
+    def __init__(self,
+                 pg_conn: Optional[PostgresConnector] = None,
+                 qdrant_conn: Optional[QdrantConnector] = None,
+                 chunk_size: int = INGEST_CHUNK_SIZE,
+                 skip_existing: bool = False,
+                 vectorize: bool = False,
+                 queue: Optional[IngestQueue] = None):
+        self.pg_conn = pg_conn or PostgresConnector()
+        self.qdrant_conn = qdrant_conn or (make_qdrant_connector() if vectorize and not queue else None)
+        self.queue = queue
+        self.chunk_size = chunk_size
+        self.skip_existing = skip_existing
+        self.vectorize = vectorize
+
+    def ingest_chunk(self, df: pd.DataFrame) -> dict:
+        """Validate and write one chunk, returning its report"""
+        start = time.perf_counter()
+        members, errors = validate_member_chunk(df)
+        skipped = []
+        if self.skip_existing and members:
+            existing = self.pg_conn.get_existing_member_nos([member.member_no for member in members])
+            skipped = sorted(existing)
+            members = [member for member in members if member.member_no not in existing]
+            # Rows inserted concurrently since the check are left alone too
+            inserted = self.pg_conn.insert_new_members(members)
+            members = [member for member in members if member.member_no in inserted]
+        else:
+            self.pg_conn.update_member_info(members)
+        pg_seconds = time.perf_counter() - start
+        if self.vectorize and members:
+            if self.queue:
+                self.queue.enqueue([member.member_no for member in members])
+            else:
+                self.qdrant_conn.insert_members_bulk(members)
+        return {"rows": len(df),
+                "written": len(members),
+                "skipped_existing": skipped,
+                "invalid": errors,
+                "pg_seconds": pg_seconds,
+                "seconds": time.perf_counter() - start}
+
+    def iter_ingest(self, source: Source) -> Iterator[dict]:
+        """Ingest `source` and yield the report of each chunk as soon as it is written"""
+        for chunk_no, df in enumerate(read_member_chunks(source, self.chunk_size)):
+            # Row numbers as shown in the spreadsheet (header is row 1)
+            df.index = df.index % self.chunk_size + chunk_no * self.chunk_size + 2
+            report = self.ingest_chunk(df)
+            report["chunk"] = chunk_no
+            print(f"Chunk {chunk_no}: {report['written']}/{report['rows']} rows written, "
+                  f"{len(report['skipped_existing'])} existing, {len(report['invalid'])} invalid "
+                  f"in {report['seconds']:.2f}s")
+            yield report
+
+    def ingest(self, source: Source) -> dict:
+        """Ingest `source` and return the totals over all chunks"""
+        totals = {"chunks": 0, "rows": 0, "written": 0, "skipped_existing": 0, "invalid": 0, "seconds": 0.0}
+        for report in self.iter_ingest(source):
+            totals["chunks"] += 1
+            totals["rows"] += report["rows"]
+            totals["written"] += report["written"]
+            totals["skipped_existing"] += len(report["skipped_existing"])
+            totals["invalid"] += len(report["invalid"])
+            totals["seconds"] += report["seconds"]
+        return totals
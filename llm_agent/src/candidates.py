@@ -0,0 +1,222 @@
+"""All-pairs candidate generation for bulk recommendation runs.
+
+In a bulk run every member is both a query and a corpus item, so the candidates of all members are the
+rows of one similarity matrix. `AllPairsCandidateEngine` exports the stored vectors of a version once,
+normalizes them, and computes the top-k of each row with blocked matrix multiplies and `argpartition`
+(numpy releases the GIL, so blocks run on several cores), instead of one Qdrant query per member.
+
+The engine exposes `search_members_batch` like `QdrantConnector`, so it can be passed as the candidate
+source of `LlmReranker.recommend_many`.
+"""
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from llm_agent.connectors.qdrant_connector import QdrantConnector, RETURN_TOP_K, make_qdrant_connector
+from llm_agent.connectors.redis_connector import get_generation
+from llm_agent.src.utils import Member
+
+ALLPAIRS_BLOCK_SIZE = int(os.getenv("ALLPAIRS_BLOCK_SIZE", 256))
+ALLPAIRS_MAX_WORKERS = int(os.getenv("ALLPAIRS_MAX_WORKERS", os.cpu_count() or 1))
+# Share of the collection a run must target for the full export to beat batched Qdrant searches
+ALLPAIRS_MIN_TARGET_SHARE = float(os.getenv("ALLPAIRS_MIN_TARGET_SHARE", 0.2))
+
+
+def all_pairs_worthwhile(n_targets: int, n_members: int, min_share: float = ALLPAIRS_MIN_TARGET_SHARE) -> bool:
+    """Whether candidates of `n_targets` members should come from an all-pairs engine over a collection of
+    `n_members`: the engine exports every vector, which only pays off for a large share of the collection"""
+    return n_members > 0 and n_targets >= min_share * n_members
+
+
+class _Snapshot(NamedTuple):
+    """Exported vectors of one load, replaced as a whole so that readers never see a partial load"""
+    member_nos: np.ndarray
+    vectors: np.ndarray
+    documents: List[str]
+    row_of: Dict[int, int]
+    generation: Optional[int]
+
+
+_EMPTY_SNAPSHOT = _Snapshot(np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32), [], {}, None)
+
+
+class AllPairsCandidateEngine:
+    """Exact top-k neighbours of every member of a version, computed in memory from the stored vectors
+
+    `load` / `refresh` build the new vectors aside and publish them in one assignment, so one engine can be
+    shared by concurrent searches while it reloads; each search reads a single snapshot.
+
+    Args:
+        qdrant_conn (QdrantConnector, optional): Source of the vectors, also used for members that are not
+            indexed. Defaults to a new connector.
+        version (str, optional): Version (collection) to compute candidates for. Defaults to "v1".
+        top_k (int, optional): Candidates per member, the member itself excluded. Defaults to RETURN_TOP_K.
+        block_size (int, optional): Query rows per matrix multiply; each block holds a
+            `block_size` x `n_members` float32 score matrix. Defaults to ALLPAIRS_BLOCK_SIZE.
+        max_workers (int, optional): Blocks computed concurrently. Defaults to ALLPAIRS_MAX_WORKERS.
+        mmap_dir (str, optional): Keep the vectors in a memory-mapped `.npy` file in this directory instead of
+            RAM, for corpora larger than memory. Defaults to None.
+    """
+    def __init__(self,
+                 qdrant_conn: Optional[QdrantConnector] = None,
+                 version: str = "v1",
+                 top_k: int = RETURN_TOP_K,
+                 block_size: int = ALLPAIRS_BLOCK_SIZE,
+                 max_workers: int = ALLPAIRS_MAX_WORKERS,
+                 mmap_dir: Optional[str] = None):
+        self.qdrant_conn = qdrant_conn or make_qdrant_connector()
+        self.version = version
+        self.top_k = top_k
+        self.block_size = block_size
+        self.max_workers = max(max_workers, 1)
+        self.mmap_dir = mmap_dir
+        self._snapshot = _EMPTY_SNAPSHOT
+        self._mmap_path = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def collection(self) -> str:
+        return self.qdrant_conn.collection_name(self.version)
+
+    @property
+    def member_nos(self) -> np.ndarray:
+        return self._snapshot.member_nos
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._snapshot.vectors
+
+    @property
+    def documents(self) -> List[str]:
+        return self._snapshot.documents
+
+    @property
+    def row_of(self) -> Dict[int, int]:
+        return self._snapshot.row_of
+
+    @property
+    def generation(self) -> Optional[int]:
+        return self._snapshot.generation
+
+    def _allocate(self, n_rows: int, dim: int) -> Tuple[np.ndarray, Optional[str]]:
+        if not self.mmap_dir:
+            return np.empty((n_rows, dim), dtype=np.float32), None
+        path = tempfile.NamedTemporaryFile(dir=self.mmap_dir, prefix=self.collection, suffix=".npy",
+                                           delete=False).name
+        return np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n_rows, dim)), path
+
+    def _publish(self, snapshot: _Snapshot, mmap_path: Optional[str]):
+        """Swap in `snapshot` and remove the file of the previous one (mapped arrays of searches still running on
+        it stay readable)"""
+        with self._lock:
+            previous_path, self._snapshot, self._mmap_path = self._mmap_path, snapshot, mmap_path
+        if previous_path and os.path.exists(previous_path):
+            os.remove(previous_path)
+
+    def load(self) -> "AllPairsCandidateEngine":
+        """Export the vectors of `version` into one contiguous (normalized) array"""
+        start = time.perf_counter()
+        generation = get_generation(self.collection)
+        n_rows = self.qdrant_conn.count_members(self.version)
+        member_nos, documents, vectors, mmap_path, filled = [], [], None, None, 0
+        for page_ids, page_vectors, page_documents in self.qdrant_conn.export_vectors(self.version):
+            if vectors is None:
+                vectors, mmap_path = self._allocate(n_rows, page_vectors.shape[1])
+            # Points added while exporting are left for the next load
+            page_size = min(len(page_ids), n_rows - filled)
+            vectors[filled:filled + page_size] = page_vectors[:page_size]
+            member_nos.extend(page_ids[:page_size])
+            documents.extend(page_documents[:page_size])
+            filled += page_size
+        vectors = vectors[:filled] if vectors is not None else np.empty((0, 0), dtype=np.float32)
+        # Normalized once, so every block is a plain dot product (the collections use cosine distance)
+        for row in range(0, filled, self.block_size):
+            block = vectors[row:row + self.block_size]
+            block /= np.maximum(np.linalg.norm(block, axis=1, keepdims=True), 1e-12)
+        self._publish(_Snapshot(member_nos=np.asarray(member_nos, dtype=np.int64), vectors=vectors,
+                                documents=documents,
+                                row_of={member_no: row for row, member_no in enumerate(member_nos)},
+                                generation=generation), mmap_path)
+        print(f"Exported {filled} vectors of {self.collection} in {time.perf_counter() - start:.2f}s")
+        return self
+
+    def refresh(self) -> "AllPairsCandidateEngine":
+        """Reload the vectors if the collection changed since the last load (one reload at a time; searches
+        keep reading the previous snapshot meanwhile)"""
+        with self._refresh_lock:
+            if self.generation is None or get_generation(self.collection) != self.generation:
+                self.load()
+        return self
+
+    def close(self):
+        """Drop the exported vectors (and their memory-mapped file)"""
+        self._publish(_EMPTY_SNAPSHOT, None)
+
+    @staticmethod
+    def _block_topk(vectors: np.ndarray, rows: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = vectors[rows] @ vectors.T
+        scores[np.arange(len(rows)), rows] = -np.inf  # never recommend a member to itself
+        top = np.argpartition(scores, -top_k, axis=1)[:, -top_k:]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def topk(self, rows: Optional[np.ndarray] = None,
+             snapshot: Optional[_Snapshot] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k neighbours of the given rows (all rows by default) over the whole corpus
+
+        Args:
+            rows (np.ndarray, optional): Query rows. Defaults to all rows.
+            snapshot (_Snapshot, optional): Snapshot the rows refer to. Defaults to the current one.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Neighbour rows and their cosine scores, shape (len(rows), k),
+                best first
+        """
+        snapshot = snapshot or self._snapshot
+        rows = np.arange(len(snapshot.member_nos)) if rows is None else np.asarray(rows, dtype=np.int64)
+        top_k = min(self.top_k, len(snapshot.member_nos) - 1)
+        if top_k <= 0 or len(rows) == 0:
+            return np.empty((len(rows), 0), dtype=np.int64), np.empty((len(rows), 0), dtype=np.float32)
+        blocks = [rows[i:i + self.block_size] for i in range(0, len(rows), self.block_size)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(lambda block: self._block_topk(snapshot.vectors, block, top_k), blocks))
+        return np.concatenate([top for top, _ in results]), np.concatenate([scores for _, scores in results])
+
+    @staticmethod
+    def _to_query_responses(snapshot: _Snapshot, top: np.ndarray, scores: np.ndarray) -> list:
+        from qdrant_client.fastembed_common import QueryResponse
+
+        return [QueryResponse(id=int(snapshot.member_nos[row]), embedding=None, sparse_embedding=None,
+                              metadata={"document": snapshot.documents[row]}, document=snapshot.documents[row],
+                              score=float(score))
+                for row, score in zip(top, scores)]
+
+    def search_members_batch(self, members: List[Member], version: str) -> List[Dict[str, list]]:
+        """Candidates of `members`, same format as `QdrantConnector.search_members_batch`
+
+        Members that are not in the exported vectors (not indexed yet) are searched in Qdrant.
+        """
+        if version != self.version:
+            return self.qdrant_conn.search_members_batch(members, version)
+        if self.generation is None:
+            self.refresh()
+        snapshot = self._snapshot
+        indexed = [idx for idx, member in enumerate(members) if member.member_no in snapshot.row_of]
+        missing = [idx for idx, member in enumerate(members) if member.member_no not in snapshot.row_of]
+        results = [None] * len(members)
+        top, scores = self.topk(np.asarray([snapshot.row_of[members[idx].member_no] for idx in indexed],
+                                           dtype=np.int64), snapshot)
+        for idx, member_top, member_scores in zip(indexed, top, scores):
+            results[idx] = {version: self._to_query_responses(snapshot, member_top, member_scores)}
+        if missing:
+            for idx, res in zip(missing, self.qdrant_conn.search_members_batch([members[idx] for idx in missing],
+                                                                               version)):
+                results[idx] = res
+        return results
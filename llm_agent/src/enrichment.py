@@ -0,0 +1,252 @@
+"""Concurrent enrichment engine for running `MemberInfoEnhanceAgent` over many members.
+
+The engine replaces the serial `for member ...: summarize(); time.sleep(30)` loop with a bounded
+thread pool whose throughput is governed by a token bucket sized to the LLM provider quota.
+Members are scheduled company by company so that each distinct company is searched once and its
+colleagues reuse the cached result.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Iterator, Tuple, Union, TYPE_CHECKING
+
+from tqdm import tqdm
+
+from llm_agent.src._data_enhance_agent import company_search_key
+from llm_agent.src.utils import Member
+
+if TYPE_CHECKING:
+    from llm_agent.connectors.postgres_connector import PostgresConnector
+
+DEFAULT_ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", 4))
+# Requests per minute allowed by the provider quota (e.g. Gemini 1.5 Pro pay-as-you-go tier)
+DEFAULT_LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 60))
+DEFAULT_LLM_BURST = int(os.getenv("LLM_BURST", 1))
+# Enriched members written back to Postgres at once by `EnrichmentJob`
+ENRICH_CHECKPOINT_SIZE = int(os.getenv("ENRICH_CHECKPOINT_SIZE", 10))
+# Attempts per member before it is left failed, and the pause before each retry round
+ENRICH_MAX_ATTEMPTS = int(os.getenv("ENRICH_MAX_ATTEMPTS", 3))
+ENRICH_RETRY_DELAY = float(os.getenv("ENRICH_RETRY_DELAY", 30))
+
+
+def enrichment_input_hash(member: Member) -> str:
+    """Hash of what the enrichment of `member` depends on: its profile, without the summary it writes back"""
+    profile = json.dumps(member.model_dump(exclude={"summary"}), sort_keys=True)
+    return hashlib.sha256(profile.encode("utf-8")).hexdigest()
+
+
+class TokenBucketRateLimiter:
+    """Thread-safe token bucket.
+
+    Tokens refill continuously at `rate_per_minute / 60` tokens per second up to `capacity`.
+    `acquire` blocks the calling thread until enough tokens are available.
+    """
+    def __init__(self, rate_per_minute: float = DEFAULT_LLM_REQUESTS_PER_MINUTE, capacity: int = DEFAULT_LLM_BURST):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute should be positive")
+        self.rate_per_second = rate_per_minute / 60
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate_per_second)
+        self._last_refill = now
+
+    def acquire(self, tokens: int = 1) -> float:
+        """Block until `tokens` are available and consume them.
+
+        Returns:
+            float: seconds spent waiting
+
+        Raises:
+            ValueError: `tokens` exceeds the bucket capacity, it would never be available
+        """
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket of capacity {self.capacity}")
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait_time = (tokens - self._tokens) / self.rate_per_second
+            time.sleep(wait_time)
+            waited += wait_time
+
+
+class EnrichmentEngine:
+    """Run `agent.summarized_with_enhanced_data` concurrently under a rate limit.
+
+    Args:
+        agent (MemberInfoEnhanceAgent): agent used to summarize each member
+        max_workers (int, optional): Number of members enriched in parallel. Defaults to DEFAULT_ENRICH_CONCURRENCY.
+        rate_limiter (TokenBucketRateLimiter, optional): Limiter shared by all workers, one token per member.
+            Defaults to a limiter built from DEFAULT_LLM_REQUESTS_PER_MINUTE.
+    """
+    def __init__(self,
+                 agent,
+                 max_workers: int = DEFAULT_ENRICH_CONCURRENCY,
+                 rate_limiter: Optional[TokenBucketRateLimiter] = None):
+        self.agent = agent
+        self.max_workers = max(max_workers, 1)
+        self.rate_limiter = rate_limiter or TokenBucketRateLimiter()
+
+        self.last_report: Dict[str, float] = {}
+
+    def _enrich_one(self, member: Member) -> str:
+        self.rate_limiter.acquire()
+        return self.agent.summarized_with_enhanced_data(member)
+
+    @staticmethod
+    def schedule_by_company(members: List[Member]) -> List[int]:
+        """Order member indexes so the first member of every company comes before any repeat
+
+        The first round searches each distinct company once, in parallel; later rounds find the company
+        result in the search cache instead of blocking workers on an in-flight search.
+        """
+        seen = defaultdict(int)
+        rounds = []
+        for idx, member in enumerate(members):
+            key = company_search_key(member)
+            rounds.append((seen[key], idx))
+            seen[key] += 1
+        return [idx for _, idx in sorted(rounds)]
+
+    def _search_stats(self) -> dict:
+        stats = getattr(self.agent, "search_cache_stats", None)
+        return stats() if stats else {}
+
+    def _report(self, members: List[Member], before: dict, elapsed: float) -> Dict[str, float]:
+        after = self._search_stats()
+        delta = {name: after.get(name, 0) - before.get(name, 0)
+                 for name in ("local_hits", "redis_hits", "shared_misses", "misses", "computes")}
+        lookups = delta["local_hits"] + delta["redis_hits"] + delta["shared_misses"] + delta["misses"]
+        saved = lookups - delta["computes"]
+        return {"members": len(members),
+                "companies": len({company_search_key(member) for member in members}),
+                "search_lookups": lookups,
+                "searches": delta["computes"],
+                "searches_saved": saved,
+                "search_hit_ratio": saved / lookups if lookups else 0.0,
+                "seconds": elapsed}
+
+    def iter_enrich(self,
+                    members: List[Member],
+                    progress: bool = True,
+                    return_exceptions: bool = False) -> Iterator[Tuple[int, Member, Union[str, Exception]]]:
+        """Yield `(index, member, summary)` as soon as each member finishes.
+
+        Raises the first exception raised by the agent after cancelling the pending members, unless
+        `return_exceptions` is True: the exception is then yielded in place of the summary and the other members
+        go on. Once all members are done, `last_report` holds the search cache hit ratio and the searches saved.
+        """
+        before, start = self._search_stats(), time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._enrich_one, members[idx]): idx
+                       for idx in self.schedule_by_company(members)}
+            try:
+                for future in tqdm(as_completed(futures), total=len(futures), disable=not progress):
+                    idx = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if not return_exceptions:
+                            raise
+                        result = e
+                    yield idx, members[idx], result
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        self.last_report = self._report(members, before, time.perf_counter() - start)
+        print(f"Enriched {len(members)} members from {self.last_report['companies']} companies: "
+              f"{self.last_report['searches']} searches, {self.last_report['searches_saved']} saved "
+              f"(hit ratio {self.last_report['search_hit_ratio']:.1%}) in {self.last_report['seconds']:.1f}s")
+
+    def enrich(self, members: List[Member], progress: bool = True) -> List[str]:
+        """Summarize all members and return the summaries in the same order as `members`."""
+        results = [None] * len(members)
+        for idx, _, summary in self.iter_enrich(members, progress=progress):
+            results[idx] = summary
+        return results
+
+
+class EnrichmentJob:
+    """Checkpointed, resumable enrichment of members with per-member state in Postgres
+
+    Every member of the job is recorded as `pending`, `done` or `failed` (with its error) in
+    `member_enrichment_job`, with the hash of its enrichment input (`enrichment_input_hash`). Summaries are
+    written back every `checkpoint_size` members together with their state, so an interrupted run loses at most
+    one checkpoint of LLM calls: running the same `job_id` again only enriches the members not done yet, or
+    edited since they were done. A failing member does not abort the run; failed members are
+    retried in later rounds until they fail `max_attempts` times, then left failed with their error.
+
+    Args:
+        engine (EnrichmentEngine): Engine enriching the members
+        pg_conn (PostgresConnector): Connector holding the summaries and the job state
+        job_id (str): Id of the job; the same id resumes the job
+        checkpoint_size (int, optional): Members written back at once. Defaults to ENRICH_CHECKPOINT_SIZE.
+        max_attempts (int, optional): Attempts per member. Defaults to ENRICH_MAX_ATTEMPTS.
+        retry_delay (float, optional): Seconds waited before each retry round. Defaults to ENRICH_RETRY_DELAY.
+    """
+    def __init__(self,
+                 engine: EnrichmentEngine,
+                 pg_conn: "PostgresConnector",
+                 job_id: str,
+                 checkpoint_size: int = ENRICH_CHECKPOINT_SIZE,
+                 max_attempts: int = ENRICH_MAX_ATTEMPTS,
+                 retry_delay: float = ENRICH_RETRY_DELAY):
+        self.engine = engine
+        self.pg_conn = pg_conn
+        self.job_id = job_id
+        self.checkpoint_size = max(checkpoint_size, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_delay = retry_delay
+
+    def _enrich_round(self, members: List[Member], input_hashes: Dict[int, str], progress: bool):
+        """Enrich `members` once, checkpointing as they finish"""
+        done, failed = [], []
+        for _, member, result in self.engine.iter_enrich(members, progress=progress, return_exceptions=True):
+            if isinstance(result, Exception):
+                failed.append((member.member_no, f"{type(result).__name__}: {result}"))
+            else:
+                member.summary = result
+                done.append(member)
+            if len(done) + len(failed) >= self.checkpoint_size:
+                self.pg_conn.checkpoint_enrichment(self.job_id, done, failed, input_hashes)
+                done, failed = [], []
+        self.pg_conn.checkpoint_enrichment(self.job_id, done, failed, input_hashes)
+
+    def run(self, members: List[Member], progress: bool = True) -> List[Member]:
+        """Enrich the members of the job not done yet
+
+        Members already done in an earlier run of the job keep the summary they were loaded with (the one
+        written back by that run).
+
+        Returns:
+            List[Member]: `members`, with the new summaries of the members enriched by this run
+        """
+        # Hashed before the enrichment writes the summaries
+        input_hashes = {member.member_no: enrichment_input_hash(member) for member in members}
+        self.pg_conn.create_enrichment_job(self.job_id, input_hashes)
+        for attempt in range(self.max_attempts):
+            todo = self.pg_conn.get_enrichment_todo(self.job_id, self.max_attempts)
+            round_members = [member for member in members if member.member_no in todo]
+            if not round_members:
+                break
+            if attempt:
+                print(f"Retrying {len(round_members)} failed members of job {self.job_id} in {self.retry_delay}s")
+                time.sleep(self.retry_delay)
+            self._enrich_round(round_members, input_hashes, progress)
+        counts = self.pg_conn.get_enrichment_job_counts(self.job_id)
+        print(f"Enrichment job {self.job_id}: {counts.get('done', 0)} done, {counts.get('failed', 0)} failed, "
+              f"{counts.get('pending', 0)} pending")
+        return members
@@ -0,0 +1,296 @@
+"""Write-behind ingestion queue between the demo and Qdrant.
+
+The UI writes members to Postgres and enqueues their `member_no` (`IngestQueue.enqueue`) instead of embedding
+and upserting inline. A worker process (`IngestQueueWorker`) drains the queue in micro-batches: it waits up to
+`linger` seconds after the oldest entry so bursts of updates go out together, reads the latest state of the
+batch from Postgres and writes it with one `insert_members_bulk` call.
+
+Redis keys (prefix INGEST_QUEUE_PREFIX):
+    - `pending`: sorted set of `member_no` by enqueue time; a member enqueued again before it is processed is
+      only written once
+    - `processing`: hash of the `member_no` claimed by a worker, with the claim time; claims older than
+      `claim_timeout` were left by a worker that died and are put back in `pending` by the other workers
+    - `attempts`: hash of failed attempts per `member_no`, bounded by `max_attempts`
+    - `status:<member_no>`: state of a member (`queued`, `processing`, `done`, `failed`) for the UI
+    - `stats`: counters, last batch and worker heartbeat
+
+Usage:
+    python -m llm_agent.src.ingest_queue --batch-size 256 --linger 0.5
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from llm_agent.connectors.postgres_connector import PostgresConnector
+from llm_agent.connectors.qdrant_connector import QdrantConnector, make_qdrant_connector
+from llm_agent.connectors.redis_connector import redis_client
+
+INGEST_QUEUE_PREFIX = os.getenv("INGEST_QUEUE_PREFIX", "ingest_queue")
+INGEST_QUEUE_BATCH_SIZE = int(os.getenv("INGEST_QUEUE_BATCH_SIZE", 256))
+INGEST_QUEUE_LINGER = float(os.getenv("INGEST_QUEUE_LINGER", 0.5))  # seconds an entry may wait for a fuller batch
+INGEST_QUEUE_POLL_INTERVAL = float(os.getenv("INGEST_QUEUE_POLL_INTERVAL", 0.2))
+INGEST_QUEUE_MAX_ATTEMPTS = int(os.getenv("INGEST_QUEUE_MAX_ATTEMPTS", 3))
+INGEST_STATUS_TTL = int(os.getenv("INGEST_STATUS_TTL", 24*60*60))  # 1 day in seconds
+# A worker whose last heartbeat is older than this is reported as down
+INGEST_WORKER_TIMEOUT = 30
+# A claim older than this was abandoned by its worker (longer than any batch takes)
+INGEST_CLAIM_TIMEOUT = float(os.getenv("INGEST_CLAIM_TIMEOUT", 300))
+
+# Move up to ARGV[1] oldest pending entries to `processing` in one step, so a claimed entry is never lost
+_CLAIM_SCRIPT = """
+local items = redis.call('ZPOPMIN', KEYS[1], ARGV[1])
+for i = 1, #items, 2 do
+    redis.call('HSET', KEYS[2], items[i], ARGV[2])
+end
+return items
+"""
+
+# Move the entries of `processing` claimed before ARGV[1] back to `pending`, in one step so a claim completed
+# meanwhile is not requeued
+_RECOVER_SCRIPT = """
+local claimed = redis.call('HGETALL', KEYS[2])
+local recovered = 0
+for i = 1, #claimed, 2 do
+    if tonumber(claimed[i + 1]) < tonumber(ARGV[1]) then
+        redis.call('ZADD', KEYS[1], 'NX', claimed[i + 1], claimed[i])
+        redis.call('HDEL', KEYS[2], claimed[i])
+        recovered = recovered + 1
+    end
+end
+return recovered
+"""
+
+# Set the status key KEYS[i + 1] of member ARGV[i + 2] to ARGV[1] (TTL ARGV[2] seconds), unless the member is in
+# `pending` (KEYS[1]) again: it was enqueued again while it was processed, so it stays `queued`
+_SET_FINAL_STATUS_SCRIPT = """
+for i = 3, #ARGV do
+    if not redis.call('ZSCORE', KEYS[1], ARGV[i]) then
+        redis.call('SET', KEYS[i - 1], ARGV[1], 'EX', ARGV[2])
+    end
+end
+return 0
+"""
+
+
+class IngestQueue:
+    """Redis-backed queue of `member_no` waiting to be vectorized (see module docstring)"""
+    def __init__(self, prefix: str = INGEST_QUEUE_PREFIX):
+        self.prefix = prefix
+        self.pending_key = f"{prefix}:pending"
+        self.processing_key = f"{prefix}:processing"
+        self.attempts_key = f"{prefix}:attempts"
+        self.stats_key = f"{prefix}:stats"
+        self._claim = None
+        self._recover = None
+        self._set_final_status = None
+
+    def _status_key(self, member_no: int) -> str:
+        return f"{self.prefix}:status:{member_no}"
+
+    def set_status(self, member_nos: List[int], state: str, error: Optional[str] = None):
+        value = json.dumps({"state": state, "at": time.time(), "error": error})
+        pipe = redis_client().pipeline(transaction=False)
+        for member_no in member_nos:
+            pipe.set(self._status_key(member_no), value, ex=INGEST_STATUS_TTL)
+        pipe.execute()
+
+    def _finish(self, member_nos: List[int], state: str, error: Optional[str] = None):
+        """Set the final `state` of `member_nos`, except those enqueued again meanwhile (see `set_status`)"""
+        if self._set_final_status is None:
+            self._set_final_status = redis_client().register_script(_SET_FINAL_STATUS_SCRIPT)
+        value = json.dumps({"state": state, "at": time.time(), "error": error})
+        self._set_final_status(keys=[self.pending_key, *map(self._status_key, member_nos)],
+                               args=[value, INGEST_STATUS_TTL, *member_nos])
+
+    def enqueue(self, member_nos: List[int]) -> int:
+        """Queue `member_nos` for vectorization; members already queued keep their place
+
+        Returns:
+            int: Number of members newly queued
+        """
+        member_nos = list(dict.fromkeys(member_nos))
+        if not member_nos:
+            return 0
+        added = redis_client().zadd(self.pending_key, {member_no: time.time() for member_no in member_nos}, nx=True)
+        self.set_status(member_nos, "queued")
+        return added
+
+    def claim(self, count: int) -> List[int]:
+        """Take the `count` oldest pending members for processing"""
+        if self._claim is None:
+            self._claim = redis_client().register_script(_CLAIM_SCRIPT)
+        items = self._claim(keys=[self.pending_key, self.processing_key], args=[count, time.time()])
+        return [int(item) for item in items[::2]]
+
+    def oldest_age(self) -> Optional[float]:
+        """Seconds the oldest pending member has been waiting (None if the queue is empty)"""
+        oldest = redis_client().zrange(self.pending_key, 0, 0, withscores=True)
+        return time.time() - oldest[0][1] if oldest else None
+
+    def complete(self, member_nos: List[int]):
+        """Release the claims of `member_nos` and mark them done, except those enqueued again meanwhile"""
+        pipe = redis_client().pipeline(transaction=False)
+        pipe.hdel(self.processing_key, *member_nos)
+        pipe.hdel(self.attempts_key, *member_nos)
+        pipe.execute()
+        self._finish(member_nos, "done")
+
+    def fail(self, member_nos: List[int], error: str, max_attempts: int = INGEST_QUEUE_MAX_ATTEMPTS) -> List[int]:
+        """Put `member_nos` back in the queue, or mark them failed once they failed `max_attempts` times
+
+        Returns:
+            List[int]: Members given up on
+        """
+        client = redis_client()
+        pipe = client.pipeline(transaction=False)
+        for member_no in member_nos:
+            pipe.hincrby(self.attempts_key, member_no, 1)
+        attempts = pipe.execute()
+        retry = [member_no for member_no, attempt in zip(member_nos, attempts) if attempt < max_attempts]
+        given_up = [member_no for member_no, attempt in zip(member_nos, attempts) if attempt >= max_attempts]
+        pipe = client.pipeline(transaction=False)
+        pipe.hdel(self.processing_key, *member_nos)
+        if retry:
+            pipe.zadd(self.pending_key, {member_no: time.time() for member_no in retry}, nx=True)
+        if given_up:
+            pipe.hdel(self.attempts_key, *given_up)
+            pipe.hincrby(self.stats_key, "failed", len(given_up))
+        pipe.execute()
+        if retry:
+            self.set_status(retry, "queued", error)
+        if given_up:
+            self._finish(given_up, "failed", error)
+        return given_up
+
+    def recover(self, claim_timeout: float = INGEST_CLAIM_TIMEOUT) -> int:
+        """Put the members claimed more than `claim_timeout` seconds ago, by a worker that stopped before
+        finishing them, back in the queue; members in flight in live workers are left alone
+
+        Returns:
+            int: Number of members requeued
+        """
+        if self._recover is None:
+            self._recover = redis_client().register_script(_RECOVER_SCRIPT)
+        return self._recover(keys=[self.pending_key, self.processing_key], args=[time.time() - claim_timeout])
+
+    def status(self, member_nos: List[int]) -> Dict[int, dict]:
+        """State of `member_nos` (members without a recent state are left out)"""
+        values = redis_client().mget([self._status_key(member_no) for member_no in member_nos])
+        return {member_no: json.loads(value) for member_no, value in zip(member_nos, values) if value}
+
+    def stats(self) -> dict:
+        """Queue length, members in flight, counters, last batch and whether a worker is alive"""
+        client = redis_client()
+        stats = {key.decode(): float(value) for key, value in client.hgetall(self.stats_key).items()}
+        heartbeat = stats.pop("heartbeat", None)
+        return {"pending": client.zcard(self.pending_key),
+                "processing": client.hlen(self.processing_key),
+                "oldest_age": self.oldest_age(),
+                "worker_alive": heartbeat is not None and time.time() - heartbeat < INGEST_WORKER_TIMEOUT,
+                **stats}
+
+    def record_batch(self, size: int, seconds: float):
+        pipe = redis_client().pipeline(transaction=False)
+        pipe.hincrby(self.stats_key, "processed", size)
+        pipe.hset(self.stats_key, mapping={"last_batch_size": size, "last_batch_seconds": seconds,
+                                           "last_batch_at": time.time()})
+        pipe.execute()
+
+    def heartbeat(self):
+        redis_client().hset(self.stats_key, "heartbeat", time.time())
+
+
+class IngestQueueWorker:
+    """Drain an `IngestQueue` into Qdrant in micro-batches
+
+    Args:
+        queue (IngestQueue, optional): Defaults to the queue of INGEST_QUEUE_PREFIX.
+        qdrant_conn (QdrantConnector, optional): Defaults to the configured layout.
+        pg_conn (PostgresConnector, optional): Source of the latest member data. Defaults to a new connector.
+        batch_size (int, optional): Members written per batch. Defaults to INGEST_QUEUE_BATCH_SIZE.
+        linger (float, optional): Seconds the oldest entry may wait for a fuller batch. Defaults to
+            INGEST_QUEUE_LINGER.
+        max_attempts (int, optional): Attempts per member before it is marked failed. Defaults to
+            INGEST_QUEUE_MAX_ATTEMPTS.
+        claim_timeout (float, optional): Seconds after which a claimed member is considered abandoned by its
+            worker and requeued. Defaults to INGEST_CLAIM_TIMEOUT.
+    """
+    def __init__(self,
+                 queue: Optional[IngestQueue] = None,
+                 qdrant_conn: Optional[QdrantConnector] = None,
+                 pg_conn: Optional[PostgresConnector] = None,
+                 batch_size: int = INGEST_QUEUE_BATCH_SIZE,
+                 linger: float = INGEST_QUEUE_LINGER,
+                 max_attempts: int = INGEST_QUEUE_MAX_ATTEMPTS,
+                 claim_timeout: float = INGEST_CLAIM_TIMEOUT):
+        self.queue = queue or IngestQueue()
+        self.qdrant_conn = qdrant_conn or make_qdrant_connector()
+        self.pg_conn = pg_conn or PostgresConnector()
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_attempts = max_attempts
+        self.claim_timeout = claim_timeout
+
+    def process_batch(self) -> int:
+        """Write the next batch to Qdrant, waiting up to `linger` for it to fill up
+
+        Returns:
+            int: Number of members processed (0 if the queue is empty)
+        """
+        oldest_age = self.queue.oldest_age()
+        if oldest_age is None:
+            return 0
+        if oldest_age < self.linger and redis_client().zcard(self.queue.pending_key) < self.batch_size:
+            time.sleep(self.linger - oldest_age)
+        member_nos = self.queue.claim(self.batch_size)
+        if not member_nos:
+            return 0
+        start = time.perf_counter()
+        self.queue.set_status(member_nos, "processing")
+        try:
+            members = self.pg_conn.get_members_by_ids(member_nos)
+            if members:
+                self.qdrant_conn.insert_members_bulk(members)
+        except Exception as e:
+            given_up = self.queue.fail(member_nos, f"{type(e).__name__}: {e}", self.max_attempts)
+            print(f"Batch of {len(member_nos)} members failed ({e}), {len(given_up)} given up")
+            return len(member_nos)
+        self.queue.complete(member_nos)
+        self.queue.record_batch(len(member_nos), time.perf_counter() - start)
+        return len(member_nos)
+
+    def run(self, poll_interval: float = INGEST_QUEUE_POLL_INTERVAL, max_idle: Optional[float] = None):
+        """Process batches until interrupted (or until the queue stayed empty for `max_idle` seconds)
+
+        Abandoned claims are requeued at start and then every `claim_timeout` seconds, so several workers can
+        share the queue and pick up the members of one that died.
+        """
+        idle_since = time.monotonic()
+        recovered_at = None
+        while True:
+            if recovered_at is None or time.monotonic() - recovered_at > self.claim_timeout:
+                recovered = self.queue.recover(self.claim_timeout)
+                if recovered:
+                    print(f"Requeued {recovered} members abandoned in processing by a stopped worker")
+                recovered_at = time.monotonic()
+            self.queue.heartbeat()
+            if self.process_batch():
+                idle_since = time.monotonic()
+                continue
+            if max_idle is not None and time.monotonic() - idle_since > max_idle:
+                return
+            time.sleep(poll_interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=INGEST_QUEUE_BATCH_SIZE)
+    parser.add_argument("--linger", type=float, default=INGEST_QUEUE_LINGER)
+    parser.add_argument("--max-attempts", type=int, default=INGEST_QUEUE_MAX_ATTEMPTS)
+    parser.add_argument("--claim-timeout", type=float, default=INGEST_CLAIM_TIMEOUT)
+    args = parser.parse_args()
+
+    IngestQueueWorker(batch_size=args.batch_size, linger=args.linger, max_attempts=args.max_attempts,
+                      claim_timeout=args.claim_timeout).run()
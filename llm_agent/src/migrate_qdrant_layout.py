@@ -0,0 +1,81 @@
+"""
+Migrate members from the per-version layout (one collection per version, `member_enhanced_v1`, ...) to the
+multi-vector layout (one collection with a named vector per version, see `MultiVectorQdrantConnector`).
+
+Stored vectors are copied as they are (nothing is re-embedded). Each page of points read from a version is
+completed with the vectors of the same members in the other versions, so every member is written as one point
+with all its versions. Members already migrated are skipped and the source collections are left untouched, so
+the migration can be re-run and the old layout stays usable until `QDRANT_LAYOUT` is switched.
+
+Usage:
+    python -m llm_agent.src.migrate_qdrant_layout --versions v1 v2
+"""
+import argparse
+import time
+from typing import Dict, List, Optional, Tuple
+
+from llm_agent.connectors.qdrant_connector import (QdrantConnector, MultiVectorQdrantConnector, EXPORT_PAGE_SIZE,
+                                                   MULTI_VECTOR_COLLECTION, MEMBER_COLLECTION_PREFIX)
+
+
+def _retrieve_version(source: QdrantConnector, version: str, member_nos: List[int]) -> Dict[int, Tuple[list, str]]:
+    """(vector, document) of the members of `member_nos` stored in `version` of `source`"""
+    collection = source.collection_name(version)
+    if not source.client.collection_exists(collection):
+        return {}
+    vector_name = source._vector_name(version)
+    points = source.client.retrieve(collection_name=collection, ids=member_nos, with_payload=["document"],
+                                    with_vectors=[vector_name])
+    return {point.id: (point.vector[vector_name], point.payload.get("document", "")) for point in points}
+
+
+def migrate_to_multi_vector(source: QdrantConnector,
+                            target: MultiVectorQdrantConnector,
+                            versions: Optional[List[str]] = None,
+                            page_size: int = EXPORT_PAGE_SIZE) -> Dict[str, int]:
+    """Copy the points of every version of `source` into the collection of `target`
+
+    Args:
+        source (QdrantConnector): Connector of the per-version layout
+        target (MultiVectorQdrantConnector): Connector of the multi-vector layout
+        versions (List[str], optional): Versions to migrate. Defaults to the versions of `target`.
+        page_size (int, optional): Points read and written per request. Defaults to EXPORT_PAGE_SIZE.
+
+    Returns:
+        Dict[str, int]: Number of vectors migrated per version
+    """
+    if source.embedder.model_name != target.embedder.model_name:
+        raise ValueError(f"Embedding models differ: {source.embedder.model_name} (source) and "
+                         f"{target.embedder.model_name} (target)")
+    versions = versions or target.versions
+    migrated = {version: 0 for version in versions}
+    start = time.perf_counter()
+    for version in versions:
+        other_versions = [other for other in versions if other != version]
+        for member_nos, vectors, documents in source.export_vectors(version, page_size):
+            rows = [(member_no, version, vector, document)
+                    for member_no, vector, document in zip(member_nos, vectors.tolist(), documents)]
+            for other in other_versions:
+                rows.extend((member_no, other, vector, document)
+                            for member_no, (vector, document) in _retrieve_version(source, other, member_nos).items())
+            for row_version, count in target.import_vectors(rows, batch_size=page_size).items():
+                migrated[row_version] += count
+        print(f"Migrated {source.collection_name(version)} to {target.collection} "
+              f"({time.perf_counter() - start:.2f}s elapsed)")
+    if any(migrated.values()):
+        target.invalidate_collection_cache(target.collection)
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--versions", nargs="+", default=None)
+    parser.add_argument("--source-prefix", default=MEMBER_COLLECTION_PREFIX)
+    parser.add_argument("--target-collection", default=MULTI_VECTOR_COLLECTION)
+    parser.add_argument("--page-size", type=int, default=EXPORT_PAGE_SIZE)
+    args = parser.parse_args()
+
+    source_conn = QdrantConnector(collection_prefix=args.source_prefix)
+    target_conn = MultiVectorQdrantConnector(collection=args.target_collection,
+                                             versions=args.versions)
+    migrate_to_multi_vector(source_conn, target_conn, args.versions, args.page_size)
@@ -0,0 +1,231 @@
+"""
+Blue/green re-index: rebuild the Qdrant collections from Postgres without touching the ones being searched.
+
+Each serving collection name (`member_enhanced_v1`, or the multi-vector collection) is rebuilt into a new physical
+collection (see `QdrantConnector.staging_connector`):
+1. Stream every member of the versions from Postgres and upsert them in parallel batches; HNSW indexing is
+   deferred until all points are loaded, so the load runs at full ingest speed
+2. Catch up with the members changed while the load was running
+3. Validate the point count of every version against the streamed members (and against the serving collection)
+4. Catch up once more with the members changed while the collection was indexed and validated
+5. Point the serving name, a Qdrant alias, at the new collection in one atomic request; `_search` and the
+   incremental sync keep using the same name and the search cache of the name is invalidated
+6. Rewind the sync watermark of every version to the last member loaded, so the next incremental sync writes
+   the members the new collection missed: those changed within SYNC_SAFETY_LAG of the last catch-up, or
+   written to the old collection (by the sync or the ingest queue) after it
+7. Delete the collection the alias pointed at before
+
+Searches keep hitting the old collection until the switch. A failed build is deleted and leaves serving untouched.
+The first re-index of a collection created before aliases were used has to delete that collection before its
+name can become an alias, so searches fail for the instant between both requests.
+
+Usage:
+    python -m llm_agent.src.reindex_qdrant --versions v1 v2 --max-workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Set
+
+from llm_agent.connectors.postgres_connector import PostgresConnector, INITIAL_WATERMARK, Watermark
+from llm_agent.connectors.qdrant_connector import QdrantConnector, make_qdrant_connector, UPSERT_CHUNK_SIZE
+
+REINDEX_BATCH_SIZE = int(os.getenv("REINDEX_BATCH_SIZE", UPSERT_CHUNK_SIZE))
+REINDEX_MAX_WORKERS = int(os.getenv("REINDEX_MAX_WORKERS", 4))
+# Largest accepted drop of the point count compared with the serving collection
+REINDEX_MAX_SHRINK = float(os.getenv("REINDEX_MAX_SHRINK", 0.05))
+REINDEX_INDEXING_TIMEOUT = int(os.getenv("REINDEX_INDEXING_TIMEOUT", 60 * 60))
+# Qdrant's default indexing threshold (KB of vectors), restored once the points are loaded
+INDEXING_THRESHOLD = 20000
+
+
+def alias_target(client, alias: str) -> Optional[str]:
+    """Collection `alias` points at (None if `alias` is not an alias)"""
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+
+def switch_alias(client, alias: str, collection: str) -> Optional[str]:
+    """Point `alias` at `collection` in one atomic request
+
+    Returns:
+        Optional[str]: Collection the alias pointed at before (None if it did not exist)
+    """
+    from qdrant_client.models import CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
+
+    previous = alias_target(client, alias)
+    operations = []
+    if previous is not None:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+    elif client.collection_exists(alias):
+        print(f"Collection {alias} is not an alias yet, deleting it to create the alias")
+        client.delete_collection(alias)
+    operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=collection, alias_name=alias)))
+    client.update_collection_aliases(change_aliases_operations=operations)
+    return previous
+
+
+class BlueGreenReindexer:
+    """Rebuild collections behind their alias (see module docstring)
+
+    Args:
+        qdrant_conn (QdrantConnector, optional): Serving connector. Defaults to the configured layout.
+        pg_conn (PostgresConnector, optional): Source of the members. Defaults to a new connector.
+        batch_size (int, optional): Members streamed and upserted per batch. Defaults to REINDEX_BATCH_SIZE.
+        max_workers (int, optional): Batches embedded and upserted concurrently. Defaults to REINDEX_MAX_WORKERS.
+        parallel (int, optional): Embedding worker processes, shared by the batches (see `insert_members_bulk`).
+            Defaults to None (EMBED_PARALLEL).
+        max_shrink (float, optional): Largest accepted relative drop of a version's point count compared with
+            the serving collection. Defaults to REINDEX_MAX_SHRINK.
+        keep_previous (bool, optional): Keep the previous collection (for a rollback with `switch_alias`)
+            instead of deleting it. Defaults to False.
+    """
+    def __init__(self,
+                 qdrant_conn: Optional[QdrantConnector] = None,
+                 pg_conn: Optional[PostgresConnector] = None,
+                 batch_size: int = REINDEX_BATCH_SIZE,
+                 max_workers: int = REINDEX_MAX_WORKERS,
+                 parallel: Optional[int] = None,
+                 max_shrink: float = REINDEX_MAX_SHRINK,
+                 keep_previous: bool = False):
+        self.qdrant_conn = qdrant_conn or make_qdrant_connector()
+        self.pg_conn = pg_conn or PostgresConnector()
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.parallel = parallel
+        self.max_shrink = max_shrink
+        self.keep_previous = keep_previous
+
+    def _set_indexing_threshold(self, collection: str, threshold: int):
+        from qdrant_client.models import OptimizersConfigDiff
+
+        self.qdrant_conn.client.update_collection(collection_name=collection,
+                                                  optimizers_config=OptimizersConfigDiff(indexing_threshold=threshold))
+
+    def _wait_indexed(self, collection: str):
+        from qdrant_client.models import CollectionStatus
+
+        start = time.perf_counter()
+        while self.qdrant_conn.client.get_collection(collection).status != CollectionStatus.GREEN:
+            if time.perf_counter() - start > REINDEX_INDEXING_TIMEOUT:
+                raise TimeoutError(f"Collection {collection} not indexed after {REINDEX_INDEXING_TIMEOUT}s")
+            time.sleep(1)
+
+    def _load(self,
+              staging: QdrantConnector,
+              versions: List[str],
+              since: Dict[str, Watermark],
+              loaded: Dict[str, Set[int]]):
+        """Upsert the members of `versions` changed after `since` into `staging`, moving `since` past them"""
+        # One collection per version: write that version only. Multi-vector: write every version of a member at
+        # once (concurrent writes of the same point would overwrite each other), the first time it is streamed
+        version_to_vectorize = versions[0] if len(versions) == 1 else None
+        seen = set()
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for version in versions:
+                for members, watermark in self.pg_conn.iter_member_changes(version, since=since[version],
+                                                                           batch_size=self.batch_size):
+                    since[version] = watermark
+                    loaded[version].update(member.member_no for member in members)
+                    members = [member for member in members if member.member_no not in seen]
+                    if not members:
+                        continue
+                    seen.update(member.member_no for member in members)
+                    pending.add(pool.submit(staging.insert_members_bulk, members, version_to_vectorize,
+                                            parallel=self.parallel, skip_unchanged=False))
+                    # Bound the batches held in memory while Postgres is faster than the upserts
+                    if len(pending) >= 2 * self.max_workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+            for future in pending:
+                future.result()
+
+    def _validate(self, staging: QdrantConnector, versions: List[str], loaded: Dict[str, Set[int]]) -> Dict[str, int]:
+        counts = {version: staging.count_members(version) for version in versions}
+        for version in versions:
+            if counts[version] != len(loaded[version]):
+                raise ValueError(f"{staging.collection_name(version)} holds {counts[version]} points of {version}, "
+                                 f"{len(loaded[version])} members were streamed")
+            serving = self.qdrant_conn.count_members(version)
+            if counts[version] < serving * (1 - self.max_shrink):
+                raise ValueError(f"{staging.collection_name(version)} holds {counts[version]} points of {version}, "
+                                 f"the serving collection {serving} (max shrink {self.max_shrink:.0%})")
+        return counts
+
+    def reindex_collection(self, versions: List[str], suffix: Optional[str] = None) -> dict:
+        """Rebuild the serving collection of `versions` (one per-version collection, or every version of the
+        multi-vector collection) and switch its alias to the new collection
+
+        Args:
+            versions (List[str]): Versions stored in the serving collection
+            suffix (str, optional): Suffix of the new collection name. Defaults to the current UTC time.
+
+        Returns:
+            dict: `alias`, `collection` (new), `previous` collection, point `counts` per version and `seconds`
+        """
+        start = time.perf_counter()
+        suffix = suffix or time.strftime("%Y%m%d%H%M%S", time.gmtime())
+        staging = self.qdrant_conn.staging_connector(suffix)
+        alias = self.qdrant_conn.collection_name(versions[0])
+        collection = staging.collection_name(versions[0])
+        if self.qdrant_conn.client.collection_exists(collection):
+            raise ValueError(f"Collection {collection} already exists, use another suffix")
+        staging._ensure_collection(versions[0])
+        try:
+            # Build the HNSW graph once at the end instead of while every batch is upserted
+            self._set_indexing_threshold(collection, 0)
+            since = {version: INITIAL_WATERMARK for version in versions}
+            loaded = {version: set() for version in versions}
+            self._load(staging, versions, since, loaded)
+            print(f"Loaded {collection} in {time.perf_counter() - start:.2f}s, catching up with recent changes")
+            self._load(staging, versions, since, loaded)
+            self._set_indexing_threshold(collection, INDEXING_THRESHOLD)
+            self._wait_indexed(collection)
+            counts = self._validate(staging, versions, loaded)
+            # Changes made while indexing and validating; the index is built, new points are indexed on write
+            self._load(staging, versions, since, loaded)
+            counts = {version: staging.count_members(version) for version in versions}
+        except Exception:
+            print(f"Re-index of {alias} failed, deleting {collection}")
+            self.qdrant_conn.client.delete_collection(collection)
+            raise
+
+        previous = switch_alias(self.qdrant_conn.client, alias, collection)
+        self.qdrant_conn.invalidate_collection_cache(alias)
+        print(f"Alias {alias} switched from {previous} to {collection}")
+        for version in versions:
+            if self.pg_conn.rewind_sync_watermark(version, since[version]):
+                print(f"Sync watermark of {version} rewound to {since[version]}")
+        if previous and not self.keep_previous:
+            self.qdrant_conn.client.delete_collection(previous)
+            print(f"Collection {previous} deleted")
+        return {"alias": alias, "collection": collection, "previous": previous, "counts": counts,
+                "seconds": time.perf_counter() - start}
+
+    def reindex(self, versions: List[str]) -> List[dict]:
+        """Rebuild the serving collections of `versions`, one collection at a time (see `reindex_collection`)"""
+        by_collection = {}
+        for version in versions:
+            by_collection.setdefault(self.qdrant_conn.collection_name(version), []).append(version)
+        return [self.reindex_collection(collection_versions) for collection_versions in by_collection.values()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--versions", nargs="+", default=["v1", "v2"])
+    parser.add_argument("--batch-size", type=int, default=REINDEX_BATCH_SIZE)
+    parser.add_argument("--max-workers", type=int, default=REINDEX_MAX_WORKERS)
+    parser.add_argument("--parallel", type=int, default=None, help="Embedding worker processes per batch")
+    parser.add_argument("--max-shrink", type=float, default=REINDEX_MAX_SHRINK)
+    parser.add_argument("--keep-previous", action="store_true", help="Keep the previous collection for a rollback")
+    args = parser.parse_args()
+
+    reindexer = BlueGreenReindexer(batch_size=args.batch_size, max_workers=args.max_workers, parallel=args.parallel,
+                                   max_shrink=args.max_shrink, keep_previous=args.keep_previous)
+    for report in reindexer.reindex(args.versions):
+        print(f"{report['alias']} -> {report['collection']}: {report['counts']} in {report['seconds']:.2f}s")
@@ -1,34 +1,214 @@
 """Reranker class for the LLM agent."""
+from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import os
-from typing import Dict
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Iterator, Tuple, Optional, AsyncIterator, TYPE_CHECKING
 
-from langchain.output_parsers.json import SimpleJsonOutputParser
-from langchain_core.prompts import PromptTemplate
-from qdrant_client.http.models import QueryResponse
+from llm_agent.connectors.qdrant_connector import (QdrantConnector, AsyncQdrantConnector, make_async_qdrant_connector,
+                                                   member_search_text, make_qdrant_connector)
+from llm_agent.connectors.redis_connector import redis_member_ver_cache, async_redis_member_ver_cache, redis_cache_pkl
+from llm_agent.src.enrichment import TokenBucketRateLimiter
+from llm_agent.src.utils import Member, LlmType, load_prompt_template, ModelSetup, PROMPT_PATH
 
-from llm_agent.connectors.qdrant_connector import QdrantConnector
-from llm_agent.connectors.redis_connector import redis_member_ver_cache, redis_cache_pkl
-from llm_agent.src.utils import Member, LlmType, load_prompt_template, ModelSetup
+if TYPE_CHECKING:
+    from qdrant_client.http.models import QueryResponse
+    from llm_agent.src.candidates import AllPairsCandidateEngine
 
 GEMINI_MODEL = "gemini-1.5-pro"
 GEMINI_EMBEDDINGS_MODEL = "models/embedding-001"
 DEFAULT_TEMPERATURE = 0
-DEFAULT_GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY", default=GOOGLE_API_KEY)
+DEFAULT_GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 DEFAULT_PROMPT_VERSION = "1.0.0"
-DEFAULT_PROMPT_PATH = "../llm_agent/prompts"
-
-RERANK_PROMPT = load_prompt_template(filename="rerank_and_compare.yaml",
-                                     path=DEFAULT_PROMPT_PATH,
-                                     version=DEFAULT_PROMPT_VERSION)
+# Prompt of the cheap model: same task, plus a self-reported `confidence`
+CHEAP_PROMPT_VERSION = "1.1.0"
+# Prompt packing several targets and their candidates, answered with a JSON array
+BATCH_PROMPT_VERSION = "2.0.0"
+DEFAULT_PROMPT_PATH = PROMPT_PATH
 
 DEFAULT_LLM = LlmType.GEMINI
+DEFAULT_RERANK_CONCURRENCY = int(os.getenv("RERANK_CONCURRENCY", 8))
+NO_CANDIDATES_RESULT = {"member_no": -1, "reason": "no_candidates"}
+# With fewer candidates than this, the best one by retrieval score is returned without an LLM call
+RERANK_GATE_MIN_CANDIDATES = int(os.getenv("RERANK_GATE_MIN_CANDIDATES", 2))
+# Lead of the top retrieval score over the second one above which the top candidate is returned as is
+RERANK_GATE_MARGIN = float(os.getenv("RERANK_GATE_MARGIN", 0.05))
+# Cheaper model asked before GEMINI_MODEL ("" to always use GEMINI_MODEL)
+RERANK_CHEAP_MODEL = os.getenv("RERANK_CHEAP_MODEL", "gemini-1.5-flash")
+# Lowest confidence of the cheap model's answer kept without asking GEMINI_MODEL
+RERANK_CHEAP_MIN_CONFIDENCE = float(os.getenv("RERANK_CHEAP_MIN_CONFIDENCE", 0.8))
+# Estimated prompt tokens of a batched rerank, and targets per batch (bounds the answer length)
+RERANK_BATCH_TOKEN_BUDGET = int(os.getenv("RERANK_BATCH_TOKEN_BUDGET", 8000))
+RERANK_BATCH_MAX_TARGETS = int(os.getenv("RERANK_BATCH_MAX_TARGETS", 10))
+# Re-asks of a batch for the targets without a valid answer, before reranking them one by one
+RERANK_BATCH_RETRIES = 1
+CHARS_PER_TOKEN = 4  # rough estimate for English prompts
+# Member fields left out of the target description in the rerank prompt
+RERANK_TARGET_EXCLUDE = {"versions", "summary"}
+
+
+def recommend_cache_fields(target: Member) -> dict:
+    """Member data a recommendation depends on: the target description and the candidate search text"""
+    return {**target.model_dump(exclude=RERANK_TARGET_EXCLUDE), "search_text": member_search_text(target)}
+
+
+def default_rerank_prompt(version: str = DEFAULT_PROMPT_VERSION) -> str:
+    return load_prompt_template(filename="rerank_and_compare.yaml",
+                                path=DEFAULT_PROMPT_PATH,
+                                version=version)
+
+
+def __getattr__(name: str):
+    # `RERANK_PROMPT` is read from disk on first access instead of at import
+    if name == "RERANK_PROMPT":
+        return default_rerank_prompt()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _json_parser():
+    from langchain.output_parsers.json import SimpleJsonOutputParser
+    return SimpleJsonOutputParser()
+
+
+def _model_name(chat_model) -> str:
+    return getattr(chat_model, "model", type(chat_model).__name__)
+
+
+def _confidence(result: Optional[dict]) -> float:
+    try:
+        return float((result or {}).get("confidence", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class RerankGate:
+    """Decide from the retrieval scores of the candidates (`QueryResponse.score`) whether a rerank needs an LLM
+
+    The top candidate is recommended without an LLM call when there are fewer than `min_candidates` candidates,
+    or when its score leads the second one by at least `margin`. Every rerank is logged as one
+    `rerank_gate {json}` line with the scores, the tier that decided (`decided_by`) and the member recommended,
+    and counted in `stats`: comparing `top_member_no` with the LLM's choice shows how far the thresholds can go.
+
+    Args:
+        min_candidates (int, optional): Defaults to RERANK_GATE_MIN_CANDIDATES.
+        margin (float, optional): Score lead of the top candidate; None always asks the LLM when there are
+            enough candidates. Defaults to RERANK_GATE_MARGIN.
+    """
+    def __init__(self,
+                 min_candidates: int = RERANK_GATE_MIN_CANDIDATES,
+                 margin: Optional[float] = RERANK_GATE_MARGIN):
+        self.min_candidates = min_candidates
+        self.margin = margin
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def namespace(self) -> str:
+        return f"gate{self.min_candidates}-{self.margin}"
+
+    @staticmethod
+    def _lead(candidates: List[QueryResponse]) -> Optional[float]:
+        return candidates[0].score - candidates[1].score if len(candidates) > 1 else None
+
+    def decide(self, candidates: List[QueryResponse]) -> Tuple[Optional[dict], Optional[str]]:
+        """Recommendation decided from the scores alone and the reason, or (None, None) if the LLM has to rerank
+
+        Args:
+            candidates (List[QueryResponse]): Candidates sorted by decreasing score
+        """
+        if not candidates:
+            return dict(NO_CANDIDATES_RESULT), "no_candidates"
+        top = candidates[0]
+        if len(candidates) < self.min_candidates:
+            return {"member_no": top.id, "reason": f"Best retrieval score ({top.score:.3f}) of "
+                                                   f"{len(candidates)} candidate(s)"}, "few_candidates"
+        lead = self._lead(candidates)
+        if self.margin is not None and lead >= self.margin:
+            return {"member_no": top.id, "reason": f"Best retrieval score ({top.score:.3f}), {lead:.3f} ahead of "
+                                                   f"the next candidate"}, "margin"
+        return None, None
+
+    def log(self, target: Member, version: str, candidates: List[QueryResponse], decided_by: str, result: dict):
+        lead = self._lead(candidates)
+        record = {"target": target.member_no, "version": version, "candidates": len(candidates),
+                  "top_member_no": candidates[0].id if candidates else None,
+                  "top_score": round(candidates[0].score, 4) if candidates else None,
+                  "lead": round(lead, 4) if lead is not None else None,
+                  "decided_by": decided_by, "member_no": result.get("member_no"),
+                  "confidence": result.get("confidence")}
+        with self._lock:
+            self.stats[decided_by] += 1
+        print(f"rerank_gate {json.dumps(record, default=str)}")
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _json_items(text: str) -> list:
+    """JSON objects of an LLM answer: the array between the first `[` and the last `]`, or else every flat
+    `{...}` object that parses on its own (truncated or malformed arrays)"""
+    text = re.sub(r"```(?:json)?", "", text)
+    start, end = text.find("["), text.rfind("]")
+    if start != -1 and end > start:
+        try:
+            items = json.loads(text[start:end + 1])
+            return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+        except json.JSONDecodeError:
+            pass
+    items = []
+    for match in re.findall(r"\{[^{}]*\}", text):
+        try:
+            items.append(json.loads(match))
+        except json.JSONDecodeError:
+            continue
+    return items
+
+
+def _candidate_id(member_no, candidates: List[QueryResponse]) -> Optional[int]:
+    """Id of the candidate an LLM answered with `member_no` (a number or its text), None if it is not one"""
+    return {str(candidate.id): candidate.id for candidate in candidates}.get(str(member_no).strip())
+
+
+def parse_batch_results(message, candidates: Dict[int, List[QueryResponse]]) -> Dict[int, dict]:
+    """Recommendations of a batched rerank answer, by target `member_no`
+
+    Entries are matched to targets by `target_member_no` (or by position when no entry has one and there is one
+    entry per target). Entries for unknown targets, answering a member that is not a candidate of their target,
+    or repeating a target already answered are dropped.
+
+    Args:
+        message: Chat model answer (message or text)
+        candidates (Dict[int, List[QueryResponse]]): Candidates by target `member_no`, in prompt order
+    """
+    items = _json_items(getattr(message, "content", message))
+    if items and len(items) == len(candidates) and not any("target_member_no" in item for item in items):
+        items = [{**item, "target_member_no": target_no} for item, target_no in zip(items, candidates)]
+    results = {}
+    for item in items:
+        try:
+            target_no = int(item.get("target_member_no"))
+        except (TypeError, ValueError):
+            continue
+        if target_no not in candidates or target_no in results:
+            continue
+        member_no = _candidate_id(item.get("member_no"), candidates[target_no])
+        if member_no is None:
+            continue
+        results[target_no] = {"member_no": member_no, "reason": str(item.get("reason", ""))}
+    return results
 
 
 def parse_message_to_dict(func):
     def json_parser(self, *args, **kwargs):
-        parser = SimpleJsonOutputParser()
+        parser = _json_parser()
         result = func(self, *args, **kwargs)
         return parser.invoke(result)
 
@@ -36,59 +216,439 @@ def parse_message_to_dict(func):
 
 
 class LlmReranker:
-    def __init__(self, chat_model, prompt: str = None):
+    """Recommend the best match of a member among its nearest members in Qdrant
+
+    A recommendation goes through up to three tiers, cheapest first: the retrieval scores (`gate`), the
+    `cheap_chat_model` (kept when its confidence reaches `cheap_min_confidence`) and `chat_model`.
+
+    Args:
+        chat_model: Full reranker
+        prompt (str, optional): Prompt of `chat_model`. Defaults to the DEFAULT_PROMPT_VERSION prompt.
+        qdrant_conn (QdrantConnector, optional): Defaults to the configured layout.
+        async_qdrant_conn (AsyncQdrantConnector, optional): Defaults to one created from `qdrant_conn`.
+        cheap_chat_model (optional): Cheaper model asked first. Defaults to None (only `chat_model`).
+        cheap_prompt (str, optional): Prompt of `cheap_chat_model`. Defaults to the CHEAP_PROMPT_VERSION prompt.
+        gate (RerankGate, optional): Defaults to the RERANK_GATE_* thresholds.
+        cheap_min_confidence (float, optional): Defaults to RERANK_CHEAP_MIN_CONFIDENCE.
+        batch_prompt (str, optional): Prompt of batched reranks (`rerank_batch`). Defaults to the
+            BATCH_PROMPT_VERSION prompt.
+    """
+    def __init__(self,
+                 chat_model,
+                 prompt: str = None,
+                 qdrant_conn: QdrantConnector = None,
+                 async_qdrant_conn: AsyncQdrantConnector = None,
+                 cheap_chat_model=None,
+                 cheap_prompt: str = None,
+                 gate: Optional[RerankGate] = None,
+                 cheap_min_confidence: float = RERANK_CHEAP_MIN_CONFIDENCE,
+                 batch_prompt: str = None):
         self.chat_model = chat_model
         if not prompt:
-            prompt = RERANK_PROMPT
+            prompt = default_rerank_prompt()
         self.rerank_prompt = prompt
-        self.qdrant_conn = QdrantConnector()
+        self.qdrant_conn = qdrant_conn or make_qdrant_connector()
+        self._async_qdrant_conn = async_qdrant_conn
+        self.cheap_chat_model = cheap_chat_model
+        if cheap_chat_model is not None and not cheap_prompt:
+            cheap_prompt = default_rerank_prompt(CHEAP_PROMPT_VERSION)
+        self.cheap_prompt = cheap_prompt
+        self.gate = gate or RerankGate()
+        self.cheap_min_confidence = cheap_min_confidence
+        self.batch_prompt = batch_prompt or default_rerank_prompt(BATCH_PROMPT_VERSION)
+
+    @property
+    def async_qdrant_conn(self) -> AsyncQdrantConnector:
+        """Async connector of the serving path, created on first use with the config of `qdrant_conn`"""
+        if self._async_qdrant_conn is None:
+            self._async_qdrant_conn = make_async_qdrant_connector(self.qdrant_conn)
+        return self._async_qdrant_conn
 
+    def _prompt_namespace(self) -> str:
+        prompt_hash = hashlib.blake2b((self.rerank_prompt + self.batch_prompt).encode("utf-8"),
+                                      digest_size=8).hexdigest()
+        namespace = f"{DEFAULT_PROMPT_VERSION}-{prompt_hash}:{_model_name(self.chat_model)}:{self.gate.namespace}"
+        if self.cheap_chat_model is not None:
+            cheap_hash = hashlib.blake2b(self.cheap_prompt.encode("utf-8"), digest_size=8).hexdigest()
+            namespace += f":{cheap_hash}:{_model_name(self.cheap_chat_model)}>{self.cheap_min_confidence}"
+        return namespace
+
+    def cache_namespace(self, version: str) -> str:
+        """Cache namespace of recommendations: prompts, models, gate thresholds and candidate search namespace"""
+        return f"{self._prompt_namespace()}:{self.qdrant_conn.cache_namespace(version)}"
+
+    async def acache_namespace(self, version: str) -> str:
+        return f"{self._prompt_namespace()}:{await self.async_qdrant_conn.acache_namespace(version)}"
 
     @parse_message_to_dict
-    def rerank(self, similar_items: Dict[str, QueryResponse], target: Member, version: str = 'v1'):
+    def rerank(self, similar_items: Dict[str, QueryResponse], target: Member, version: str = 'v1',
+               cheap: bool = False):
+        """LLM rerank of the candidates of `target` with `chat_model` (`cheap_chat_model` if `cheap`)"""
         if not similar_items or not similar_items.get(version):
             print("No similar items found")
             return
-        # Memberinfo
+        chat_model, prompt = (self.cheap_chat_model, self.cheap_prompt) if cheap else (self.chat_model, None)
+        recommendation_prompt = self._build_rerank_prompt(similar_items, target, version, prompt)
+        result = chat_model.invoke(recommendation_prompt)
+        return result
+
+    async def arerank(self, similar_items: Dict[str, QueryResponse], target: Member, version: str = 'v1',
+                      cheap: bool = False):
+        """Async `rerank` through `ainvoke`"""
+        if not similar_items or not similar_items.get(version):
+            print("No similar items found")
+            return
+        chat_model, prompt = (self.cheap_chat_model, self.cheap_prompt) if cheap else (self.chat_model, None)
+        recommendation_prompt = self._build_rerank_prompt(similar_items, target, version, prompt)
+        result = await chat_model.ainvoke(recommendation_prompt)
+        return _json_parser().invoke(result)
+
+    @staticmethod
+    def _format_member_info(target: Member) -> str:
         target_dict = target.model_dump()
-        target_list = [f'{k}: {v}' for k, v in target_dict.items() if (v and k != 'versions' and k != 'summary')]
-        memberinfo_str = "## Member information\n" + '\t\n'.join(target_list)
+        target_list = [f'{k}: {v}' for k, v in target_dict.items() if (v and k not in RERANK_TARGET_EXCLUDE)]
+        return "## Member information\n" + '\t\n'.join(target_list)
 
-        # Company websearch info
+    @staticmethod
+    def _format_candidates(similar_items: List[QueryResponse], target: Member, heading: str = "##") -> Tuple[str, int]:
+        """Candidate list of the prompt and the number following the last candidate"""
         candidate_info_str, candidate_nums = "", 1
-        for similar_item in similar_items.get(version):
+        for similar_item in similar_items:
             member_no = similar_item.id
             summary = similar_item.document
             if member_no == target.member_no:
                 continue
             candidate_info_str += (
-                f"## Candidate {candidate_nums}: \n\t"
+                f"{heading} Candidate {candidate_nums}: \n\t"
                 f"- `member_no`: {member_no}\n\t"
                 f"- `member_summary`: {summary}\n\n"
             )
             candidate_nums += 1
+        return candidate_info_str, candidate_nums
+
+    def _build_rerank_prompt(self, similar_items: Dict[str, QueryResponse], target: Member, version: str,
+                             prompt: Optional[str] = None) -> str:
+        from langchain_core.prompts import PromptTemplate
+
+        # Memberinfo
+        memberinfo_str = self._format_member_info(target)
+
+        # Company websearch info
+        candidate_info_str, candidate_nums = self._format_candidates(similar_items.get(version), target)
 
         recommendation_prompt = PromptTemplate(
             input_variables=["candidate_nums", "memberinfo_str", "candidate_info_str"],
-            template=RERANK_PROMPT
+            template=prompt or self.rerank_prompt
         ).format(candidate_nums=candidate_nums,
                  memberinfo_str=memberinfo_str,
                  candidate_info_str=candidate_info_str)
-        result = self.chat_model.invoke(recommendation_prompt)
-        return result
+        return recommendation_prompt
+
+    def _format_batch_target(self, target: Member, candidates: List[QueryResponse]) -> str:
+        candidate_info_str, _ = self._format_candidates(candidates, target, heading="###")
+        return (f"# Target `target_member_no`: {target.member_no}\n{self._format_member_info(target)}\n\n"
+                f"## Candidates\n{candidate_info_str}")
+
+    def _build_batch_prompt(self, batch: List[Tuple[Member, List[QueryResponse]]]) -> str:
+        from langchain_core.prompts import PromptTemplate
+
+        return PromptTemplate(input_variables=["target_nums", "targets_str"], template=self.batch_prompt).format(
+            target_nums=len(batch),
+            targets_str="\n".join(self._format_batch_target(target, candidates) for target, candidates in batch))
+
+    def rerank_batch(self,
+                     batch: List[Tuple[Member, List[QueryResponse]]],
+                     rate_limiter: Optional[TokenBucketRateLimiter] = None,
+                     retries: int = RERANK_BATCH_RETRIES) -> Dict[int, dict]:
+        """Rerank several targets with one `chat_model` call (batch prompt), re-asking up to `retries` times for
+        the targets whose answer is missing or invalid (see `parse_batch_results`)
+
+        Args:
+            batch (List[Tuple[Member, List[QueryResponse]]]): Targets and their candidates
+            rate_limiter (TokenBucketRateLimiter, optional): Limiter for the LLM calls. Defaults to None.
+            retries (int, optional): Defaults to RERANK_BATCH_RETRIES.
+
+        Returns:
+            Dict[int, dict]: Recommendation by target `member_no`; targets still unanswered are left out
+        """
+        results = {}
+        pending = batch
+        for _ in range(retries + 1):
+            if rate_limiter:
+                rate_limiter.acquire()
+            message = self.chat_model.invoke(self._build_batch_prompt(pending))
+            results.update(parse_batch_results(message, {target.member_no: candidates
+                                                         for target, candidates in pending}))
+            pending = [(target, candidates) for target, candidates in pending if target.member_no not in results]
+            if not pending:
+                break
+        return results
+
+    def _pack_targets(self,
+                      targets: List[Member],
+                      similar_items: List[Dict[str, QueryResponse]],
+                      version: str,
+                      token_budget: int = RERANK_BATCH_TOKEN_BUDGET,
+                      max_targets: int = RERANK_BATCH_MAX_TARGETS) -> List[List[Tuple[Member, dict]]]:
+        """Group the targets that need an LLM into batches of at most `max_targets` targets and about
+        `token_budget` prompt tokens; targets decided by the gate get a batch of their own"""
+        budget = token_budget - _estimate_tokens(self.batch_prompt)
+        batches, current, current_tokens = [], [], 0
+        for items, target in zip(similar_items, targets):
+            candidates = self._candidates(items, target, version)
+            if self.gate.decide(candidates)[0] is not None:
+                batches.append([(target, items)])
+                continue
+            tokens = _estimate_tokens(self._format_batch_target(target, candidates))
+            if current and (current_tokens + tokens > budget or len(current) >= max_targets):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append((target, items))
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _rerank_targets(self,
+                        batch: List[Tuple[Member, Dict[str, QueryResponse]]],
+                        version: str,
+                        rate_limiter: Optional[TokenBucketRateLimiter] = None) -> List[Tuple[Member, dict]]:
+        """Recommendations of a batch of targets: one batched prompt for several targets, and the single-target
+        path (`_rerank_with_version`) for a lone target or a target the batch did not answer"""
+        if len(batch) == 1:
+            target, items = batch[0]
+            return [(target, self._rerank_with_version(items, target, version, rate_limiter))]
+        entries = [(target, self._candidates(items, target, version)) for target, items in batch]
+        results = self.rerank_batch(entries, rate_limiter)
+        done = []
+        for (target, items), (_, candidates) in zip(batch, entries):
+            if target.member_no in results:
+                done.append((target, self._gated_result(target, version, candidates, "full_model_batch",
+                                                        results[target.member_no])))
+            else:
+                print(f"No valid batched answer for member {target.member_no}, reranking it alone")
+                done.append((target, self._rerank_with_version(items, target, version, rate_limiter)))
+        return done
 
-    @redis_member_ver_cache()
+    @staticmethod
+    def _search_enabled(source, targets: List[Member], version: str) -> List[Dict[str, QueryResponse]]:
+        """Candidates of the targets with the `version` flag on (batched); the others get none, as in `recommend`"""
+        enabled = [idx for idx, target in enumerate(targets) if target.versions.get(version, False)]
+        similar_items = [{} for _ in targets]
+        for idx, items in zip(enabled, source.search_members_batch([targets[idx] for idx in enabled], version)):
+            similar_items[idx] = items
+        return similar_items
+
+    @redis_member_ver_cache(key_fields=recommend_cache_fields)
     def recommend(self, target: Member, version: str):
         similar_items = self.qdrant_conn.search_members([target])
-        result = self.rerank(similar_items[0], target, version)
-        return {**result, **{'version': version}}
+        return self._rerank_with_version(similar_items[0], target, version)
+
+    @staticmethod
+    def _candidates(similar_items: Dict[str, QueryResponse], target: Member, version: str) -> List[QueryResponse]:
+        """Candidates of `target` in `version`, best retrieval score first"""
+        return sorted((item for item in similar_items.get(version) or [] if item.id != target.member_no),
+                      key=lambda item: item.score, reverse=True)
+
+    def _accept_cheap(self, result: Optional[dict], candidates: List[QueryResponse]) -> bool:
+        """Whether the cheap model picked one of the candidates with enough confidence"""
+        return (isinstance(result, dict) and _candidate_id(result.get("member_no"), candidates) is not None
+                and _confidence(result) >= self.cheap_min_confidence)
+
+    def _full_model_result(self, target: Member, version: str, candidates: List[QueryResponse], result) -> dict:
+        """Gated result of the full model's pick, or of the best retrieval candidate if it did not pick one of
+        the candidates"""
+        member_no = _candidate_id(result.get("member_no"), candidates) if isinstance(result, dict) else None
+        if member_no is not None:
+            return self._gated_result(target, version, candidates, "full_model", result)
+        if not candidates:
+            return self._gated_result(target, version, candidates, "no_candidates", dict(NO_CANDIDATES_RESULT))
+        print(f"Rerank of member {target.member_no} picked no candidate ({result!r}), using the best retrieval score")
+        top = candidates[0]
+        return self._gated_result(target, version, candidates, "full_model_fallback",
+                                  {"member_no": top.id, "reason": f"Best retrieval score ({top.score:.3f}), "
+                                                                  f"the model picked no candidate"})
+
+    def _gated_result(self, target: Member, version: str, candidates: List[QueryResponse], decided_by: str,
+                      result: dict) -> dict:
+        """`result` with its `member_no` as the candidate id (an int), `version` and `decided_by`, logged"""
+        member_no = _candidate_id(result.get("member_no"), candidates)
+        if member_no is not None:
+            result = {**result, "member_no": member_no}
+        self.gate.log(target, version, candidates, decided_by, result)
+        return {**result, **{'version': version, 'decided_by': decided_by}}
+
+    def _rerank_with_version(self,
+                             similar_items: Dict[str, QueryResponse],
+                             target: Member,
+                             version: str,
+                             rate_limiter: Optional[TokenBucketRateLimiter] = None) -> dict:
+        """Recommendation of the first tier that can decide: retrieval scores, cheap model, full model"""
+        candidates = self._candidates(similar_items, target, version)
+        result, decided_by = self.gate.decide(candidates)
+        if result is not None:
+            return self._gated_result(target, version, candidates, decided_by, result)
+        if self.cheap_chat_model is not None:
+            if rate_limiter:
+                rate_limiter.acquire()
+            try:
+                result = self.rerank(similar_items, target, version, cheap=True)
+            except Exception as e:
+                print(f"Cheap rerank of member {target.member_no} failed ({e}), using {_model_name(self.chat_model)}")
+                result = None
+            if self._accept_cheap(result, candidates):
+                return self._gated_result(target, version, candidates, "cheap_model", result)
+        if rate_limiter:
+            rate_limiter.acquire()
+        result = self.rerank(similar_items, target, version)
+        return self._full_model_result(target, version, candidates, result)
+
+    def recommend_many(self,
+                       targets: List[Member],
+                       version: str,
+                       max_workers: int = DEFAULT_RERANK_CONCURRENCY,
+                       rate_limiter: Optional[TokenBucketRateLimiter] = None,
+                       candidates: Optional[AllPairsCandidateEngine] = None,
+                       batch_targets: bool = False,
+                       token_budget: int = RERANK_BATCH_TOKEN_BUDGET,
+                       max_batch_targets: int = RERANK_BATCH_MAX_TARGETS) -> Iterator[Tuple[Member, dict]]:
+        """Recommend a member for each of `targets`
+
+        Cached recommendations (shared with `recommend`) are looked up with one MGET and yielded first.
+        Candidates of the remaining targets are retrieved with one batched Qdrant query, then the LLM rerank
+        calls are fanned out over `max_workers` threads. Results are yielded as soon as each rerank finishes,
+        so the order is NOT the order of `targets`; new results are cached with one pipelined write at the end.
+        As in `recommend`, targets whose `version` flag is off are not searched and get `no_candidates`. A failed
+        rerank is logged and its targets are left out, the other targets go on.
+
+        With `batch_targets`, the targets the gate cannot decide are packed several per prompt (`rerank_batch`)
+        and go straight to `chat_model`, which takes several times fewer LLM calls in bulk runs.
+
+        Args:
+            targets (List[Member]): Members to recommend for
+            version (str): Version of the collection to search
+            max_workers (int, optional): Number of concurrent LLM calls. Defaults to DEFAULT_RERANK_CONCURRENCY.
+            rate_limiter (TokenBucketRateLimiter, optional): Limiter for the LLM calls. Defaults to None.
+            candidates (AllPairsCandidateEngine, optional): Take candidates from the in-memory all-pairs engine
+                instead of querying Qdrant, for bulk runs. Defaults to None.
+            batch_targets (bool, optional): Rerank several targets per LLM call. Defaults to False.
+            token_budget (int, optional): Estimated prompt tokens per batch. Defaults to RERANK_BATCH_TOKEN_BUDGET.
+            max_batch_targets (int, optional): Targets per batch. Defaults to RERANK_BATCH_MAX_TARGETS.
+
+        Yields:
+            Tuple[Member, dict]: target and its recommendation (same format as `recommend`)
+        """
+        cached = LlmReranker.recommend.get_many(self, targets, version)
+        for idx, result in cached.items():
+            yield targets[idx], result
+        targets = [target for idx, target in enumerate(targets) if idx not in cached]
+        if not targets:
+            return
+
+        similar_items = self._search_enabled(candidates or self.qdrant_conn, targets, version)
+        if batch_targets:
+            batches = self._pack_targets(targets, similar_items, version, token_budget, max_batch_targets)
+        else:
+            batches = [[(target, items)] for items, target in zip(similar_items, targets)]
+        done_targets, done_results = [], []
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            futures = {executor.submit(self._rerank_targets, batch, version, rate_limiter): batch
+                       for batch in batches}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        batch_results = future.result()
+                    except Exception as e:
+                        print(f"Recommendation of members {[target.member_no for target, _ in futures[future]]} "
+                              f"failed ({type(e).__name__}: {e})")
+                        continue
+                    for target, result in batch_results:
+                        done_targets.append(target)
+                        done_results.append(result)
+                        yield target, result
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            finally:
+                LlmReranker.recommend.set_many(self, done_targets, version, done_results)
+
+    @async_redis_member_ver_cache(key_fields=recommend_cache_fields, key_prefix="recommend")
+    async def arecommend(self, target: Member, version: str):
+        """Async `recommend`: the searches of all versions enabled for `target` run concurrently"""
+        similar_items = await self.async_qdrant_conn.search_members([target])
+        return await self._arerank_with_version(similar_items[0], target, version)
+
+    async def _arerank_with_version(self, similar_items: Dict[str, QueryResponse], target: Member, version: str) -> dict:
+        """Async `_rerank_with_version`"""
+        candidates = self._candidates(similar_items, target, version)
+        result, decided_by = self.gate.decide(candidates)
+        if result is not None:
+            return self._gated_result(target, version, candidates, decided_by, result)
+        if self.cheap_chat_model is not None:
+            try:
+                result = await self.arerank(similar_items, target, version, cheap=True)
+            except Exception as e:
+                print(f"Cheap rerank of member {target.member_no} failed ({e}), using {_model_name(self.chat_model)}")
+                result = None
+            if self._accept_cheap(result, candidates):
+                return self._gated_result(target, version, candidates, "cheap_model", result)
+        result = await self.arerank(similar_items, target, version)
+        return self._full_model_result(target, version, candidates, result)
+
+    async def arecommend_many(self,
+                              targets: List[Member],
+                              version: str,
+                              max_concurrency: int = DEFAULT_RERANK_CONCURRENCY) -> AsyncIterator[Tuple[Member, dict]]:
+        """Async `recommend_many`: at most `max_concurrency` LLM calls in flight, results yielded as they finish
+        (targets whose `version` flag is off get `no_candidates`, failed reranks are logged and left out)"""
+        cached = await LlmReranker.arecommend.get_many(self, targets, version)
+        for idx, result in cached.items():
+            yield targets[idx], result
+        targets = [target for idx, target in enumerate(targets) if idx not in cached]
+        if not targets:
+            return
+
+        enabled = [idx for idx, target in enumerate(targets) if target.versions.get(version, False)]
+        similar_items = [{} for _ in targets]
+        found = await self.async_qdrant_conn.search_members_batch([targets[idx] for idx in enabled], version)
+        for idx, items in zip(enabled, found):
+            similar_items[idx] = items
+        semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+
+        async def _bounded_rerank(items: Dict[str, QueryResponse], target: Member) -> Tuple[Member, Optional[dict]]:
+            async with semaphore:
+                try:
+                    return target, await self._arerank_with_version(items, target, version)
+                except Exception as e:
+                    print(f"Recommendation of member {target.member_no} failed ({type(e).__name__}: {e})")
+                    return target, None
+
+        tasks = [asyncio.ensure_future(_bounded_rerank(items, target)) for items, target in zip(similar_items, targets)]
+        done_targets, done_results = [], []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                target, result = await next_done
+                if result is None:
+                    continue
+                done_targets.append(target)
+                done_results.append(result)
+                yield target, result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await LlmReranker.arecommend.set_many(self, done_targets, version, done_results)
 
-def reranker_setup():
+def reranker_setup(qdrant_conn: QdrantConnector = None):
     chat_model = ModelSetup(llm_type=LlmType.GEMINI,
                             model_params={"model": GEMINI_MODEL,
                                           "google_api_key": DEFAULT_GEMINI_API_KEY,
                                           "temperature": DEFAULT_TEMPERATURE})()
-    return LlmReranker(chat_model)
+    cheap_chat_model = ModelSetup(llm_type=LlmType.GEMINI,
+                                  model_params={"model": RERANK_CHEAP_MODEL,
+                                                "google_api_key": DEFAULT_GEMINI_API_KEY,
+                                                "temperature": DEFAULT_TEMPERATURE})() if RERANK_CHEAP_MODEL else None
+    return LlmReranker(chat_model, qdrant_conn=qdrant_conn, cheap_chat_model=cheap_chat_model)
 
 
 if __name__ == "__main__":
@@ -1,20 +1,32 @@
 """
 The purpose of this script is to create a pipeline to update data to qdrant.
 Steps:
-1. Pull new data from postgres
-    - `create_at` == `update_at`
-    - `update_at`  - current time > 1 day
-3. LLM get enhanced summary data (`data_enhanced.py`)
+1. Pull new data from postgres (streamed in keyset-paginated batches, so memory stays bounded)
+    - streaming: members whose `updated_at` is past the version's sync watermark (`member_sync_watermark`)
+    - legacy (`pg_get_latest_data`): `create_at` == `update_at` or `update_at`  - current time > 1 day
+3. LLM get enhanced summary data (`data_enhanced.py`), concurrently under the provider rate limit (`enrichment.py`);
+   summaries are checkpointed to postgres with per-member job state, so an interrupted run resumes (`EnrichmentJob`)
 4. Insert data to qdrant with collection aligned to its version name as the `version` field
+5. Move the watermark past the synced batch, so the next run only processes the delta
 
+The Airflow DAG (`dag/dags/update_qdrant.py`) runs the same steps sharded: the delta is split once
+(`plan_delta_shards`), shards are enriched and vectorized in parallel tasks (`sync_member_shard`) and the
+watermark is committed when all of them succeeded (`commit_watermark`).
 """
-import time
-
-from tqdm import tqdm
+import hashlib
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from llm_agent.src._data_enhance_agent import agent_setup
-from llm_agent.connectors.postgres_connector import PostgresConnector, MEMBER_DATA_TTL
-from llm_agent.connectors.qdrant_connector import QdrantConnector
+from llm_agent.src.enrichment import (EnrichmentEngine, EnrichmentJob, TokenBucketRateLimiter, enrichment_input_hash,
+                                      DEFAULT_ENRICH_CONCURRENCY, DEFAULT_LLM_REQUESTS_PER_MINUTE)
+from llm_agent.connectors.postgres_connector import (PostgresConnector, MEMBER_DATA_TTL, STREAM_BATCH_SIZE,
+                                                     INITIAL_WATERMARK, Watermark)
+from llm_agent.connectors.qdrant_connector import QdrantConnector, make_qdrant_connector
+from llm_agent.src.utils import Member
+
+# Members per shard of the sharded sync (one Airflow task per shard, see `dag/dags/update_qdrant.py`)
+SYNC_SHARD_SIZE = int(os.getenv("SYNC_SHARD_SIZE", 500))
 
 
 class UpdateLatestDataToQdrantFactory:
@@ -22,31 +34,63 @@ class UpdateLatestDataToQdrantFactory:
                  version_: str = "v1",
                  pg_conn: PostgresConnector = None,
                  qdrant_conn: QdrantConnector = None,
-                 ttl: str = MEMBER_DATA_TTL):
-        if not pg_conn:
-            self.pg_conn = PostgresConnector()
-        if not qdrant_conn:
-            self.qdrant_conn = QdrantConnector()
+                 ttl: str = MEMBER_DATA_TTL,
+                 max_workers: int = DEFAULT_ENRICH_CONCURRENCY,
+                 requests_per_minute: float = DEFAULT_LLM_REQUESTS_PER_MINUTE):
+        self.pg_conn = pg_conn or PostgresConnector()
+        self.qdrant_conn = qdrant_conn or make_qdrant_connector()
         self.version = version_
         self.ttl = ttl
+        self.max_workers = max_workers
+        self.requests_per_minute = requests_per_minute
         self.new_members = None
+        self._engine = None
 
     def pg_get_latest_data(self):
         self.new_members = self.pg_conn.get_new_member_info(self.version,
                                                             intervals=self.ttl)
 
+    def pg_iter_latest_data(self,
+                            since: Watermark = INITIAL_WATERMARK,
+                            batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Tuple[List[Member], Watermark]]:
+        return self.pg_conn.iter_member_changes(self.version,
+                                                since=since,
+                                                batch_size=batch_size)
+
+    @property
+    def engine(self) -> EnrichmentEngine:
+        if self._engine is None:
+            self._engine = EnrichmentEngine(agent_setup(),
+                                            max_workers=self.max_workers,
+                                            rate_limiter=TokenBucketRateLimiter(self.requests_per_minute))
+        return self._engine
+
+    def close(self):
+        """Release the search threads of the enrichment agent, if it was created"""
+        if self._engine is not None:
+            self._engine.agent.close()
+            self._engine = None
+
+    def _llm_enhance_members(self, members: List[Member], job_id: str) -> List[Member]:
+        """Enrich `members` as the checkpointed job `job_id`: summaries are written back to Postgres as they
+        come, and running the same job again resumes it (see `EnrichmentJob`)"""
+        return EnrichmentJob(self.engine, self.pg_conn, job_id).run(members)
+
     def _llm_get_enhanced_summary_data(self):
-        agent = agent_setup()
-        results = []
-        for member in tqdm(self.new_members):
-            summarized_info = agent.summarized_with_enhanced_data(member)
-            results.append(summarized_info)
-            time.sleep(30)
-        new_members_updated_summary = self.new_members
-        for i in range(len(results)):
-            new_members_updated_summary[i].summary = results[i]
-        self.pg_conn.update_member_info(new_members_updated_summary)
-        return new_members_updated_summary
+        return self._llm_enhance_members(self.new_members, job_id=self.members_job_id(self.new_members))
+
+    def enrichment_job_id(self, since: Watermark) -> str:
+        """Job id of the delta starting after `since`: a re-run resumes its job even if the delta grew in the
+        meantime, and only the members edited since they were enriched are enriched again (see `EnrichmentJob`)"""
+        return f"{self.version}:{since[0].isoformat()}:{since[1]}"
+
+    def members_job_id(self, members: List[Member]) -> str:
+        """Job id of `members` as they are now (see `enrichment_input_hash`), for deltas without a watermark: a
+        re-run on the same content resumes the job, other content starts a new one"""
+        digest = hashlib.sha256()
+        for member in sorted(members, key=lambda member: member.member_no):
+            digest.update(enrichment_input_hash(member).encode("utf-8"))
+        return f"{self.version}:members:{digest.hexdigest()[:16]}"
 
     def update_latest_data_to_qdrant(self):
         pass
@@ -58,24 +102,108 @@ class UpdateLatestDataToQdrantV1(UpdateLatestDataToQdrantFactory):
                  version_: str = "v1",
                  pg_conn: PostgresConnector = None,
                  qdrant_conn: QdrantConnector = None,
-                 ttl: str = MEMBER_DATA_TTL):
-        super().__init__(version_, pg_conn, qdrant_conn, ttl)
+                 ttl: str = MEMBER_DATA_TTL,
+                 max_workers: int = DEFAULT_ENRICH_CONCURRENCY,
+                 requests_per_minute: float = DEFAULT_LLM_REQUESTS_PER_MINUTE):
+        super().__init__(version_, pg_conn, qdrant_conn, ttl, max_workers, requests_per_minute)
 
     def update_latest_data_to_qdrant(self, enhanced_data: bool = True):
         if self.version != 'v1':
             raise NotImplementedError("Only version v1 is supported")
         # 1. Pull new data from postgres
         self.pg_get_latest_data()
-        # 2. LLM get enhanced summary data
+        # 2. LLM get enhanced summary data, written back to postgres as it goes
         new_members_updated_summary = self._llm_get_enhanced_summary_data() if enhanced_data else self.new_members
-        # 3. Update summary field and update it back to postgres
-        self.pg_conn.update_member_info(new_members_updated_summary)
-        # 4. Insert data to qdrant with collection aligned to its version name as the `version` field
-        self.qdrant_conn.insert_members(new_members_updated_summary, version_to_vectorize='v1')
+        # 3. Insert data to qdrant with collection aligned to its version name as the `version` field
+        self.qdrant_conn.insert_members_bulk(new_members_updated_summary, version_to_vectorize='v1')
+
+    def update_latest_data_to_qdrant_streaming(self,
+                                               enhanced_data: bool = True,
+                                               batch_size: int = STREAM_BATCH_SIZE,
+                                               full_refresh: bool = False):
+        """Sync the members changed since the last successful run, batch by batch as a generator pipeline
+
+        Only `batch_size` members are in memory at a time, so peak memory does not grow with the table,
+        and the watermark is committed after every batch, so a crashed run resumes where it stopped.
+        Works for any version: members flagged with `self.version` are vectorized into its collection.
+
+        Args:
+            enhanced_data (bool, optional): Run LLM enrichment. Defaults to True.
+            batch_size (int, optional): Members per batch. Defaults to STREAM_BATCH_SIZE.
+            full_refresh (bool, optional): Ignore the watermark and re-sync every member. Defaults to False.
+        """
+        since = INITIAL_WATERMARK if full_refresh else self.pg_conn.get_sync_watermark(self.version)
+        total = 0
+        batch_since = since
+        for members, watermark in self.pg_iter_latest_data(since, batch_size):
+            if enhanced_data:
+                # Keyed by the watermark the batch starts from, so a crashed run resumes the enrichment of its batch
+                members = self._llm_enhance_members(members, job_id=self.enrichment_job_id(batch_since))
+            self.qdrant_conn.insert_members_bulk(members, version_to_vectorize=self.version)
+            self.pg_conn.set_sync_watermark(self.version, watermark)
+            total += len(members)
+            batch_since = watermark
+        print(f"{total} Members synced to qdrant since {since}")
+
+    def plan_delta_shards(self,
+                          shard_size: int = SYNC_SHARD_SIZE,
+                          full_refresh: bool = False) -> Tuple[List[List[int]], Watermark, Optional[Watermark]]:
+        """Split the members changed since the last successful run into shards of `member_no`
+
+        Shards are synced independently (`sync_member_shard`, one Airflow task each, sharing the enrichment job
+        of the delta, `enrichment_job_id(since)`) and the returned watermark is committed once all of them
+        succeeded (`commit_watermark`).
+
+        Args:
+            shard_size (int, optional): Members per shard. Defaults to SYNC_SHARD_SIZE.
+            full_refresh (bool, optional): Ignore the watermark and re-sync every member. Defaults to False.
+
+        Returns:
+            Tuple[List[List[int]], Watermark, Optional[Watermark]]: Shards, the watermark the delta starts
+                after and the watermark right after the delta (None if nothing changed)
+        """
+        since = INITIAL_WATERMARK if full_refresh else self.pg_conn.get_sync_watermark(self.version)
+        shards, watermark = [], None
+        for members, watermark in self.pg_iter_latest_data(since, batch_size=shard_size):
+            shards.append([member.member_no for member in members])
+        print(f"{sum(len(shard) for shard in shards)} Members changed since {since}, {len(shards)} shards")
+        return shards, since, watermark
+
+    def sync_member_shard(self,
+                          member_nos: List[int],
+                          enhanced_data: bool = True,
+                          delta_job_id: Optional[str] = None) -> Dict[str, int]:
+        """Enrich (optionally) and vectorize the members of one shard
+
+        Args:
+            member_nos (List[int]): Members of the shard
+            enhanced_data (bool, optional): Run LLM enrichment. Defaults to True.
+            delta_job_id (str, optional): Enrichment job id of the planned delta (`enrichment_job_id`), shared by
+                its shards. Defaults to the job id of the current content of the members (`members_job_id`).
+
+        Returns:
+            Dict[str, int]: Number of `members` read and points `inserted`
+        """
+        members = self.pg_conn.get_members_by_ids(member_nos)
+        if enhanced_data:
+            # A retried task or a re-run of the same delta resumes the enrichment of the shard, even if the
+            # shard boundaries moved
+            members = self._llm_enhance_members(members, job_id=delta_job_id or self.members_job_id(members))
+        inserted = self.qdrant_conn.insert_members_bulk(members, version_to_vectorize=self.version)
+        return {"members": len(members), "inserted": sum(inserted.values())}
+
+    def commit_watermark(self, watermark: Watermark):
+        self.pg_conn.set_sync_watermark(self.version, watermark)
 
-def update_latest_data_to_qdrant(version: str = "v1", enhanced_data: bool = False):
+def update_latest_data_to_qdrant(version: str = "v1", enhanced_data: bool = False, stream: bool = True):
     update_latest_data_to_qdrant_v1 = UpdateLatestDataToQdrantV1(version_=version)
-    update_latest_data_to_qdrant_v1.update_latest_data_to_qdrant(enhanced_data)
+    try:
+        if stream:
+            update_latest_data_to_qdrant_v1.update_latest_data_to_qdrant_streaming(enhanced_data)
+        else:
+            update_latest_data_to_qdrant_v1.update_latest_data_to_qdrant(enhanced_data)
+    finally:
+        update_latest_data_to_qdrant_v1.close()
 
 if __name__ == "__main__":
     update_latest_data_to_qdrant()
\ No newline at end of file
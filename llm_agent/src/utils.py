@@ -1,20 +1,22 @@
+import functools
 import os
 from enum import Enum
 from pathlib import Path
 from typing import Optional, Dict
 
 import yaml
-from google import generativeai
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from pydantic import BaseModel, Field
 
-PROMPT_PATH = "./llm_agent/prompts"
-DEFAULT_GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY", default=GOOGLE_API_KEY)
+# Resolved from the package, so prompts load whatever the working directory is
+PROMPT_PATH = Path(__file__).resolve().parent.parent / "prompts"
+DEFAULT_GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 
+@functools.lru_cache(maxsize=None)
 def load_prompt_template(filename: str,
                          path: str = PROMPT_PATH,
                          version: str = "1.0.0"):
+    """Load `version` of a yaml prompt (read once per process)"""
     file_path = Path(path).joinpath(filename)
     with open(file_path, 'r') as f:
         prompt = yaml.safe_load(f)
@@ -48,6 +50,10 @@ class ModelSetup:
         if self.llm_type == LlmType.OPENAI:
             raise NotImplementedError
 
+        # Imported here: the Gemini SDKs take seconds to import and are only needed once a model is built
+        from google import generativeai
+        from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+
         if self.llm_type == LlmType.GEMINI:
             generativeai.configure(api_key=self.model_params.get("api_key", DEFAULT_GEMINI_API_KEY))
             return ChatGoogleGenerativeAI(**self.model_params)